@@ -0,0 +1,158 @@
+import json
+import time
+from pathlib import Path
+from datetime import datetime
+
+from src import MetricsStore, compare_runs
+
+# --- PATHS ---
+REPO_ROOT = Path(__file__).resolve().parent.parent
+METRICS_DIR = REPO_ROOT / "results" / "metrics"
+METRICS_STORE_PATH = METRICS_DIR / "per_sample.sqlite"
+
+
+def run_comparison(
+    runs: list[str] | None = None,
+    baseline: str | None = None,
+    metrics: list[str] | None = None,
+    num_resamples: int = 10000,
+    confidence: float = 0.95,
+    seed: int = 0,
+    store_path: Path = METRICS_STORE_PATH,
+    output_path: Path | None = None
+) -> dict:
+    """
+    Compare stored runs with paired bootstrap confidence intervals.
+
+    Args:
+        runs: Run ids (predictions file names, with or without directory and
+              suffix). If None, every run in the store.
+        baseline: Run the others are compared to. Defaults to the first run.
+        metrics: Metrics to compare (prefixes of the stored score columns).
+        num_resamples: Bootstrap resamples.
+        confidence: Confidence level of the intervals.
+        seed: Seed of the resampling.
+        store_path: SQLite metrics store written by main.py --store.
+        output_path: Comparison JSON. Defaults to results/metrics/comparison_<timestamp>.json.
+    """
+    store = MetricsStore(store_path)
+    run_ids = [Path(run).stem for run in runs] if runs else [run["run_id"] for run in store.runs()]
+    if len(run_ids) < 2:
+        raise ValueError(f"Need at least two runs to compare, got {run_ids}")
+
+    start = time.perf_counter()
+    comparison = compare_runs(
+        store,
+        run_ids,
+        baseline=Path(baseline).stem if baseline else None,
+        metrics=metrics,
+        num_resamples=num_resamples,
+        confidence=confidence,
+        seed=seed
+    )
+    comparison["compare_s"] = round(time.perf_counter() - start, 3)
+    store.close()
+
+    # Print summary
+    print(f"\nBaseline: {comparison['baseline']}, {comparison['num_samples']} paired samples, "
+          f"{num_resamples} resamples ({comparison['compare_s']}s)")
+    for metric, by_run in comparison["metrics"].items():
+        print(f"\n{metric}")
+        print(f"  {'run':<36}{'score':>9}{'ci':>20}{'delta':>10}{'delta ci':>22}{'p':>8}{'win/tie/loss':>18}")
+        for run, entry in by_run.items():
+            ci = f"[{entry['ci'][0]:.4f}, {entry['ci'][1]:.4f}]"
+            line = f"  {run:<36}{entry['score']:>9.4f}{ci:>20}"
+            if "delta" in entry:
+                delta_ci = f"[{entry['delta_ci'][0]:+.4f}, {entry['delta_ci'][1]:+.4f}]"
+                rates = f"{entry['win_rate']:.2f}/{entry['tie_rate']:.2f}/{entry['loss_rate']:.2f}"
+                line += f"{entry['delta']:>+10.4f}{delta_ci:>22}{entry['p_value']:>8.4f}{rates:>18}"
+            print(line)
+
+    if output_path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = METRICS_DIR / f"comparison_{timestamp}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(comparison, f, indent=2)
+    print(f"\nComparison saved to: {output_path}")
+
+    return comparison
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare evaluated runs with paired bootstrap confidence intervals")
+    parser.add_argument(
+        "--runs",
+        nargs="+",
+        default=None,
+        help="Runs to compare (predictions file names). If not specified, all stored runs."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Run the others are compared against. Default: the first run."
+    )
+    parser.add_argument(
+        "--metrics",
+        nargs="+",
+        default=None,
+        help="Metrics to compare (default: every metric all runs have per-sample scores for)."
+    )
+    parser.add_argument(
+        "--num_resamples",
+        type=int,
+        default=10000,
+        help="Bootstrap resamples."
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="Confidence level of the intervals."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the bootstrap resampling."
+    )
+    parser.add_argument(
+        "--store_path",
+        type=str,
+        default=str(METRICS_STORE_PATH),
+        help="Metrics store written by main.py --store."
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Where to write the comparison JSON."
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="List the stored runs and exit."
+    )
+
+    args = parser.parse_args()
+
+    if args.list:
+        store = MetricsStore(args.store_path)
+        for run in store.runs():
+            print(f"{run['run_id']:<36}{run['model'] or '':<24}{run['num_samples']:>8} samples  "
+                  f"evaluated {run['evaluated_at']}  [{', '.join(store.columns(run['run_id']))}]")
+        store.close()
+    else:
+        run_comparison(
+            runs=args.runs,
+            baseline=args.baseline,
+            metrics=args.metrics,
+            num_resamples=args.num_resamples,
+            confidence=args.confidence,
+            seed=args.seed,
+            store_path=Path(args.store_path),
+            output_path=Path(args.output) if args.output else None,
+        )
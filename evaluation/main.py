@@ -1,15 +1,41 @@
+import time
 from pathlib import Path
-from src import RadiologyEvaluator, save_results, load_predictions, get_latest_predictions
+from src import (
+    RadiologyEvaluator,
+    ParallelEvaluator,
+    OnlineEvaluator,
+    read_stream,
+    MetricsStore,
+    per_sample_columns,
+    sample_keys,
+    save_results,
+    load_predictions,
+    get_latest_predictions,
+    UniqueStudies
+)
 
 # --- PATHS ---
 REPO_ROOT = Path(__file__).resolve().parent.parent
 PREDICTIONS_DIR = REPO_ROOT / "results" / "predictions"
 METRICS_DIR = REPO_ROOT / "results" / "metrics"
+SCORE_CACHE_PATH = Path(__file__).resolve().parent / ".cache" / "scores.sqlite"
+METRICS_STORE_PATH = METRICS_DIR / "per_sample.sqlite"
 
 
 def run_evaluation(
     predictions_file: Path | None = None,
     metrics: list[str] | None = None,
+    use_cache: bool = False,
+    cache_max_entries: int = 1_000_000,
+    parallel: bool = False,
+    max_workers: int = 2,
+    memory_budget_gb: float = 24.0,
+    metrics_dir: Path = METRICS_DIR,
+    chunk_size: int | None = None,
+    unique_studies: bool = False,
+    store: bool = False,
+    store_path: Path = METRICS_STORE_PATH,
+    bleu_backend: str = "radeval",
 ):
     """
     Run evaluation on predictions file.
@@ -17,7 +43,27 @@ def run_evaluation(
     Args:
         predictions_file: Path to predictions JSON. If None, uses latest.
         metrics: List of metrics to compute. If None, computes all.
+        use_cache: Reuse per-sample scores from the on-disk score cache.
+        cache_max_entries: Score cache size before LRU eviction.
+        parallel: Run each metric in its own worker process.
+        max_workers: Metrics evaluated concurrently in parallel mode.
+        memory_budget_gb: Combined estimated metric memory allowed at once.
+        metrics_dir: Directory for the metrics JSON.
+        chunk_size: Stream the predictions through the metrics in chunks of
+                    this many samples instead of one call over everything.
+        unique_studies: Score each study (uid) once, using its first record.
+        store: Keep every sample's scores in the metrics store (store_path)
+               for compare.py. Per-sample scores are read back from the
+               score cache, so this turns use_cache on.
+        store_path: SQLite metrics store.
+        bleu_backend: Scorer of the bleu metric: radeval, or native (same
+                      BLEU from vectorized n-gram counts, without RadEval).
     """
+    if store:
+        use_cache = True
+    if chunk_size is not None and parallel:
+        raise ValueError("--chunk_size cannot be combined with --parallel")
+    
     # Get predictions file
     if predictions_file is None:
         predictions_file = get_latest_predictions(PREDICTIONS_DIR)
@@ -26,40 +72,159 @@ def run_evaluation(
     # Load predictions
     data = load_predictions(predictions_file)
     print(f"Loaded {data['metadata']['num_samples']} samples from {data['metadata']['model']}")
-    
-    # Extract references and hypotheses
-    refs = [p["ground_truth"] for p in data["predictions"]]
-    hyps = [p["prediction"] for p in data["predictions"]]
+    if unique_studies:
+        data["predictions"] = UniqueStudies(data["predictions"])
+        print(f"Scoring {len(data['predictions'])} unique studies")
     
     # Initialize evaluator
     print(f"\nInitializing evaluator with metrics: {metrics or 'all'}")
-    evaluator = RadiologyEvaluator(metrics=metrics)
+    evaluator_kwargs = {
+        "cache_path": SCORE_CACHE_PATH if use_cache else None,
+        "cache_max_entries": cache_max_entries,
+        "bleu_backend": bleu_backend
+    }
+    if parallel:
+        evaluator = ParallelEvaluator(
+            metrics=metrics,
+            max_workers=max_workers,
+            memory_budget_gb=memory_budget_gb,
+            **evaluator_kwargs
+        )
+    else:
+        evaluator = RadiologyEvaluator(metrics=metrics, **evaluator_kwargs)
     
     # Run evaluation
     print("Computing metrics...")
-    results = evaluator(references=refs, predictions=hyps)
+    start = time.perf_counter()
+    if chunk_size is not None:
+        results = evaluator.evaluate_chunked(data["predictions"], chunk_size=chunk_size)
+    else:
+        # Extract references and hypotheses
+        refs = [p["ground_truth"] for p in data["predictions"]]
+        hyps = [p["prediction"] for p in data["predictions"]]
+        results = evaluator(references=refs, predictions=hyps)
+    evaluate_s = round(time.perf_counter() - start, 3)
     
     # Save results
+    extra_metadata = {"timing": {"evaluate_s": evaluate_s}, "num_scored": len(data["predictions"])}
+    if not parallel:
+        extra_metadata["timing"]["scorer_load_s"] = evaluator.load_times
+    if use_cache:
+        extra_metadata["score_cache"] = evaluator.cache_stats()
+    if parallel:
+        extra_metadata["metric_runs"] = evaluator.runs
     metrics_path = save_results(
         metrics=results,
-        output_dir=METRICS_DIR,
+        output_dir=metrics_dir,
         model_name=data["metadata"]["model"],
         metrics_used=metrics or evaluator.AVAILABLE_METRICS,
-        predictions_file=str(predictions_file)
+        predictions_file=str(predictions_file),
+        extra_metadata=extra_metadata
     )
     
+    if store:
+        # Every per-sample score is in the score cache by now
+        stored_metrics = metrics or evaluator.AVAILABLE_METRICS
+        if parallel:
+            stored_metrics = [m for m in stored_metrics if evaluator.runs[m]["status"] == "ok"]
+        scorer = evaluator if not parallel else RadiologyEvaluator(metrics=stored_metrics, **evaluator_kwargs)
+        records = list(data["predictions"])
+        columns = per_sample_columns(
+            scorer,
+            stored_metrics,
+            [r["ground_truth"] for r in records],
+            [r["prediction"] for r in records]
+        )
+        metrics_store = MetricsStore(store_path)
+        metrics_store.add_run(
+            Path(predictions_file).stem,
+            sample_keys(records),
+            columns,
+            predictions_file=str(predictions_file),
+            model=data["metadata"]["model"],
+            metadata={"metrics": results, "unique_studies": unique_studies}
+        )
+        metrics_store.close()
+        print(f"Stored {len(columns)} per-sample score columns for {len(records)} samples in: {store_path}")
+    
     # Print summary
     print("\n" + "=" * 50)
     print("EVALUATION RESULTS")
     print("=" * 50)
     for metric, value in results.items():
         print(f"  {metric}: {value}")
+    if parallel:
+        for metric, run in evaluator.runs.items():
+            if run["status"] != "ok":
+                print(f"  {metric}: FAILED ({run['error'].strip().splitlines()[-1]})")
     print("=" * 50)
     print(f"\nMetrics saved to: {metrics_path}")
     
     return results
 
 
+def run_online_evaluation(
+    predictions_file: Path,
+    metrics: list[str] | None = None,
+    micro_batch_size: int = 32,
+    cache_max_entries: int = 1_000_000,
+    metrics_dir: Path = METRICS_DIR,
+    unique_studies: bool = False,
+    bleu_backend: str = "radeval",
+    stream=None
+):
+    """
+    Evaluate predictions while inference is still writing them.
+    
+    Records arrive as JSON lines on stream (stdin by default; see
+    training/src/online_eval.py for the producer) and are scored in
+    micro-batches, with running estimates appended to
+    metrics_dir/online_<predictions file>.jsonl. At EOF the finished
+    predictions file is evaluated with run_evaluation(use_cache=True), whose
+    per-sample scores are by then all in the score cache, so the final
+    metrics are exactly those of an offline ``--cache`` evaluation of the
+    same file, at the cost of corpus BLEU, semb and radcliq only.
+    
+    Args:
+        predictions_file: Predictions file being written by inference.
+        metrics: List of metrics to compute. If None, computes all.
+        micro_batch_size: Samples scored per online update.
+        cache_max_entries: Score cache size before LRU eviction.
+        metrics_dir: Directory for the progress and metrics files.
+        unique_studies: Score each study (uid) once, using its first record.
+        bleu_backend: Scorer of the bleu metric: radeval or native.
+        stream: Line iterable to read records from instead of stdin.
+    """
+    predictions_file = Path(predictions_file)
+    progress_path = Path(metrics_dir) / f"online_{predictions_file.stem}.jsonl"
+    online = OnlineEvaluator(
+        metrics=metrics,
+        progress_path=progress_path,
+        micro_batch_size=micro_batch_size,
+        cache_path=SCORE_CACHE_PATH,
+        cache_max_entries=cache_max_entries,
+        bleu_backend=bleu_backend
+    )
+    records = read_stream(stream)
+    if unique_studies:
+        records = UniqueStudies(records)
+    
+    print(f"Scoring predictions online as they arrive (micro-batches of {micro_batch_size})")
+    estimates = online.consume(records)
+    print(f"Stream closed after {online.total} samples; running estimates: {estimates}")
+    print(f"Progress written to: {progress_path}")
+    
+    return run_evaluation(
+        predictions_file=predictions_file,
+        metrics=metrics,
+        use_cache=True,
+        cache_max_entries=cache_max_entries,
+        metrics_dir=metrics_dir,
+        unique_studies=unique_studies,
+        bleu_backend=bleu_backend,
+    )
+
+
 if __name__ == "__main__":
     import argparse
     
@@ -76,12 +241,102 @@ if __name__ == "__main__":
         default=None,
         help="Metrics to compute: radcliq, bleu, bertscore, semb, radgraph, ratescore, green"
     )
+    parser.add_argument(
+        "--metrics_dir",
+        type=str,
+        default=str(METRICS_DIR),
+        help="Directory to write the metrics JSON to."
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=None,
+        help="Evaluate the predictions file as a stream of chunks of this many samples."
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse cached per-sample scores and only score new (reference, prediction) pairs."
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Run each metric in its own worker process."
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=2,
+        help="Metrics evaluated concurrently with --parallel."
+    )
+    parser.add_argument(
+        "--memory_budget_gb",
+        type=float,
+        default=24.0,
+        help="Combined estimated memory of concurrently running metrics with --parallel."
+    )
+    parser.add_argument(
+        "--cache_max_entries",
+        type=int,
+        default=1_000_000,
+        help="Maximum score cache entries before least recently used ones are evicted."
+    )
+    parser.add_argument(
+        "--unique_studies",
+        action="store_true",
+        help="Score each study once (first record per uid) instead of once per projection."
+    )
+    parser.add_argument(
+        "--store",
+        action="store_true",
+        help="Keep per-sample scores in the metrics store for compare.py (implies --cache)."
+    )
+    parser.add_argument(
+        "--online",
+        action="store_true",
+        help="Score records streamed on stdin while inference runs, then evaluate --predictions_file."
+    )
+    parser.add_argument(
+        "--micro_batch_size",
+        type=int,
+        default=32,
+        help="Samples per running-estimate update with --online."
+    )
+    parser.add_argument(
+        "--bleu_backend",
+        choices=RadiologyEvaluator.BLEU_BACKENDS,
+        default="radeval",
+        help="Scorer of the bleu metric: RadEval, or the native vectorized n-gram scorer (same BLEU, much faster)."
+    )
     
     args = parser.parse_args()
     
     predictions_path = Path(args.predictions_file) if args.predictions_file else None
     
-    run_evaluation(
-        predictions_file=predictions_path,
-        metrics=args.metrics,
-    )
\ No newline at end of file
+    if args.online:
+        if predictions_path is None:
+            parser.error("--online requires --predictions_file")
+        run_online_evaluation(
+            predictions_file=predictions_path,
+            metrics=args.metrics,
+            micro_batch_size=args.micro_batch_size,
+            cache_max_entries=args.cache_max_entries,
+            metrics_dir=Path(args.metrics_dir),
+            unique_studies=args.unique_studies,
+            bleu_backend=args.bleu_backend,
+        )
+    else:
+        run_evaluation(
+            predictions_file=predictions_path,
+            metrics=args.metrics,
+            use_cache=args.cache,
+            cache_max_entries=args.cache_max_entries,
+            parallel=args.parallel,
+            max_workers=args.max_workers,
+            memory_budget_gb=args.memory_budget_gb,
+            metrics_dir=Path(args.metrics_dir),
+            chunk_size=args.chunk_size,
+            unique_studies=args.unique_studies,
+            store=args.store,
+            bleu_backend=args.bleu_backend,
+        )
\ No newline at end of file
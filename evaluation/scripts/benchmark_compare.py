@@ -0,0 +1,68 @@
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from src import MetricsStore, compare_runs
+from src.store import BLEU_COLUMNS
+
+# Score columns of the per-sample metrics (semb and radcliq have none)
+SCORE_COLUMNS = ["bertscore", "radgraph_simple", "radgraph_partial", "radgraph_complete", "ratescore", "green"]
+
+
+def fill_store(store: MetricsStore, num_runs: int, num_samples: int, seed: int = 0):
+    """Synthetic runs: per-sample scores in [0, 1] and plausible BLEU n-gram counts."""
+    rng = np.random.default_rng(seed)
+    keys = [f"sample_{i}.png" for i in range(num_samples)]
+    for run in range(num_runs):
+        columns = {name: rng.beta(2, 5, num_samples) + 0.002 * run for name in SCORE_COLUMNS}
+        hyp_len = rng.integers(20, 80, num_samples)
+        columns["bleu:hyp_len"] = hyp_len
+        columns["bleu:ref_len"] = rng.integers(20, 80, num_samples)
+        for k in range(1, 5):
+            guess = np.maximum(hyp_len - (k - 1), 0)
+            columns[f"bleu:guess_{k}"] = guess
+            columns[f"bleu:correct_{k}"] = rng.binomial(guess, 0.4 / k)
+        store.add_run(f"run_{run:03d}", keys, columns, model="synthetic")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time the metrics store and the bootstrap comparison at scale")
+    parser.add_argument("--num_runs", type=int, default=30)
+    parser.add_argument("--num_samples", type=int, default=5000)
+    parser.add_argument("--num_resamples", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MetricsStore(Path(tmp) / "per_sample.sqlite")
+        start = time.perf_counter()
+        fill_store(store, args.num_runs, args.num_samples)
+        write_s = time.perf_counter() - start
+        num_rows = args.num_runs * args.num_samples * (len(SCORE_COLUMNS) + len(BLEU_COLUMNS))
+
+        run_ids = [run["run_id"] for run in store.runs()]
+        start = time.perf_counter()
+        store.load(run_ids, SCORE_COLUMNS + BLEU_COLUMNS)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        comparison = compare_runs(store, run_ids, num_resamples=args.num_resamples)
+        compare_s = time.perf_counter() - start
+        store.close()
+
+    print(f"\n{args.num_runs} runs x {args.num_samples} samples x {len(SCORE_COLUMNS)} score metrics + BLEU "
+          f"({num_rows:,} stored scores)")
+    print(f"  store write:  {write_s:.2f}s ({num_rows / write_s:,.0f} scores/s)")
+    print(f"  store load:   {load_s:.2f}s")
+    print(f"  comparison:   {compare_s:.2f}s for {args.num_resamples} paired resamples "
+          f"(incl. load), {len(comparison['metrics'])} metrics")
+    last = run_ids[-1]
+    print(f"  e.g. bleu {last} vs {run_ids[0]}: {comparison['metrics']['bleu'][last]}")
@@ -0,0 +1,124 @@
+import sys
+import json
+import time
+import random
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from src import LexicalScorer, load_predictions
+from src.streaming import CorpusBleu
+
+REPO_ROOT = BASE_DIR.parent
+PREDICTIONS_DIR = REPO_ROOT / "results" / "predictions"
+METRICS_DIR = REPO_ROOT / "results" / "metrics"
+
+
+def stored_radeval_bleu() -> dict[str, float]:
+    """RadEval BLEU of every predictions file that has one in results/metrics."""
+    scores = {}
+    for path in sorted(METRICS_DIR.glob("evaluation_metrics_*.json")):
+        with open(path) as f:
+            data = json.load(f)
+        if "bleu" in data.get("metrics", {}):
+            scores[Path(data["metadata"]["predictions_file"]).name] = data["metrics"]["bleu"]
+    return scores
+
+
+def check_predictions(tolerance: float):
+    """Native BLEU against CorpusBleu and the RadEval scores stored for the real predictions files."""
+    radeval = stored_radeval_bleu()
+    scorer = LexicalScorer()
+    for path in sorted(PREDICTIONS_DIR.glob("predictions_*.json")):
+        records = load_predictions(path)["predictions"]
+        refs = [r["ground_truth"] for r in records]
+        hyps = [r["prediction"] for r in records]
+        native = scorer.corpus_bleu(refs, hyps)
+        bleu = CorpusBleu()
+        bleu.add(refs, hyps)
+        line = f"  {path.name}: native {native:.6f}, CorpusBleu {bleu.score():.6f}"
+        if path.name in radeval:
+            status = "ok" if abs(round(native, 4) - radeval[path.name]) <= tolerance else "MISMATCH"
+            line += f", RadEval {radeval[path.name]} ({status})"
+        print(line)
+
+
+def synthetic_pairs(num_pairs: int, vocab_size: int = 2000, seed: int = 0) -> tuple[list[str], list[str]]:
+    """Report-length pairs where the hypothesis reuses runs of the reference (so n-grams match)."""
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocab_size)]
+    refs, hyps = [], []
+    for _ in range(num_pairs):
+        ref = rng.choices(words, k=rng.randint(20, 80))
+        hyp = []
+        while len(hyp) < rng.randint(20, 80):
+            if rng.random() < 0.5:
+                start = rng.randrange(len(ref))
+                hyp.extend(ref[start:start + rng.randint(1, 6)])
+            else:
+                hyp.extend(rng.choices(words, k=rng.randint(1, 4)))
+        refs.append(" ".join(ref))
+        hyps.append(" ".join(hyp))
+    return refs, hyps
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check and time the native lexical metrics against CorpusBleu")
+    parser.add_argument("--num_pairs", type=int, default=100_000)
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    print("Real predictions files:")
+    check_predictions(args.tolerance)
+
+    refs, hyps = synthetic_pairs(args.num_pairs)
+    print(f"\n{args.num_pairs:,} synthetic pairs")
+
+    def python_bleu(refs, hyps):
+        bleu = CorpusBleu()
+        bleu.add(refs, hyps)
+        return bleu.score()
+
+    expected, python_s = timed(python_bleu, refs, hyps)
+    print(f"  CorpusBleu (Counter per pair):  {python_s:.2f}s ({args.num_pairs / python_s:,.0f} pairs/s)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = Path(tmp) / "lexical.sqlite"
+        cold = LexicalScorer(cache_path)
+        native, cold_s = timed(cold.corpus_bleu, refs, hyps)
+        cold.close()
+        print(f"  native, cold reference cache:   {cold_s:.2f}s ({args.num_pairs / cold_s:,.0f} pairs/s)")
+
+        # A new process: vocabulary and reference ids come from SQLite
+        warm = LexicalScorer(cache_path)
+        native_warm, warm_s = timed(warm.corpus_bleu, refs, hyps)
+        print(f"  native, warm reference cache:   {warm_s:.2f}s ({args.num_pairs / warm_s:,.0f} pairs/s), "
+              f"{warm.cache_stats()}")
+
+        ref_ids, _ = timed(warm.tokenize_references, refs)
+        hyp_ids, tokenize_s = timed(warm.tokenize, hyps)
+        _, stats_s = timed(warm.ngram_stats, ref_ids, hyp_ids)
+        print(f"  native n-gram counting only:    {stats_s:.2f}s (hypothesis tokenization {tokenize_s:.2f}s)")
+
+        sentence, sentence_s = timed(warm.sentence_bleu, refs, hyps)
+        print(f"  native sentence BLEU:           {sentence_s:.2f}s")
+        subset = slice(0, 2000)
+        rouge, rouge_s = timed(warm.rouge_l, refs[subset], hyps[subset])
+        print(f"  native ROUGE-L (2,000 pairs):   {rouge_s:.2f}s, mean F1 {np.mean(rouge):.4f}")
+        warm.close()
+
+    print(f"\n  corpus BLEU: CorpusBleu {expected:.6f}, native {native:.6f} / {native_warm:.6f} "
+          f"(diff {abs(native - expected):.2e}), speedup {python_s / warm_s:.1f}x")
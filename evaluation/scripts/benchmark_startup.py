@@ -0,0 +1,79 @@
+import sys
+import time
+import tempfile
+import subprocess
+import statistics
+from pathlib import Path
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+REPO_ROOT = BASE_DIR.parent
+DEFAULT_PREDICTIONS = REPO_ROOT / "results" / "predictions" / "predictions_20260203_200349.json"
+
+
+def phase_breakdown(predictions_file: Path, metric: str) -> dict:
+    """Import / construct / first-score / warm-score times in this process."""
+    t0 = time.perf_counter()
+    sys.path.insert(0, str(BASE_DIR))
+    from src import RadiologyEvaluator, load_predictions
+    t1 = time.perf_counter()
+
+    data = load_predictions(predictions_file)
+    refs = [p["ground_truth"] for p in data["predictions"]]
+    hyps = [p["prediction"] for p in data["predictions"]]
+
+    t2 = time.perf_counter()
+    evaluator = RadiologyEvaluator(metrics=[metric])
+    t3 = time.perf_counter()
+    evaluator(references=refs, predictions=hyps)
+    t4 = time.perf_counter()
+    evaluator(references=refs, predictions=hyps)
+    t5 = time.perf_counter()
+
+    return {
+        "import_src": t1 - t0,
+        "construct_evaluator": t3 - t2,
+        "time_to_first_score": t4 - t0,
+        "first_score_call": t4 - t3,
+        "warm_score_call": t5 - t4,
+    }
+
+
+def cli_wall_time(predictions_file: Path, metric: str, repeats: int) -> list[float]:
+    """End-to-end wall time of `python main.py --metrics <metric>`."""
+    times = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run(
+                [
+                    sys.executable, str(BASE_DIR / "main.py"),
+                    "--metrics", metric,
+                    "--predictions_file", str(predictions_file),
+                    "--metrics_dir", tmp
+                ],
+                check=True,
+                stdout=subprocess.DEVNULL
+            )
+            times.append(time.perf_counter() - start)
+    return times
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark evaluation startup for a single cheap metric")
+    parser.add_argument("--predictions_file", type=str, default=str(DEFAULT_PREDICTIONS))
+    parser.add_argument("--metric", type=str, default="bleu")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    predictions_file = Path(args.predictions_file)
+
+    times = cli_wall_time(predictions_file, args.metric, args.repeats)
+    print(f"CLI `main.py --metrics {args.metric}` wall time over {args.repeats} runs:")
+    print(f"  median {statistics.median(times):.2f}s  min {min(times):.2f}s  max {max(times):.2f}s")
+
+    print("In-process phases:")
+    for phase, seconds in phase_breakdown(predictions_file, args.metric).items():
+        print(f"  {phase:<22} {seconds:8.3f}s")
@@ -1,15 +1,34 @@
 from .evaluator import RadiologyEvaluator
+from .parallel import ParallelEvaluator
+from .online import OnlineEvaluator, read_stream
+from .store import MetricsStore, per_sample_columns, sample_keys
+from .compare import compare_runs
+from .lexical import LexicalScorer
 from .utils import (
     save_results,
     save_predictions,
     load_predictions,
-    get_latest_predictions
+    iter_predictions,
+    get_latest_predictions,
+    PredictionsWriter,
+    UniqueStudies
 )
 
 __all__ = [
     "RadiologyEvaluator",
+    "ParallelEvaluator",
+    "OnlineEvaluator",
+    "read_stream",
+    "MetricsStore",
+    "per_sample_columns",
+    "sample_keys",
+    "compare_runs",
+    "LexicalScorer",
     "save_results",
     "save_predictions",
     "load_predictions",
-    "get_latest_predictions"
+    "iter_predictions",
+    "get_latest_predictions",
+    "PredictionsWriter",
+    "UniqueStudies"
 ]
\ No newline at end of file
@@ -0,0 +1,99 @@
+import json
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+
+
+class ScoreCache:
+    """
+    Persistent SQLite cache of metric scores.
+
+    Each entry maps a key (hash of metric name, metric config and the
+    reference/hypothesis text) to the scores dict RadEval returned for it.
+    Entries track their last use; once the cache grows past max_entries the
+    least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int = 1_000_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " key TEXT PRIMARY KEY,"
+            " metric TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores(last_used)")
+        self._conn.commit()
+
+        # Per-metric counters for the current process
+        self.hits = {}
+        self.misses = {}
+
+    @staticmethod
+    def make_key(metric: str, config: dict, reference: str, hypothesis: str) -> str:
+        payload = json.dumps([metric, config, reference, hypothesis], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get_many(self, metric: str, keys: list[str]) -> dict[str, dict]:
+        """Look up keys, returning {key: scores} for the ones that are cached."""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT key, value FROM scores WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            found.update((key, json.loads(value)) for key, value in rows)
+
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE scores SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+            )
+            self._conn.commit()
+
+        self.hits[metric] = self.hits.get(metric, 0) + len(found)
+        self.misses[metric] = self.misses.get(metric, 0) + len(unique) - len(found)
+        return found
+
+    def put_many(self, metric: str, items: dict[str, dict]):
+        """Store new scores and evict the least recently used entries if over budget."""
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO scores (key, metric, value, last_used) VALUES (?, ?, ?, ?)",
+            [(key, metric, json.dumps(value), now) for key, value in items.items()]
+        )
+        self._conn.commit()
+        self.evict()
+
+    def evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM scores WHERE key IN "
+                "(SELECT key FROM scores ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+        return {
+            "path": str(self.path),
+            "entries": count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def close(self):
+        self._conn.close()
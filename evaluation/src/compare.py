@@ -0,0 +1,125 @@
+import numpy as np
+
+from .store import BLEU_COLUMNS, MetricsStore
+from .streaming import CorpusBleu
+
+
+def resample_counts(num_samples: int, num_resamples: int, rng: np.random.Generator, memory_mb: int = 512):
+    """
+    Bootstrap resamples as blocks of (resamples, num_samples) count matrices.
+
+    Row r holds how often each sample was drawn in resample r, so any
+    resampled sum is one matrix product. Blocks are as large as memory_mb
+    allows (thousands of resamples for thousands of samples). Counts are
+    float64 so products with summed n-gram counts stay exact.
+    """
+    # int64 draws and bincount plus the float64 counts: 24 bytes per entry
+    block = max(1, memory_mb * 2**20 // (24 * num_samples))
+    for start in range(0, num_resamples, block):
+        size = min(block, num_resamples - start)
+        draws = rng.integers(0, num_samples, size=(size, num_samples))
+        draws += np.arange(size)[:, None] * num_samples
+        counts = np.bincount(draws.ravel(), minlength=size * num_samples)
+        yield counts.reshape(size, num_samples).astype(np.float64)
+
+
+def _matches(column: str, metrics: list[str] | None) -> bool:
+    return metrics is None or any(column.startswith(metric) for metric in metrics)
+
+
+def compare_runs(
+    store: MetricsStore,
+    run_ids: list[str],
+    baseline: str | None = None,
+    metrics: list[str] | None = None,
+    num_resamples: int = 10000,
+    confidence: float = 0.95,
+    seed: int = 0
+) -> dict:
+    """
+    Paired bootstrap comparison of runs against a baseline run.
+
+    Only samples every run scored are used, and every run is resampled
+    with the same draws (paired). Per-sample metrics are compared on their
+    mean; BLEU on corpus BLEU recomputed from the resampled n-gram counts.
+    All runs, metrics and resamples go through one matrix product per
+    block of resamples.
+
+    For each metric and run: the score with its confidence interval, and
+    against the baseline the difference with its interval, a two-sided
+    bootstrap p-value, the share of resamples where the run is better, and
+    per-sample win/tie/loss rates (sentence BLEU for BLEU).
+    """
+    baseline = baseline or run_ids[0]
+    if baseline not in run_ids:
+        run_ids = [baseline, *run_ids]
+    # Baseline first: differences are taken against row 0
+    run_ids = [baseline, *(run for run in run_ids if run != baseline)]
+
+    available = set.intersection(*(set(store.columns(run)) for run in run_ids))
+    mean_columns = sorted(c for c in available if not c.startswith("bleu:") and _matches(c, metrics))
+    use_bleu = set(BLEU_COLUMNS) <= available and _matches("bleu", metrics)
+    columns = mean_columns + (BLEU_COLUMNS if use_bleu else [])
+    if not columns:
+        raise ValueError(f"No per-sample scores shared by runs {run_ids} for metrics {metrics or 'all'}")
+
+    sample_ids, matrices = store.load(run_ids, columns)
+    num_samples, num_runs = len(sample_ids), len(run_ids)
+    if num_samples == 0:
+        raise ValueError(f"Runs {run_ids} have no samples in common")
+
+    # (samples, columns x runs): one resampled sum per column and run. float64
+    # keeps corpus-sized n-gram count sums exact (float32 does so only to 2**24)
+    flat = np.concatenate([matrices[c].T for c in columns], axis=1)
+    sums = np.empty((num_resamples, flat.shape[1]), dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    row = 0
+    for counts in resample_counts(num_samples, num_resamples, rng):
+        sums[row:row + len(counts)] = counts @ flat
+        row += len(counts)
+    sums = sums.reshape(num_resamples, len(columns), num_runs)
+
+    # statistic -> (resampled values (resamples, runs), observed (runs,), per-sample values (runs, samples))
+    statistics = {}
+    for i, column in enumerate(mean_columns):
+        statistics[column] = (sums[:, i] / num_samples, matrices[column].mean(axis=1), matrices[column])
+    if use_bleu:
+        resampled = CorpusBleu.score_stats(sums[:, len(mean_columns):].transpose(0, 2, 1))
+        per_sample = np.stack([matrices[c] for c in BLEU_COLUMNS], axis=-1)
+        statistics["bleu"] = (resampled, CorpusBleu.score_stats(per_sample.sum(axis=1)),
+                              CorpusBleu.score_stats(per_sample))
+
+    tail = (1 - confidence) / 2 * 100
+    results = {}
+    for name, (resampled, observed, per_sample) in statistics.items():
+        interval = np.percentile(resampled, [tail, 100 - tail], axis=0)
+        deltas = resampled - resampled[:, :1]
+        delta_interval = np.percentile(deltas, [tail, 100 - tail], axis=0)
+        p_lower, p_upper = (deltas <= 0).mean(axis=0), (deltas >= 0).mean(axis=0)
+        wins = (per_sample > per_sample[:1]).mean(axis=1)
+        losses = (per_sample < per_sample[:1]).mean(axis=1)
+
+        results[name] = {}
+        for r, run in enumerate(run_ids):
+            entry = {"score": round(float(observed[r]), 6), "ci": [round(float(v), 6) for v in interval[:, r]]}
+            if r > 0:
+                entry.update(
+                    delta=round(float(observed[r] - observed[0]), 6),
+                    delta_ci=[round(float(v), 6) for v in delta_interval[:, r]],
+                    p_value=round(float(min(1.0, 2 * min(p_lower[r], p_upper[r]))), 4),
+                    prob_better=round(float((deltas[:, r] > 0).mean()), 4),
+                    win_rate=round(float(wins[r]), 4),
+                    tie_rate=round(float(1 - wins[r] - losses[r]), 4),
+                    loss_rate=round(float(losses[r]), 4)
+                )
+            results[name][run] = entry
+
+    return {
+        "baseline": baseline,
+        "runs": run_ids,
+        "num_samples": num_samples,
+        "num_resamples": num_resamples,
+        "confidence": confidence,
+        "seed": seed,
+        "metrics": results
+    }
@@ -1,4 +1,7 @@
 import os
+import json
+import time
+import importlib.metadata
 from pathlib import Path
 
 # --- CONFIG: Set paths for helper libraries ---
@@ -8,7 +11,30 @@ RESOURCES_DIR = BASE_DIR / ".resources"
 os.environ["NLTK_DATA"] = str(RESOURCES_DIR / "nltk_data")
 os.environ["STANZA_RESOURCES_DIR"] = str(RESOURCES_DIR / "stanza_resources")
 
-from RadEval import RadEval
+from .cache import ScoreCache
+from .lexical import LexicalScorer
+from .streaming import CorpusBleu, iter_chunks
+
+# Token ids of references seen by the native BLEU backend
+LEXICAL_CACHE_PATH = BASE_DIR / ".cache" / "lexical.sqlite"
+
+
+# RadEval scorers built so far, memoized for the process lifetime
+_SCORERS = {}
+
+
+def get_scorer(metric_flag: str, **kwargs):
+    """
+    RadEval instance computing a single metric, built on first use.
+    
+    RadEval (and its model stack) is only imported here, so importing this
+    module, or evaluating metrics that are never used, costs nothing.
+    """
+    key = (metric_flag, json.dumps(kwargs, sort_keys=True, default=str))
+    if key not in _SCORERS:
+        from RadEval import RadEval
+        _SCORERS[key] = RadEval(**{metric_flag: True}, **kwargs)
+    return _SCORERS[key]
 
 
 class RadiologyEvaluator:
@@ -29,9 +55,33 @@ class RadiologyEvaluator:
         "radcliq", "bleu", "bertscore", "semb", "radgraph", "ratescore", "green"
     ]
     
+    # RadEval flag enabling each metric
+    METRIC_FLAGS = {
+        "radcliq": "do_radcliq",
+        "bleu": "do_bleu",
+        "bertscore": "do_bertscore",
+        "semb": "do_chexbert",
+        "radgraph": "do_radgraph",
+        "ratescore": "do_ratescore",
+        "green": "do_green",
+    }
+    
+    # Metrics whose corpus score is the mean of per-sample scores. These are
+    # cached per (reference, hypothesis) pair; the others are cached for the
+    # whole corpus at once: corpus BLEU, CheXbert F1, and RadCliQ-v1, whose
+    # BERTScore component weights tokens by IDF over all the references.
+    PER_SAMPLE_METRICS = {"bertscore", "radgraph", "ratescore", "green"}
+    
+    # "radeval": RadEval's coco-caption BLEU. "native": the same BLEU from
+    # LexicalScorer's vectorized n-gram counts, without loading RadEval.
+    BLEU_BACKENDS = ["radeval", "native"]
+    
     def __init__(
         self,
         metrics: list[str] | None = None,
+        cache_path: str | Path | None = None,
+        cache_max_entries: int = 1_000_000,
+        bleu_backend: str = "radeval",
         **kwargs
     ):
         """
@@ -40,6 +90,9 @@ class RadiologyEvaluator:
         Args:
             metrics: List of metrics to compute. If None, computes all metrics.
                      Options: radcliq, bleu, bertscore, semb, radgraph, ratescore, green
+            cache_path: SQLite score cache. If set, only uncached samples are scored.
+            cache_max_entries: Entries kept in the cache before LRU eviction
+            bleu_backend: Scorer of the bleu metric: radeval or native
             **kwargs: Additional arguments passed to RadEval
         """
         if metrics is None:
@@ -49,22 +102,39 @@ class RadiologyEvaluator:
         invalid = set(metrics) - set(self.AVAILABLE_METRICS)
         if invalid:
             raise ValueError(f"Invalid metrics: {invalid}. Available: {self.AVAILABLE_METRICS}")
+        if bleu_backend not in self.BLEU_BACKENDS:
+            raise ValueError(f"Invalid bleu_backend: {bleu_backend}. Available: {self.BLEU_BACKENDS}")
         
         self.metrics = metrics
+        self.bleu_backend = bleu_backend
+        self._kwargs = kwargs
+        self._lexical = None
+        self.cache = ScoreCache(cache_path, max_entries=cache_max_entries) if cache_path else None
         
-        # Build RadEval config
-        eval_config = {
-            "do_radcliq": "radcliq" in metrics,
-            "do_bleu": "bleu" in metrics,
-            "do_bertscore": "bertscore" in metrics,
-            "do_chexbert": "semb" in metrics,
-            "do_radgraph": "radgraph" in metrics,
-            "do_ratescore": "ratescore" in metrics,
-            "do_green": "green" in metrics,
-        }
-        eval_config.update(kwargs)
+        # Seconds spent building each metric's scorer (0 if already memoized)
+        self.load_times = {}
+    
+    def _scorer(self, metric: str, per_sample: bool = False):
+        """
+        Per-metric RadEval, loaded the first time the metric is scored.
         
-        self._evaluator = RadEval(**eval_config)
+        With per_sample, RadEval returns an unrounded list of per-sample
+        scores for each of the metric's keys instead of their rounded mean.
+        """
+        kwargs = {**self._kwargs, "do_per_sample": True} if per_sample else self._kwargs
+        if metric not in self.load_times:
+            start = time.perf_counter()
+            get_scorer(self.METRIC_FLAGS[metric], **kwargs)
+            self.load_times[metric] = round(time.perf_counter() - start, 3)
+        return get_scorer(self.METRIC_FLAGS[metric], **kwargs)
+    
+    def lexical(self) -> LexicalScorer:
+        """Native BLEU scorer, with the persistent reference token cache."""
+        if self._lexical is None:
+            start = time.perf_counter()
+            self._lexical = LexicalScorer(LEXICAL_CACHE_PATH)
+            self.load_times.setdefault("bleu", round(time.perf_counter() - start, 3))
+        return self._lexical
     
     def evaluate(
         self,
@@ -86,8 +156,155 @@ class RadiologyEvaluator:
                 f"Length mismatch: {len(references)} references vs {len(predictions)} predictions"
             )
         
-        results = self._evaluator(refs=references, hyps=predictions)
+        results = {}
+        for metric in self.metrics:
+            results.update(self._score_metric(metric, references, predictions))
+        return results
+    
+    def evaluate_chunked(self, records, chunk_size: int = 256) -> dict:
+        """
+        Evaluate a stream of prediction records in fixed-size chunks.
+        
+        Only one chunk of texts is sent to a metric at a time, so memory and
+        metric batch sizes stay bounded. Corpus scores are aggregated exactly:
+        per-sample metrics as the mean of their unrounded per-sample scores, BLEU from
+        n-gram counts accumulated across chunks. CheXbert F1 (semb) and
+        RadCliQ-v1 are not decomposable, so their texts are buffered and
+        scored once at the end.
+        
+        Args:
+            records: Iterable of dicts with "ground_truth" and "prediction"
+            chunk_size: Samples per chunk
+            
+        Returns:
+            Dictionary containing metric scores
+        """
+        bleu = CorpusBleu()
+        sums = {metric: {} for metric in self.metrics if metric in self.PER_SAMPLE_METRICS}
+        buffered = [m for m in self.metrics if m != "bleu" and m not in self.PER_SAMPLE_METRICS]
+        buffered_refs, buffered_hyps = [], []
+        total = 0
+        start = time.perf_counter()
+        
+        for i, chunk in enumerate(iter_chunks(records, chunk_size)):
+            refs = [r["ground_truth"] for r in chunk]
+            hyps = [r["prediction"] for r in chunk]
+            
+            if "bleu" in self.metrics and self.bleu_backend == "native":
+                bleu.add_stats(self.lexical().pair_stats(refs, hyps).sum(axis=0))
+            elif "bleu" in self.metrics:
+                bleu.add(refs, hyps)
+            if buffered:
+                buffered_refs.extend(refs)
+                buffered_hyps.extend(hyps)
+            for metric, metric_sums in sums.items():
+                for scores in self.per_sample_scores(metric, refs, hyps):
+                    for name, value in scores.items():
+                        metric_sums[name] = metric_sums.get(name, 0.0) + value
+            
+            total += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"  chunk {i + 1}: {total} samples scored ({total / elapsed:.1f} samples/s)")
+        
+        if total == 0:
+            return {}
+        
+        results = {}
+        for metric in self.metrics:
+            if metric == "bleu":
+                results["bleu"] = round(bleu.score(), 4)
+            elif metric in buffered:
+                results.update(self._score_metric(metric, buffered_refs, buffered_hyps))
+            else:
+                results.update({name: round(value / total, 4) for name, value in sums[metric].items()})
         return results
     
+    def _score_metric(self, metric: str, references: list[str], predictions: list[str]) -> dict:
+        if metric == "bleu" and self.bleu_backend == "native":
+            # Cheaper than a score cache lookup of the whole corpus
+            return {"bleu": round(self.lexical().corpus_bleu(references, predictions), 4)}
+        if self.cache is None:
+            return self._scorer(metric)(refs=references, hyps=predictions)
+        return self._evaluate_cached(metric, references, predictions)
+    
+    def _metric_config(self, metric: str) -> dict:
+        """Everything that can change a metric's scores, for cache keys."""
+        try:
+            version = importlib.metadata.version("radeval")
+        except importlib.metadata.PackageNotFoundError:
+            version = None
+        # Per-sample entries are unrounded scores from batched calls
+        return {"radeval": version, "kwargs": self._kwargs, "per_sample": metric in self.PER_SAMPLE_METRICS}
+    
+    def _evaluate_cached(self, metric: str, references: list[str], predictions: list[str]) -> dict:
+        """Score one metric, sending only cache misses to RadEval (loaded only if needed)."""
+        config = self._metric_config(metric)
+        
+        if metric not in self.PER_SAMPLE_METRICS:
+            # Corpus-level metric: the whole reference/prediction list is the key
+            key = ScoreCache.make_key(metric, config, references, predictions)
+            cached = self.cache.get_many(metric, [key])
+            if key not in cached:
+                cached[key] = self._scorer(metric)(refs=references, hyps=predictions)
+                self.cache.put_many(metric, {key: cached[key]})
+            return cached[key]
+        
+        if not references:
+            return {}
+        
+        # Corpus score = mean of the (unrounded) per-sample scores, as RadEval computes it
+        per_sample = self.per_sample_scores(metric, references, predictions)
+        return {
+            name: round(sum(scores[name] for scores in per_sample) / len(per_sample), 4)
+            for name in per_sample[0]
+        }
+    
+    def per_sample_scores(self, metric: str, references: list[str], predictions: list[str]) -> list[dict]:
+        """
+        Scores of each (reference, prediction) pair for a per-sample metric.
+        
+        With the score cache, pairs scored before are read from it and only
+        the others are sent to RadEval (in one batched call) and cached.
+        """
+        if metric not in self.PER_SAMPLE_METRICS:
+            raise ValueError(f"{metric} has no per-sample scores. Per-sample metrics: {sorted(self.PER_SAMPLE_METRICS)}")
+        if self.cache is None:
+            return self._score_samples(metric, references, predictions)
+        
+        config = self._metric_config(metric)
+        keys = [
+            ScoreCache.make_key(metric, config, ref, hyp)
+            for ref, hyp in zip(references, predictions)
+        ]
+        cached = self.cache.get_many(metric, keys)
+        
+        misses = {}
+        for key, ref, hyp in zip(keys, references, predictions):
+            if key not in cached and key not in misses:
+                misses[key] = (ref, hyp)
+        new_scores = {}
+        if misses:
+            refs, hyps = zip(*misses.values())
+            new_scores = dict(zip(misses, self._score_samples(metric, list(refs), list(hyps))))
+            self.cache.put_many(metric, new_scores)
+            cached.update(new_scores)
+        return [cached[key] for key in keys]
+    
+    def _score_samples(self, metric: str, references: list[str], predictions: list[str]) -> list[dict]:
+        """Per-sample scores of a per-sample metric from one batched RadEval call."""
+        if not references:
+            return []
+        output = self._scorer(metric, per_sample=True)(refs=references, hyps=predictions)
+        columns = {name: values for name, values in output.items() if isinstance(values, (list, tuple))}
+        if not columns or any(len(values) != len(references) for values in columns.values()):
+            raise ValueError(f"RadEval returned no per-sample scores for {metric}: {sorted(output)}")
+        return [
+            {name: float(values[i]) for name, values in columns.items()}
+            for i in range(len(references))
+        ]
+    
+    def cache_stats(self) -> dict | None:
+        return None if self.cache is None else self.cache.stats()
+    
     def __call__(self, references: list[str], predictions: list[str]) -> dict:
         return self.evaluate(references, predictions)
\ No newline at end of file
@@ -0,0 +1,195 @@
+import sqlite3
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from .streaming import CorpusBleu
+
+
+def _lcs_length(reference: np.ndarray, hypothesis: np.ndarray) -> int:
+    """
+    Longest common subsequence length, bit-parallel.
+
+    Every reference position is one bit of a Python int; each hypothesis
+    token updates all of them at once (Crochemore et al., 2001), so a pair
+    costs len(hypothesis) big-int operations instead of a full DP table.
+    """
+    m = len(reference)
+    if m == 0 or len(hypothesis) == 0:
+        return 0
+    masks = {}
+    for position, token in enumerate(reference.tolist()):
+        masks[token] = masks.get(token, 0) | (1 << position)
+    full = (1 << m) - 1
+    v = full
+    for token in hypothesis.tolist():
+        u = v & masks.get(token, 0)
+        v = ((v + u) | (v - u)) & full
+    return m - bin(v).count("1")
+
+
+class LexicalScorer:
+    """
+    BLEU and ROUGE-L on integer token ids, without the RadEval stack.
+
+    Texts are split on whitespace (as RadEval's coco-caption BLEU does) and
+    mapped to integer ids. N-gram statistics of a whole corpus are counted
+    at once with NumPy: n-grams become integer codes, and clipped matches
+    are counts of equal (sample, code) keys in hypotheses and references.
+    The statistics are the ones CorpusBleu.pair_stats gives, so corpus and
+    sentence BLEU are identical to CorpusBleu (and to RadEval's "bleu").
+
+    With cache_path, the vocabulary and the token ids of every reference
+    (keyed by a hash of the report) persist in SQLite, so ground truth
+    reports are tokenized once across runs and processes.
+    """
+
+    def __init__(self, cache_path: str | Path | None = None, n: int = 4):
+        self.n = n
+        self.vocab = {}
+        self._refs = {}
+        self._conn = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        if cache_path is not None:
+            path = Path(cache_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS vocab (token TEXT PRIMARY KEY, id INTEGER NOT NULL UNIQUE)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS refs (hash TEXT PRIMARY KEY, ids BLOB NOT NULL)")
+            self._conn.commit()
+            self.vocab = dict(self._conn.execute("SELECT token, id FROM vocab"))
+
+    def _encode(self, text: str, new_tokens: list) -> np.ndarray:
+        vocab = self.vocab
+        ids = []
+        for word in text.split():
+            token_id = vocab.get(word)
+            if token_id is None:
+                token_id = vocab[word] = len(vocab)
+                new_tokens.append((word, token_id))
+            ids.append(token_id)
+        return np.array(ids, dtype=np.int32)
+
+    def tokenize(self, texts: list[str]) -> list[np.ndarray]:
+        """Token id arrays of texts (e.g. hypotheses, which change every run)."""
+        new_tokens = []
+        arrays = [self._encode(text, new_tokens) for text in texts]
+        self._save_vocab(new_tokens)
+        return arrays
+
+    def tokenize_references(self, texts: list[str]) -> list[np.ndarray]:
+        """Token id arrays of references, served from the cache when seen before."""
+        hashes = [hashlib.sha1(text.encode()).hexdigest() for text in texts]
+        missing = list(dict.fromkeys(h for h in hashes if h not in self._refs))
+        if missing and self._conn is not None:
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for key, blob in self._conn.execute(
+                    f"SELECT hash, ids FROM refs WHERE hash IN ({placeholders})", chunk
+                ):
+                    self._refs[key] = np.frombuffer(blob, dtype=np.int32)
+
+        new_tokens, new_refs = [], []
+        for key, text in zip(hashes, texts):
+            if key in self._refs:
+                self.cache_hits += 1
+                continue
+            self.cache_misses += 1
+            self._refs[key] = self._encode(text, new_tokens)
+            new_refs.append((key, self._refs[key].tobytes()))
+        self._save_vocab(new_tokens)
+        if new_refs and self._conn is not None:
+            self._conn.executemany("INSERT OR IGNORE INTO refs (hash, ids) VALUES (?, ?)", new_refs)
+            self._conn.commit()
+        return [self._refs[key] for key in hashes]
+
+    def _save_vocab(self, new_tokens: list):
+        if new_tokens and self._conn is not None:
+            self._conn.executemany("INSERT INTO vocab (token, id) VALUES (?, ?)", new_tokens)
+            self._conn.commit()
+
+    @staticmethod
+    def _flatten(arrays: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """All tokens in one array, with the sample of each token and the tokens left in it."""
+        lengths = np.array([len(a) for a in arrays], dtype=np.int64)
+        tokens = np.concatenate(arrays).astype(np.int64) if lengths.sum() else np.zeros(0, np.int64)
+        samples = np.repeat(np.arange(len(arrays)), lengths)
+        ends = np.cumsum(lengths)
+        remaining = np.repeat(ends, lengths) - np.arange(len(tokens))
+        return tokens, samples, remaining, lengths
+
+    def ngram_stats(self, ref_ids: list[np.ndarray], hyp_ids: list[np.ndarray]) -> np.ndarray:
+        """
+        Per-pair [hyp_len, ref_len, guess_1..n, correct_1..n] as an int64 array.
+
+        Every (sample, n-gram) gets a dense id with one sort per order: the
+        unigram key is sample * vocab + token, and the k-gram key is the id
+        of its (k-1)-gram prefix * vocab + next token, so keys stay within
+        int64 whatever the corpus size. Hypothesis and reference n-grams are
+        keyed together, and the clipped matches of an id are the minimum of
+        its hypothesis and reference counts.
+        """
+        num_pairs = len(hyp_ids)
+        stats = np.zeros((num_pairs, 2 + 2 * self.n), dtype=np.int64)
+        h_tokens, h_samples, h_remaining, h_lengths = self._flatten(hyp_ids)
+        r_tokens, r_samples, r_remaining, r_lengths = self._flatten(ref_ids)
+        stats[:, 0], stats[:, 1] = h_lengths, r_lengths
+        width = int(max(h_tokens.max(initial=0), r_tokens.max(initial=0))) + 1
+
+        num_h, num_r = len(h_tokens), len(r_tokens)
+        keys = np.concatenate([h_samples * width + h_tokens, r_samples * width + r_tokens])
+        for k in range(1, self.n + 1):
+            stats[:, 1 + k] = np.maximum(h_lengths - (k - 1), 0)
+            if k > 1:
+                # k-grams starting at all but the last k - 1 tokens; the ones
+                # running into the next sample are keyed but never counted
+                keys = np.concatenate([
+                    ids[:max(num_h - 1, 0)] * width + h_tokens[k - 1:],
+                    ids[num_h:num_h + max(num_r - 1, 0)] * width + r_tokens[k - 1:]
+                ])
+                num_h, num_r = max(num_h - 1, 0), max(num_r - 1, 0)
+            unique, ids = np.unique(keys, return_inverse=True)
+            ids = ids.ravel()
+
+            h_ids, r_ids = ids[:num_h], ids[num_h:]
+            h_counts = np.bincount(h_ids[h_remaining[:num_h] >= k], minlength=len(unique))
+            r_counts = np.bincount(r_ids[r_remaining[:num_r] >= k], minlength=len(unique))
+            owner = np.empty(len(unique), dtype=np.int64)
+            owner[h_ids], owner[r_ids] = h_samples[:num_h], r_samples[:num_r]
+            matches = np.minimum(h_counts, r_counts)
+            stats[:, 1 + self.n + k] = np.bincount(owner, weights=matches, minlength=num_pairs)
+        return stats
+
+    def pair_stats(self, references: list[str], hypotheses: list[str]) -> np.ndarray:
+        return self.ngram_stats(self.tokenize_references(references), self.tokenize(hypotheses))
+
+    def corpus_bleu(self, references: list[str], hypotheses: list[str]) -> float:
+        """Corpus BLEU-n, as CorpusBleu / RadEval's "bleu"."""
+        return float(CorpusBleu.score_stats(self.pair_stats(references, hypotheses).sum(axis=0)))
+
+    def sentence_bleu(self, references: list[str], hypotheses: list[str]) -> np.ndarray:
+        """BLEU-n of every pair on its own."""
+        return CorpusBleu.score_stats(self.pair_stats(references, hypotheses))
+
+    def rouge_l(self, references: list[str], hypotheses: list[str]) -> np.ndarray:
+        """ROUGE-L F1 (LCS precision/recall, beta = 1) of every pair."""
+        refs, hyps = self.tokenize_references(references), self.tokenize(hypotheses)
+        lcs = np.array([_lcs_length(r, h) for r, h in zip(refs, hyps)], dtype=np.float64)
+        ref_len = np.array([len(r) for r in refs], dtype=np.float64)
+        hyp_len = np.array([len(h) for h in hyps], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(hyp_len > 0, lcs / hyp_len, 0.0)
+            recall = np.where(ref_len > 0, lcs / ref_len, 0.0)
+            f1 = np.where(lcs > 0, 2 * precision * recall / (precision + recall), 0.0)
+        return f1
+
+    def cache_stats(self) -> dict:
+        return {"vocab_size": len(self.vocab), "reference_hits": self.cache_hits, "reference_misses": self.cache_misses}
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
@@ -0,0 +1,112 @@
+import sys
+import json
+import time
+from pathlib import Path
+
+from .evaluator import LEXICAL_CACHE_PATH, RadiologyEvaluator
+from .lexical import LexicalScorer
+from .streaming import CorpusBleu, iter_chunks
+
+
+def read_stream(stream=None):
+    """Yield prediction records sent as JSON lines (stdin by default) until EOF."""
+    for line in stream or sys.stdin:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+class OnlineEvaluator:
+    """
+    Running metric estimates over predictions that are still being generated.
+
+    Records are consumed in micro-batches as they arrive. Per-sample metrics
+    are scored through the score cache (so the final evaluation of the
+    finished file only re-reads them) and kept as running means; BLEU is
+    accumulated exactly from n-gram counts. CheXbert F1 (semb) and
+    RadCliQ-v1 are not decomposable and are only computed by the final
+    evaluation.
+
+    After every micro-batch the current estimates are appended as one JSON
+    line to progress_path, so a run can be watched (or stopped) early.
+    """
+
+    def __init__(
+        self,
+        metrics: list[str] | None = None,
+        progress_path: str | Path | None = None,
+        micro_batch_size: int = 32,
+        bleu_backend: str = "radeval",
+        **kwargs
+    ):
+        metrics = metrics or RadiologyEvaluator.AVAILABLE_METRICS
+        self.metrics = metrics
+        self.micro_batch_size = micro_batch_size
+        self.progress_path = Path(progress_path) if progress_path else None
+        per_sample = [m for m in metrics if m in RadiologyEvaluator.PER_SAMPLE_METRICS]
+        self.evaluator = RadiologyEvaluator(metrics=per_sample, **kwargs) if per_sample else None
+
+        self.bleu = CorpusBleu() if "bleu" in metrics else None
+        self.lexical = LexicalScorer(LEXICAL_CACHE_PATH) if self.bleu is not None and bleu_backend == "native" else None
+        self.sums = {}
+        self.total = 0
+        self.micro_batches = 0
+        self.start = None
+
+    def update(self, records: list[dict]) -> dict:
+        """Score one micro-batch and return the running estimates."""
+        refs = [r["ground_truth"] for r in records]
+        hyps = [r["prediction"] for r in records]
+        if self.lexical is not None:
+            self.bleu.add_stats(self.lexical.pair_stats(refs, hyps).sum(axis=0))
+        elif self.bleu is not None:
+            self.bleu.add(refs, hyps)
+        if self.evaluator is not None:
+            for name, value in self.evaluator(references=refs, predictions=hyps).items():
+                self.sums[name] = self.sums.get(name, 0.0) + value * len(records)
+        self.total += len(records)
+        self.micro_batches += 1
+        return self.estimates()
+
+    def estimates(self) -> dict:
+        results = {name: round(value / self.total, 4) for name, value in self.sums.items()}
+        if self.bleu is not None and self.total:
+            results["bleu"] = round(self.bleu.score(), 4)
+        return results
+
+    def consume(self, records) -> dict:
+        """Score an iterable of records in micro-batches, writing progress after each one."""
+        self.start = time.perf_counter()
+        progress = None
+        if self.progress_path is not None:
+            self.progress_path.parent.mkdir(parents=True, exist_ok=True)
+            progress = open(self.progress_path, "a")
+        try:
+            for chunk in iter_chunks(records, self.micro_batch_size):
+                estimates = self.update(chunk)
+                elapsed = time.perf_counter() - self.start
+                line = {
+                    "samples": self.total,
+                    "elapsed_s": round(elapsed, 3),
+                    "samples_per_s": round(self.total / elapsed, 2) if elapsed else None,
+                    "metrics": estimates
+                }
+                if progress is not None:
+                    progress.write(json.dumps(line) + "\n")
+                    progress.flush()
+                print(f"  online: {self.total} samples scored, {estimates}")
+        finally:
+            if progress is not None:
+                progress.close()
+        return self.estimates()
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.start if self.start else 0.0
+        return {
+            "samples": self.total,
+            "micro_batches": self.micro_batches,
+            "micro_batch_size": self.micro_batch_size,
+            "streaming_s": round(elapsed, 3),
+            "progress_path": str(self.progress_path) if self.progress_path else None,
+            "estimates": self.estimates()
+        }
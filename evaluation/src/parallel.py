@@ -0,0 +1,148 @@
+import sys
+import time
+import resource
+import traceback
+import multiprocessing as mp
+from queue import Empty
+
+from .evaluator import RadiologyEvaluator
+
+
+# Rough peak memory (GB) of each metric's models, used to schedule workers
+# against the memory budget. Cheap metrics are also started first.
+METRIC_MEMORY_GB = {
+    "bleu": 0.2,
+    "semb": 1.0,
+    "bertscore": 1.5,
+    "radgraph": 2.0,
+    "ratescore": 2.0,
+    "radcliq": 3.5,
+    "green": 16.0,
+}
+
+
+def _metric_worker(metric: str, references: list[str], predictions: list[str], kwargs: dict, queue):
+    """Score one metric in this process and report the outcome on the queue."""
+    start = time.perf_counter()
+    report = {"metric": metric}
+    try:
+        evaluator = RadiologyEvaluator(metrics=[metric], **kwargs)
+        report["results"] = evaluator(references=references, predictions=predictions)
+        report["score_cache"] = evaluator.cache_stats()
+        report["status"] = "ok"
+    except Exception:
+        report["status"] = "failed"
+        report["error"] = traceback.format_exc()
+
+    report["wall_time_s"] = round(time.perf_counter() - start, 3)
+    # ru_maxrss is in KB on Linux
+    report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        report["peak_gpu_mb"] = round(torch.cuda.max_memory_allocated() / 2**20, 1)
+    queue.put(report)
+
+
+class ParallelEvaluator:
+    """
+    Evaluate each metric in its own worker process.
+
+    Up to max_workers metrics run at once, and a metric is only started when
+    its estimated memory fits in what the running ones leave of the budget
+    (a metric always starts if nothing else is running). A metric that raises
+    or whose process dies is reported as failed without affecting the others.
+
+    Results are merged into the same flat dict RadiologyEvaluator returns;
+    per-metric status, wall time and peak RSS are kept in ``self.runs``.
+    """
+
+    AVAILABLE_METRICS = RadiologyEvaluator.AVAILABLE_METRICS
+
+    def __init__(
+        self,
+        metrics: list[str] | None = None,
+        max_workers: int = 2,
+        memory_budget_gb: float = 24.0,
+        **kwargs
+    ):
+        if metrics is None:
+            metrics = self.AVAILABLE_METRICS
+
+        invalid = set(metrics) - set(self.AVAILABLE_METRICS)
+        if invalid:
+            raise ValueError(f"Invalid metrics: {invalid}. Available: {self.AVAILABLE_METRICS}")
+
+        self.metrics = metrics
+        self.max_workers = max_workers
+        self.memory_budget_gb = memory_budget_gb
+        self._kwargs = kwargs
+        self.runs = {}
+
+    def evaluate(self, references: list[str], predictions: list[str]) -> dict:
+        if len(references) != len(predictions):
+            raise ValueError(
+                f"Length mismatch: {len(references)} references vs {len(predictions)} predictions"
+            )
+
+        ctx = mp.get_context("spawn")
+        queue = ctx.Queue()
+        waiting = sorted(self.metrics, key=lambda m: METRIC_MEMORY_GB[m])
+        running = {}
+        self.runs = {}
+
+        while waiting or running:
+            # Start as many waiting metrics as concurrency and memory allow
+            for metric in list(waiting):
+                if len(running) >= self.max_workers:
+                    break
+                in_use = sum(METRIC_MEMORY_GB[m] for m in running)
+                if running and in_use + METRIC_MEMORY_GB[metric] > self.memory_budget_gb:
+                    continue
+                process = ctx.Process(
+                    target=_metric_worker,
+                    args=(metric, references, predictions, self._kwargs, queue)
+                )
+                process.start()
+                running[metric] = process
+                waiting.remove(metric)
+
+            try:
+                self._record(queue.get(timeout=1.0), running)
+            except Empty:
+                # A worker reports before it exits, so collect every report
+                # already sent before treating a dead worker as failed
+                while True:
+                    try:
+                        self._record(queue.get_nowait(), running)
+                    except Empty:
+                        break
+                # Catch workers that died without reporting (OOM kill, segfault)
+                for metric, process in list(running.items()):
+                    if not process.is_alive():
+                        self.runs[metric] = {
+                            "status": "failed",
+                            "error": f"worker exited with code {process.exitcode}"
+                        }
+                        del running[metric]
+
+        results = {}
+        for metric in self.metrics:
+            results.update(self.runs[metric].pop("results", {}))
+        return results
+
+    def _record(self, report: dict, running: dict):
+        """Keep a worker's report and reap its process."""
+        metric = report.pop("metric")
+        self.runs[metric] = report
+        process = running.pop(metric, None)
+        if process is not None:
+            process.join()
+        print(f"  [{metric}] {report['status']} in {report['wall_time_s']}s "
+              f"(peak RSS {report['peak_rss_mb']} MB)")
+
+    def cache_stats(self) -> dict | None:
+        stats = {m: run.get("score_cache") for m, run in self.runs.items() if run.get("score_cache")}
+        return stats or None
+
+    def __call__(self, references: list[str], predictions: list[str]) -> dict:
+        return self.evaluate(references, predictions)
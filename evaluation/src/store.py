@@ -0,0 +1,163 @@
+import json
+import sqlite3
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+
+from .evaluator import RadiologyEvaluator
+
+# Per-sample BLEU is kept as n-gram statistics, so corpus BLEU can be recomputed
+# exactly on any subset or resample of the samples
+BLEU_STATS = ["hyp_len", "ref_len", *(f"guess_{k}" for k in range(1, 5)), *(f"correct_{k}" for k in range(1, 5))]
+BLEU_COLUMNS = [f"bleu:{name}" for name in BLEU_STATS]
+
+
+def sample_keys(records: list[dict]) -> list[str]:
+    """Key pairing the same sample across runs: the image filename, else the dataset index."""
+    keys, seen = [], {}
+    for record in records:
+        key = str(record.get("filename") or record.get("index"))
+        # Keep keys unique if a file lists the same image twice
+        seen[key] = seen.get(key, 0) + 1
+        keys.append(key if seen[key] == 1 else f"{key}#{seen[key]}")
+    return keys
+
+
+def per_sample_columns(
+    evaluator: RadiologyEvaluator,
+    metrics: list[str],
+    references: list[str],
+    predictions: list[str]
+) -> dict[str, np.ndarray]:
+    """
+    Per-sample score columns of the given metrics.
+
+    Per-sample metrics give one column per score RadEval returns (e.g. the
+    three RadGraph variants); BLEU gives its n-gram statistics, counted by
+    the evaluator's LexicalScorer whatever its bleu_backend. CheXbert F1
+    (semb) and RadCliQ-v1 are corpus-level scores and are skipped.
+    """
+    columns = {}
+    for metric in metrics:
+        if metric == "bleu":
+            stats = evaluator.lexical().pair_stats(references, predictions).astype(np.float64)
+            columns.update({name: stats[:, k] for k, name in enumerate(BLEU_COLUMNS)})
+        elif metric in RadiologyEvaluator.PER_SAMPLE_METRICS:
+            scores = evaluator.per_sample_scores(metric, references, predictions)
+            for name in scores[0] if scores else []:
+                columns[name] = np.array([s[name] for s in scores], dtype=np.float64)
+    return columns
+
+
+class MetricsStore:
+    """
+    Per-sample metric scores of every evaluated predictions file.
+
+    One SQLite row per (run, metric column, sample), keyed and clustered by
+    (run, metric, sample) with a second index on (sample, metric), so a
+    run's column loads with a single range scan. Samples are interned to
+    integer ids. Runs are named after their predictions file; evaluating a
+    file again replaces the columns it scores.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY, predictions_file TEXT, model TEXT,"
+            " evaluated_at TEXT NOT NULL, num_samples INTEGER NOT NULL, metadata TEXT);"
+            "CREATE TABLE IF NOT EXISTS samples (sample_id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE);"
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " run_id TEXT NOT NULL, metric TEXT NOT NULL, sample_id INTEGER NOT NULL, value REAL NOT NULL,"
+            " PRIMARY KEY (run_id, metric, sample_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS scores_sample ON scores (sample_id, metric);"
+        )
+        self._conn.commit()
+
+    def _sample_ids(self, keys: list[str]) -> list[int]:
+        self._conn.executemany("INSERT OR IGNORE INTO samples (key) VALUES (?)", [(k,) for k in keys])
+        ids = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            ids.update(self._conn.execute(
+                f"SELECT key, sample_id FROM samples WHERE key IN ({placeholders})", chunk
+            ).fetchall())
+        return [ids[k] for k in keys]
+
+    def add_run(
+        self,
+        run_id: str,
+        keys: list[str],
+        columns: dict[str, np.ndarray],
+        predictions_file: str | None = None,
+        model: str | None = None,
+        metadata: dict | None = None
+    ):
+        """Store (or replace) the per-sample columns of one run."""
+        sample_ids = self._sample_ids(keys)
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, predictions_file, model, evaluated_at, num_samples, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, predictions_file, model, datetime.now().isoformat(timespec="seconds"),
+                 len(keys), json.dumps(metadata or {}))
+            )
+            for name, values in columns.items():
+                self._conn.execute("DELETE FROM scores WHERE run_id = ? AND metric = ?", (run_id, name))
+                self._conn.executemany(
+                    "INSERT INTO scores (run_id, metric, sample_id, value) VALUES (?, ?, ?, ?)",
+                    zip((run_id for _ in sample_ids), (name for _ in sample_ids), sample_ids, map(float, values))
+                )
+
+    def runs(self) -> list[dict]:
+        rows = self._conn.execute(
+            "SELECT run_id, predictions_file, model, evaluated_at, num_samples FROM runs ORDER BY evaluated_at"
+        ).fetchall()
+        names = ["run_id", "predictions_file", "model", "evaluated_at", "num_samples"]
+        return [dict(zip(names, row)) for row in rows]
+
+    def columns(self, run_id: str) -> list[str]:
+        return [m for (m,) in self._conn.execute(
+            "SELECT DISTINCT metric FROM scores WHERE run_id = ?", (run_id,)
+        )]
+
+    def load(self, run_ids: list[str], columns: list[str]) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """
+        Paired score matrices of several runs.
+
+        Returns the sample ids every run has every column for, and for each
+        column a (runs, samples) array aligned on those ids.
+        """
+        values = {}
+        for run_id in run_ids:
+            for name in columns:
+                rows = self._conn.execute(
+                    "SELECT sample_id, value FROM scores WHERE run_id = ? AND metric = ? ORDER BY sample_id",
+                    (run_id, name)
+                ).fetchall()
+                if not rows:
+                    raise KeyError(f"Run {run_id} has no per-sample scores for {name}")
+                array = np.array(rows, dtype=np.float64)
+                values[run_id, name] = (array[:, 0].astype(np.int64), array[:, 1])
+
+        common = None
+        for ids, _ in values.values():
+            common = ids if common is None else np.intersect1d(common, ids, assume_unique=True)
+        matrices = {}
+        for name in columns:
+            rows = []
+            for run_id in run_ids:
+                ids, column = values[run_id, name]
+                rows.append(column[np.searchsorted(ids, common)])
+            matrices[name] = np.stack(rows)
+        return common, matrices
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,99 @@
+import math
+from collections import Counter
+
+import numpy as np
+
+
+def iter_chunks(records, chunk_size: int):
+    """Group an iterable of prediction records into lists of chunk_size."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class CorpusBleu:
+    """
+    Corpus BLEU accumulated from n-gram counts.
+
+    Mirrors the coco-caption BleuScorer that RadEval's "bleu" uses
+    (whitespace tokens, clipped n-gram matches, closest reference length,
+    BLEU-4 reported), so feeding the corpus in chunks gives exactly the same
+    score as one call over all samples.
+    """
+
+    TINY = 1e-15
+    SMALL = 1e-9
+
+    def __init__(self, n: int = 4):
+        self.n = n
+        self.hyp_len = 0
+        self.ref_len = 0
+        self.guess = [0] * n
+        self.correct = [0] * n
+
+    def _ngrams(self, words: list[str]) -> Counter:
+        counts = Counter()
+        for k in range(1, self.n + 1):
+            for i in range(len(words) - k + 1):
+                counts[tuple(words[i:i + k])] += 1
+        return counts
+
+    def pair_stats(self, reference: str, hypothesis: str) -> list[int]:
+        """Sufficient statistics of one pair: [hyp_len, ref_len, guess_1..n, correct_1..n]."""
+        ref_words, hyp_words = reference.split(), hypothesis.split()
+        ref_counts = self._ngrams(ref_words)
+        guess = [max(0, len(hyp_words) - k) for k in range(self.n)]
+        correct = [0] * self.n
+        for ngram, count in self._ngrams(hyp_words).items():
+            correct[len(ngram) - 1] += min(count, ref_counts.get(ngram, 0))
+        return [len(hyp_words), len(ref_words), *guess, *correct]
+
+    def add(self, references: list[str], hypotheses: list[str]):
+        for ref, hyp in zip(references, hypotheses):
+            self.add_stats(self.pair_stats(ref, hyp))
+
+    def add_stats(self, stats):
+        """Add statistics in pair_stats layout (of one pair, or summed over many)."""
+        self.hyp_len += int(stats[0])
+        self.ref_len += int(stats[1])
+        for k in range(self.n):
+            self.guess[k] += int(stats[2 + k])
+            self.correct[k] += int(stats[2 + self.n + k])
+
+    def scores(self) -> list[float]:
+        """BLEU-1 .. BLEU-n over everything added so far."""
+        bleu = 1.0
+        scores = []
+        for k in range(self.n):
+            bleu *= (self.correct[k] + self.TINY) / (self.guess[k] + self.SMALL)
+            scores.append(bleu ** (1.0 / (k + 1)))
+
+        ratio = (self.hyp_len + self.TINY) / (self.ref_len + self.SMALL)
+        if ratio < 1:
+            scores = [s * math.exp(1 - 1 / ratio) for s in scores]
+        return scores
+
+    def score(self) -> float:
+        return self.scores()[-1]
+
+    @classmethod
+    def score_stats(cls, totals: np.ndarray) -> np.ndarray:
+        """
+        BLEU-n from summed pair_stats rows, vectorized over leading axes.
+
+        totals[..., :] is [hyp_len, ref_len, guess_1..n, correct_1..n], e.g.
+        one row per bootstrap resample; gives the same value as score().
+        """
+        totals = np.asarray(totals, dtype=np.float64)
+        n = (totals.shape[-1] - 2) // 2
+        guess, correct = totals[..., 2:2 + n], totals[..., 2 + n:]
+        # Running product of the precisions, as in scores(); BLEU-n is its n-th root
+        log_bleu = np.log((correct + cls.TINY) / (guess + cls.SMALL)).sum(axis=-1) / n
+        ratio = (totals[..., 0] + cls.TINY) / (totals[..., 1] + cls.SMALL)
+        brevity = np.where(ratio < 1, 1 - 1 / np.minimum(ratio, 1), 0.0)
+        return np.exp(log_bleu + brevity)
@@ -1,91 +1,182 @@
+import sys
 import json
+import importlib.util
 from pathlib import Path
 from datetime import datetime
 
 
+def _load_predictions_io():
+    """
+    training/src/predictions_io.py, which owns the JSONL predictions format.
+    
+    Its reader, writer and file lookup are shared rather than copied here.
+    The module only needs the standard library, so it is loaded by path from
+    the training project, as src.predictions_io, without putting training/src
+    on sys.path or taking its bare module name.
+    """
+    name = f"{__package__}.predictions_io"
+    if name in sys.modules:
+        return sys.modules[name]
+    path = Path(__file__).resolve().parent.parent.parent / "training" / "src" / "predictions_io.py"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+_predictions_io = _load_predictions_io()
+PredictionsWriter = _predictions_io.PredictionsWriter
+_iter_jsonl = _predictions_io.iter_lines
+
+
+class PredictionRecords:
+    """
+    Re-iterable, lazily read view over the records of a JSONL predictions file.
+    
+    Each iteration re-opens the file and parses one line at a time, so the
+    whole file never has to be held in memory.
+    """
+    
+    def __init__(self, path: Path, num_samples: int):
+        self.path = path
+        self.num_samples = num_samples
+    
+    def __len__(self):
+        return self.num_samples
+    
+    def __iter__(self):
+        for _, obj in _iter_jsonl(self.path):
+            if "metadata" not in obj:
+                yield obj
+
+
+class UniqueStudies:
+    """
+    Re-iterable view that keeps only the first record of each study (uid).
+    
+    Projection-level predictions repeat a study's ground truth once per view;
+    this scores each study once. Records without a uid are all kept.
+    The count is only taken when asked for, so a one-shot stream of records
+    can be filtered too.
+    """
+    
+    def __init__(self, records):
+        self.records = records
+        self.num_samples = None
+    
+    def __len__(self):
+        if self.num_samples is None:
+            self.num_samples = sum(1 for _ in self)
+        return self.num_samples
+    
+    def __iter__(self):
+        seen = set()
+        for record in self.records:
+            uid = record.get("uid")
+            if uid is not None:
+                if uid in seen:
+                    continue
+                seen.add(uid)
+            yield record
+
+
 def load_predictions(predictions_file: str | Path) -> dict:
+    """
+    Load a predictions file in either format.
+    
+    Legacy ``.json`` files are parsed whole. For ``.jsonl`` files the metadata
+    lines are merged and "predictions" is a lazy PredictionRecords view.
+    """
     predictions_file = Path(predictions_file)
     
     if not predictions_file.exists():
         raise FileNotFoundError(f"Predictions file not found: {predictions_file}")
     
-    with open(predictions_file, "r") as f:
-        data = json.load(f)
-    
-    return data
+    if predictions_file.suffix == ".json":
+        with open(predictions_file, "r") as f:
+            data = json.load(f)
+        return data
+    
+    metadata = {}
+    count = 0
+    for _, obj in _iter_jsonl(predictions_file):
+        if "metadata" in obj:
+            metadata.update(obj["metadata"])
+        else:
+            count += 1
+    metadata["num_samples"] = count
+    
+    return {
+        "metadata": metadata,
+        "predictions": PredictionRecords(predictions_file, count)
+    }
+
+
+def iter_predictions(predictions_file: str | Path):
+    """Stream prediction records from a predictions file, one at a time."""
+    yield from load_predictions(predictions_file)["predictions"]
 
 
 def get_latest_predictions(predictions_dir: str | Path) -> Path:
-    predictions_dir = Path(predictions_dir)
-    
-    if not predictions_dir.exists():
-        raise FileNotFoundError(f"Predictions directory not found: {predictions_dir}")
+    """Most recent predictions file (.json or .jsonl); raises FileNotFoundError if there is none."""
+    return _predictions_io.get_latest_predictions(predictions_dir, suffixes=(".json", ".jsonl"))
+
+
+def save_predictions(
+    predictions,
+    output_dir: str | Path,
+    model_name: str = "unknown",
+    filename: str | None = None
+) -> Path:
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
     
-    prediction_files = list(predictions_dir.glob("predictions_*.json"))
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = filename or f"predictions_{timestamp}.jsonl"
+    output_path = output_dir / filename
     
-    if not prediction_files:
-        raise FileNotFoundError(f"No prediction files found in: {predictions_dir}")
+    with PredictionsWriter(output_path, {"timestamp": timestamp, "model": model_name}) as writer:
+        chunk = []
+        for pred in predictions:
+            chunk.append(pred)
+            if len(chunk) == 256:
+                writer.write(chunk)
+                chunk = []
+        writer.write(chunk)
     
-    # Sort by modification time, get latest
-    latest = max(prediction_files, key=lambda p: p.stat().st_mtime)
-    return latest
+    return output_path
 
 
-def save_predictions(
-    predictions: list[dict],
+def save_results(
+    metrics: dict,
     output_dir: str | Path,
     model_name: str = "unknown",
-    filename: str | None = None
+    metrics_used: list[str] | None = None,
+    filename: str | None = None,
+    predictions_file: str | None = None,
+    extra_metadata: dict | None = None
 ) -> Path:
+    
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = filename or f"predictions_{timestamp}.json"
+    filename = filename or f"evaluation_metrics_{timestamp}.json"
     output_path = output_dir / filename
     
     output = {
         "metadata": {
             "timestamp": timestamp,
-            "num_samples": len(predictions),
-            "model": model_name
+            "model": model_name,
+            "metrics_used": metrics_used or list(metrics.keys()),
+            "predictions_file": str(predictions_file) if predictions_file else None,
+            **(extra_metadata or {})
         },
-        "predictions": predictions
+        "metrics": metrics
     }
     
     with open(output_path, "w") as f:
         json.dump(output, f, indent=2)
     
-    return output_path
-
-
-# def save_results(
-#     metrics: dict,
-#     output_dir: str | Path,
-#     model_name: str = "unknown",
-#     metrics_used: list[str] | None = None,
-#     filename: str | None = None,
-#     predictions_file: str | None = None
-# ) -> Path:
-    
-#     output_dir = Path(output_dir)
-#     output_dir.mkdir(parents=True, exist_ok=True)
-    
-#     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-#     filename = filename or f"evaluation_metrics_{timestamp}.json"
-#     output_path = output_dir / filename
-    
-#     output = {
-#         "metadata": {
-#             "timestamp": timestamp,
-#             "model": model_name,
-#             "metrics_used": metrics_used or list(metrics.keys()),
-#             "predictions_file": str(predictions_file) if predictions_file else None
-#         },
-#         "metrics": metrics
-#     }
-    
-#     with open(output_path, "w") as f:
-#         json.dump(output, f, indent=2)
-    
-#     return output_path
\ No newline at end of file
+    return output_path
\ No newline at end of file
@@ -0,0 +1,90 @@
+import sys
+import math
+import types
+from pathlib import Path
+
+import pytest
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from src import evaluator as evaluator_module
+
+
+def _overlap(reference: str, hypothesis: str) -> float:
+    ref, hyp = set(reference.split()), set(hypothesis.split())
+    return len(ref & hyp) / max(len(ref | hyp), 1)
+
+
+def _idf_overlap(references: list[str], hypotheses: list[str]) -> list[float]:
+    """Overlap weighted by IDF over all references, so a sample's score depends on the corpus."""
+    df = {}
+    for ref in references:
+        for word in set(ref.split()):
+            df[word] = df.get(word, 0) + 1
+    scores = []
+    for ref, hyp in zip(references, hypotheses):
+        weights = {w: math.log((len(references) + 1) / (df.get(w, 0) + 1)) + 1 for w in set(ref.split()) | set(hyp.split())}
+        shared = sum(weights[w] for w in set(ref.split()) & set(hyp.split()))
+        scores.append(shared / max(sum(weights.values()), 1e-9))
+    return scores
+
+
+class FakeRadEval:
+    """
+    Stand-in for RadEval with its output conventions and no models.
+
+    Aggregates are means rounded to 4 decimals; with do_per_sample every
+    key maps to the unrounded per-sample list. Calls are logged in CALLS.
+    """
+
+    CALLS = []
+
+    def __init__(self, do_per_sample: bool = False, **flags):
+        self.per_sample = do_per_sample
+        self.flag = next(flag for flag, enabled in flags.items() if enabled)
+
+    def __call__(self, refs: list[str], hyps: list[str]) -> dict:
+        self.CALLS.append((self.flag, self.per_sample, len(refs)))
+        pairs = list(zip(refs, hyps))
+        if self.flag == "do_bertscore":
+            columns = {"bertscore": [_overlap(r, h) for r, h in pairs]}
+        elif self.flag == "do_radgraph":
+            columns = {
+                "radgraph_simple": [_overlap(r, h) for r, h in pairs],
+                "radgraph_partial": [_overlap(r, h) ** 2 for r, h in pairs],
+                "radgraph_complete": [_overlap(r, h) ** 3 for r, h in pairs],
+            }
+        elif self.flag == "do_radcliq":
+            columns = {"radcliq-v1": _idf_overlap(refs, hyps)}
+        else:
+            raise NotImplementedError(self.flag)
+        if self.per_sample:
+            return columns
+        return {name: round(sum(values) / len(values), 4) for name, values in columns.items()}
+
+
+@pytest.fixture
+def fake_radeval(monkeypatch, tmp_path):
+    """Install FakeRadEval as the RadEval package, with fresh scorers and caches under tmp_path."""
+    module = types.ModuleType("RadEval")
+    module.RadEval = FakeRadEval
+    monkeypatch.setitem(sys.modules, "RadEval", module)
+    monkeypatch.setattr(evaluator_module, "_SCORERS", {})
+    monkeypatch.setattr(evaluator_module, "LEXICAL_CACHE_PATH", tmp_path / "lexical.sqlite")
+    FakeRadEval.CALLS.clear()
+    return FakeRadEval
+
+
+@pytest.fixture
+def report_pairs() -> tuple[list[str], list[str]]:
+    """Deterministic report-like pairs with repeated words and an exact duplicate."""
+    words = "no acute cardiopulmonary process heart size normal mild effusion left basal atelectasis lungs clear".split()
+    refs, hyps = [], []
+    for i in range(23):
+        refs.append(" ".join(words[(i * 3 + k) % len(words)] for k in range(5 + i % 7)))
+        hyps.append(" ".join(words[(i * 5 + k) % len(words)] for k in range(3 + i % 9)))
+    refs.append(refs[0])
+    hyps.append(hyps[0])
+    return refs, hyps
@@ -0,0 +1,34 @@
+import pytest
+
+from src import RadiologyEvaluator
+
+
+def _records(refs: list[str], hyps: list[str]) -> list[dict]:
+    return [{"ground_truth": ref, "prediction": hyp} for ref, hyp in zip(refs, hyps)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 7, 24, 100])
+def test_chunked_bleu_matches_single_shot(fake_radeval, report_pairs, chunk_size):
+    refs, hyps = report_pairs
+    evaluator = RadiologyEvaluator(metrics=["bleu"], bleu_backend="native")
+
+    single_shot = evaluator(refs, hyps)
+    chunked = evaluator.evaluate_chunked(_records(refs, hyps), chunk_size=chunk_size)
+
+    assert chunked == single_shot
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+@pytest.mark.parametrize("chunk_size", [1, 5, 24])
+def test_chunked_per_sample_and_corpus_metrics_match_single_shot(
+    fake_radeval, report_pairs, tmp_path, chunk_size, use_cache
+):
+    refs, hyps = report_pairs
+    metrics = ["bleu", "bertscore", "radgraph", "radcliq"]
+    single_shot = RadiologyEvaluator(metrics=metrics, bleu_backend="native")(refs, hyps)
+
+    cache_path = tmp_path / "scores.sqlite" if use_cache else None
+    evaluator = RadiologyEvaluator(metrics=metrics, bleu_backend="native", cache_path=cache_path)
+    chunked = evaluator.evaluate_chunked(_records(refs, hyps), chunk_size=chunk_size)
+
+    assert chunked == single_shot
@@ -0,0 +1,35 @@
+import numpy as np
+
+from src import MetricsStore, compare_runs
+from src.compare import resample_counts
+from src.store import BLEU_COLUMNS
+from src.streaming import CorpusBleu
+
+
+def _bleu_stats(rng: np.random.Generator, num_samples: int) -> np.ndarray:
+    """Per-sample [hyp_len, ref_len, guess_1..4, correct_1..4] rows with corpus-scale counts."""
+    guess = rng.integers(2**22, 2**23, size=(num_samples, 4))
+    correct = guess - rng.integers(0, 2**21, size=(num_samples, 4))
+    lengths = guess[:, :1] + rng.integers(0, 3, size=(num_samples, 2))
+    return np.concatenate([lengths, guess, correct], axis=1)
+
+
+def test_bootstrap_bleu_uses_exact_resampled_counts(tmp_path):
+    rng = np.random.default_rng(1)
+    num_samples, num_resamples = 300, 200
+    stats = {"a": _bleu_stats(rng, num_samples), "b": _bleu_stats(rng, num_samples)}
+    keys = [str(i) for i in range(num_samples)]
+
+    store = MetricsStore(tmp_path / "metrics.sqlite")
+    for run, values in stats.items():
+        store.add_run(run, keys, dict(zip(BLEU_COLUMNS, values.T)))
+    result = compare_runs(store, ["a", "b"], num_resamples=num_resamples, seed=0)["metrics"]["bleu"]
+    store.close()
+
+    # The same resamples, summed in integer arithmetic
+    counts = np.concatenate(list(resample_counts(num_samples, num_resamples, np.random.default_rng(0))))
+    counts = counts.astype(np.int64)
+    for run, values in stats.items():
+        resampled = CorpusBleu.score_stats(counts @ values)
+        expected = [round(float(v), 6) for v in np.percentile(resampled, [2.5, 97.5])]
+        assert result[run]["ci"] == expected
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+from src import PredictionsWriter, get_latest_predictions, load_predictions
+
+
+def test_latest_predictions_covers_both_formats(tmp_path):
+    older = tmp_path / "predictions_20250101_000000.jsonl"
+    newer = tmp_path / "predictions_20250102_000000.json"
+    older.write_text('{"metadata": {}}\n')
+    newer.write_text('{"metadata": {}, "predictions": []}')
+    os.utime(older, (1, 1))
+
+    assert get_latest_predictions(tmp_path) == newer
+
+
+def test_latest_predictions_raises_when_missing(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        get_latest_predictions(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        get_latest_predictions(tmp_path / "missing")
+
+
+def test_shared_writer_round_trips_without_taking_the_bare_module_name(tmp_path):
+    path = tmp_path / "predictions_x.jsonl"
+    writer = PredictionsWriter(path, {"model": "tiny"})
+    writer.write([{"index": 0, "ground_truth": "a", "prediction": "b"}])
+    writer.close({"done": True})
+
+    data = load_predictions(path)
+    assert data["metadata"] == {"model": "tiny", "done": True, "num_samples": 1}
+    assert list(data["predictions"]) == [{"index": 0, "ground_truth": "a", "prediction": "b"}]
+    assert "predictions_io" not in sys.modules
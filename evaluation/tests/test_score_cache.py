@@ -0,0 +1,49 @@
+import pytest
+
+from src import RadiologyEvaluator
+
+METRICS = ["bertscore", "radgraph", "radcliq"]
+
+
+def test_cached_scores_match_uncached(fake_radeval, report_pairs, tmp_path):
+    refs, hyps = report_pairs
+    uncached = RadiologyEvaluator(metrics=METRICS)(refs, hyps)
+
+    cache_path = tmp_path / "scores.sqlite"
+    cold = RadiologyEvaluator(metrics=METRICS, cache_path=cache_path)(refs, hyps)
+    warm = RadiologyEvaluator(metrics=METRICS, cache_path=cache_path)(refs, hyps)
+
+    assert cold == uncached
+    assert warm == uncached
+
+
+def test_partially_cached_scores_match_uncached(fake_radeval, report_pairs, tmp_path):
+    refs, hyps = report_pairs
+    uncached = RadiologyEvaluator(metrics=METRICS)(refs, hyps)
+
+    cache_path = tmp_path / "scores.sqlite"
+    RadiologyEvaluator(metrics=METRICS, cache_path=cache_path)(refs[:10], hyps[:10])
+    mixed = RadiologyEvaluator(metrics=METRICS, cache_path=cache_path)(refs, hyps)
+
+    assert mixed == uncached
+
+
+def test_cache_misses_are_scored_in_one_batched_call(fake_radeval, report_pairs, tmp_path):
+    refs, hyps = report_pairs
+    evaluator = RadiologyEvaluator(metrics=["bertscore"], cache_path=tmp_path / "scores.sqlite")
+    evaluator(refs[:10], hyps[:10])
+    evaluator(refs, hyps)
+    evaluator(refs, hyps)
+
+    # Misses only (the duplicate pair once), one call each time there are any
+    assert fake_radeval.CALLS == [("do_bertscore", True, 10), ("do_bertscore", True, len(refs) - 11)]
+
+
+def test_radcliq_is_scored_on_the_whole_corpus(fake_radeval, report_pairs):
+    refs, hyps = report_pairs
+    evaluator = RadiologyEvaluator(metrics=["radcliq"])
+
+    with pytest.raises(ValueError):
+        evaluator.per_sample_scores("radcliq", refs, hyps)
+    evaluator(refs, hyps)
+    assert fake_radeval.CALLS == [("do_radcliq", False, len(refs))]
@@ -1,5 +1,14 @@
+import sys
+import runpy
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent / "src"
+
+
 def main():
-    print("Hello from training-module!")
+    """Fine-tune on the Indiana University dataset; see src/train.py for the options."""
+    sys.path.insert(0, str(SRC_DIR))
+    runpy.run_path(str(SRC_DIR / "train.py"), run_name="__main__")
 
 
 if __name__ == "__main__":
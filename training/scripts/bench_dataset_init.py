@@ -0,0 +1,82 @@
+import sys
+import time
+import json
+import pickle
+import tempfile
+from pathlib import Path
+
+# --- CONFIGURATION ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(REPO_ROOT / "training" / "src"))
+
+from IU_dataset_loader import IndianaDataset
+from metadata_cache import METADATA_CACHE, build_metadata_table, load_metadata
+from synthetic_data import make_synthetic_dataset
+
+
+def best_of(fn, repeats: int) -> float:
+    """Fastest of `repeats` calls to fn, in milliseconds."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def run_benchmark(data_dir: Path, repeats: int) -> dict:
+    cache_path = data_dir / METADATA_CACHE
+
+    def cold_dataset():
+        cache_path.unlink(missing_ok=True)
+        return IndianaDataset(data_dir)
+
+    results = {
+        "csv_parse_ms": best_of(lambda: build_metadata_table(data_dir), repeats),
+        "cold_dataset_ms": best_of(cold_dataset, repeats),
+        "cached_load_ms": best_of(lambda: load_metadata(data_dir), repeats),
+        "warm_dataset_ms": best_of(lambda: IndianaDataset(data_dir), repeats),
+    }
+
+    # What a spawned DataLoader worker pays to receive the dataset
+    dataset = IndianaDataset(data_dir)
+    dataset[0]
+    payload = pickle.dumps(dataset)
+    results["worker_pickle_kb"] = len(payload) / 1024
+    results["worker_unpickle_ms"] = best_of(lambda: pickle.loads(payload)[0], repeats)
+    results["rows"] = dataset.num_projections
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark IndianaDataset startup: CSV parsing vs the Arrow metadata cache")
+    parser.add_argument("--data_path", type=str, default=None, help="Dataset root. Default: synthetic data of IU size.")
+    parser.add_argument("--num_studies", type=int, default=3851, help="Synthetic dataset size (IU has 3851 reports).")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.data_path:
+            data_dir = Path(args.data_path)
+        else:
+            print(f"Writing synthetic dataset with {args.num_studies} studies...")
+            data_dir = make_synthetic_dataset(Path(tmp) / "data", num_studies=args.num_studies, image_size=(8, 8))
+        results = run_benchmark(data_dir, args.repeats)
+
+    print(f"\nRows: {results['rows']}")
+    print(f"{'CSV parse + merge':<28}{results['csv_parse_ms']:>10.1f} ms")
+    print(f"{'Cached metadata load':<28}{results['cached_load_ms']:>10.1f} ms"
+          f"   ({results['csv_parse_ms'] / results['cached_load_ms']:.0f}x)")
+    print(f"{'IndianaDataset, no cache':<28}{results['cold_dataset_ms']:>10.1f} ms")
+    print(f"{'IndianaDataset, cached':<28}{results['warm_dataset_ms']:>10.1f} ms"
+          f"   ({results['cold_dataset_ms'] / results['warm_dataset_ms']:.0f}x)")
+    print(f"{'Worker unpickle + 1st item':<28}{results['worker_unpickle_ms']:>10.1f} ms"
+          f"   ({results['worker_pickle_kb']:.0f} KB pickled)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved to: {args.output}")
@@ -0,0 +1,106 @@
+import sys
+import json
+import tempfile
+import subprocess
+from pathlib import Path
+
+# --- CONFIGURATION ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(REPO_ROOT / "training" / "src"))
+BENCH_DIR = REPO_ROOT / "results" / "bench"
+
+from transformers import AutoProcessor
+
+import main
+from IU_dataset_loader import IndianaDataset
+from pixel_store import build_pixel_store
+from predictions_io import read_metadata
+from synthetic_data import make_synthetic_dataset
+from tiny_model import make_tiny_model
+
+# Fixed workload: same data, weights and generation length on every commit
+WORKLOADS = {
+    "batch_1": {"batch_size": 1},
+    "batch_4": {"batch_size": 4},
+    "batch_4_no_prefetch": {"batch_size": 4, "num_workers": 0},
+    "prefix_cache": {"batch_size": 1, "use_prefix_cache": True},
+    "pixel_store": {"batch_size": 4, "use_pixel_store": True},
+    "continuous": {"batch_size": 4, "scheduler": "continuous"},
+}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_workloads(names: list[str], num_samples: int, max_new_tokens: int, tmp: Path) -> dict:
+    data_dir = make_synthetic_dataset(tmp / "data", num_studies=num_samples, image_size=(256, 256))
+    model_dir = make_tiny_model(tmp / "model")
+
+    if "pixel_store" in names:
+        image_processor = AutoProcessor.from_pretrained(str(model_dir)).image_processor
+        main.PIXEL_STORE_DIR = tmp / "pixel_store"
+        build_pixel_store(IndianaDataset(data_dir), image_processor, main.PIXEL_STORE_DIR, num_workers=0)
+
+    results = {}
+    for name in names:
+        print(f"\n--- {name} ---")
+        output_path = main.run_inference(
+            num_samples=num_samples,
+            output_dir=tmp / "predictions" / name,
+            model="tiny-qwen2.5-vl",
+            model_path=model_dir,
+            data_path=data_dir,
+            max_new_tokens=max_new_tokens,
+            **WORKLOADS[name]
+        )
+        results[name] = read_metadata(output_path)["profile"]
+    return results
+
+
+def print_results(results: dict, baseline: dict | None = None):
+    print(f"\n{'workload':<22}{'samples/s':>11}{'tokens/s':>11}{'p50 s':>9}{'p95 s':>9}{'peak MB':>9}")
+    for name, profile in results.items():
+        row = (f"{name:<22}{profile['samples_per_s']:>11.2f}{profile['tokens_per_s']:>11.1f}"
+               f"{profile['latency_s']['p50']:>9.3f}{profile['latency_s']['p95']:>9.3f}{profile['peak_rss_mb']:>9.0f}")
+        if baseline and name in baseline:
+            change = profile["samples_per_s"] / baseline[name]["samples_per_s"] - 1
+            row += f"   {change:+.1%} vs baseline"
+        print(row)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark run_inference on a fixed synthetic workload with a tiny CPU model")
+    parser.add_argument("--workloads", type=str, nargs="+", default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser.add_argument("--num_samples", type=int, default=32)
+    parser.add_argument("--max_new_tokens", type=int, default=32)
+    parser.add_argument("--baseline", type=str, default=None, help="Earlier bench JSON to compare against.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run_workloads(args.workloads, args.num_samples, args.max_new_tokens, Path(tmp))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    revision = git_revision()
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    output_path = BENCH_DIR / f"bench_{revision}.json"
+    with open(output_path, "w") as f:
+        json.dump({
+            "revision": revision,
+            "num_samples": args.num_samples,
+            "max_new_tokens": args.max_new_tokens,
+            "results": results
+        }, f, indent=2)
+    print(f"\nSaved to: {output_path}")
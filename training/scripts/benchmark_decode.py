@@ -0,0 +1,46 @@
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+# --- CONFIGURATION ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(REPO_ROOT / "training" / "src"))
+
+from IU_dataset_loader import IndianaDataset
+from data_pipeline import make_loader
+from synthetic_data import make_synthetic_dataset
+
+
+def benchmark(dataset, num_workers: int, batch_size: int) -> float:
+    """Samples/sec for decoding the whole dataset (no model)."""
+    indices = list(range(len(dataset)))
+    start = time.perf_counter()
+    if num_workers is None:
+        for idx in indices:
+            dataset[idx]
+    else:
+        for _ in make_loader(dataset, indices, batch_size=batch_size, num_workers=num_workers):
+            pass
+    return len(indices) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark image decode throughput")
+    parser.add_argument("--num_studies", type=int, default=256, help="Synthetic studies (2 images each).")
+    parser.add_argument("--image_size", type=int, default=1024, help="Synthetic PNG side length.")
+    parser.add_argument("--batch_size", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Writing {args.num_studies * 2} synthetic PNGs...")
+        make_synthetic_dataset(tmp, num_studies=args.num_studies, image_size=(args.image_size, args.image_size))
+        dataset = IndianaDataset(tmp)
+
+        print(f"  sequential __getitem__: {benchmark(dataset, None, args.batch_size):8.1f} samples/sec")
+        for num_workers in args.workers:
+            rate = benchmark(dataset, num_workers, args.batch_size)
+            print(f"  DataLoader workers={num_workers:<2}: {rate:8.1f} samples/sec")
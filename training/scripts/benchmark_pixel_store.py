@@ -0,0 +1,58 @@
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+# --- CONFIGURATION ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(REPO_ROOT / "training" / "src"))
+
+from transformers import AutoProcessor, Qwen2VLImageProcessor
+
+from IU_dataset_loader import IndianaDataset
+from pixel_store import PixelStore, build_pixel_store
+from synthetic_data import make_synthetic_dataset
+from main import MODEL_PATH
+
+
+def cold_decode(dataset, image_processor) -> float:
+    """Samples/sec for PNG decode + resize/normalize."""
+    start = time.perf_counter()
+    for idx in range(len(dataset)):
+        image_processor(images=[dataset[idx]["image"]], return_tensors="np")
+    return len(dataset) / (time.perf_counter() - start)
+
+
+def memmap_reads(dataset) -> float:
+    """Samples/sec for serving the same tensors from the pixel store."""
+    start = time.perf_counter()
+    for idx in range(len(dataset)):
+        sample = dataset[idx]
+        sample["pixel_values"].sum()  # touch the pages
+    return len(dataset) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark PNG decode vs. memory-mapped pixel store")
+    parser.add_argument("--num_studies", type=int, default=64, help="Synthetic studies (2 images each).")
+    parser.add_argument("--image_size", type=int, default=1024, help="Synthetic PNG side length.")
+    args = parser.parse_args()
+
+    # Use the real processor config when the checkpoint is available
+    if MODEL_PATH.exists():
+        image_processor = AutoProcessor.from_pretrained(str(MODEL_PATH), local_files_only=True).image_processor
+    else:
+        image_processor = Qwen2VLImageProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = make_synthetic_dataset(
+            Path(tmp) / "data", num_studies=args.num_studies, image_size=(args.image_size, args.image_size)
+        )
+        dataset = IndianaDataset(data_dir)
+        store_path = build_pixel_store(dataset, image_processor, Path(tmp) / "store", num_workers=0)
+        cached = IndianaDataset(data_dir, pixel_store=PixelStore(store_path))
+
+        print(f"  PNG decode + processor: {cold_decode(dataset, image_processor):8.1f} samples/sec")
+        print(f"  pixel store (memmap):   {memmap_reads(cached):8.1f} samples/sec")
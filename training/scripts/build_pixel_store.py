@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+# --- CONFIGURATION ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(REPO_ROOT / "training" / "src"))
+
+from transformers import AutoProcessor
+
+from IU_dataset_loader import IndianaDataset
+from pixel_store import build_pixel_store
+from main import MODEL_PATH, DATA_PATH, PIXEL_STORE_DIR
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Preprocess all dataset images into a memory-mapped pixel store")
+    parser.add_argument("--model_path", type=str, default=str(MODEL_PATH), help="Model whose processor config to use.")
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="float32",
+        choices=["float32", "float16"],
+        help="Stored pixel dtype. float16 halves the store but can change model outputs."
+    )
+    parser.add_argument("--num_workers", type=int, default=4, help="Image decode workers.")
+    args = parser.parse_args()
+
+    if not DATA_PATH.exists():
+        print(f"Error: Data path not found at {DATA_PATH}")
+        print("Run 'python scripts/download_data.py' first.")
+        sys.exit(1)
+
+    processor = AutoProcessor.from_pretrained(args.model_path, local_files_only=True)
+    dataset = IndianaDataset(DATA_PATH)
+    build_pixel_store(
+        dataset,
+        processor.image_processor,
+        PIXEL_STORE_DIR,
+        dtype=args.dtype,
+        num_workers=args.num_workers
+    )
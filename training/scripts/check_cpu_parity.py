@@ -0,0 +1,112 @@
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# --- CONFIGURATION ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(REPO_ROOT / "training" / "src"))
+
+import torch
+
+from IU_dataset_loader import IndianaDataset
+from inference import cpu_supports_bf16, generate_reports, load_model
+from models import MODEL_REGISTRY, get_model_spec
+from profiling import InferenceProfiler
+from synthetic_data import make_synthetic_dataset
+from tiny_model import make_tiny_model
+
+# Each CPU mode is compared against the plain fp32 run
+CONFIGS = {
+    "fp32": {"dtype": "float32"},
+    "fp32_sdpa": {"dtype": "float32", "attn_implementation": "sdpa"},
+    "bf16": {"dtype": "bfloat16"},
+    "int8": {"quantize": "int8"},
+    "int8_compile": {"quantize": "int8", "compile": True},
+    "bf16_sdpa_compile": {"dtype": "bfloat16", "attn_implementation": "sdpa", "compile": True},
+}
+
+
+def run_config(model_path: Path, spec, images: list, batch_size: int, max_new_tokens: int, config: dict) -> dict:
+    model, processor = load_model(model_path, device="cpu", **{"dtype": "float32", **config})
+    profiler = InferenceProfiler()
+    outputs = []
+    for start in range(0, len(images), batch_size):
+        batch = images[start:start + batch_size]
+        outputs += generate_reports(
+            model, processor, batch, max_new_tokens=max_new_tokens, spec=spec, profiler=profiler
+        )
+        profiler.end_batch(len(batch))
+
+    token_ids = [processor.tokenizer(text, add_special_tokens=False)["input_ids"] for text in outputs]
+    return {"outputs": outputs, "token_ids": token_ids, "profile": profiler.summary()}
+
+
+def token_agreement(reference: list[int], candidate: list[int]) -> float:
+    """Fraction of positions (over the longer sequence) where both outputs have the same token."""
+    length = max(len(reference), len(candidate))
+    if length == 0:
+        return 1.0
+    return sum(a == b for a, b in zip(reference, candidate)) / length
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check CPU inference modes against the fp32 baseline")
+    parser.add_argument("--model", type=str, default="tiny-qwen2.5-vl", choices=list(MODEL_REGISTRY))
+    parser.add_argument("--data_path", type=str, default=None, help="Dataset root. Default: synthetic data.")
+    parser.add_argument("--num_samples", type=int, default=8)
+    parser.add_argument("--batch_size", type=int, default=4)
+    parser.add_argument("--max_new_tokens", type=int, default=64)
+    parser.add_argument("--configs", type=str, nargs="+", default=list(CONFIGS), choices=list(CONFIGS))
+    parser.add_argument("--output", type=str, default=None, help="Write the comparison as JSON.")
+    args = parser.parse_args()
+
+    if not cpu_supports_bf16():
+        print("Note: this CPU has no native bf16; bf16 modes will be emulated and slow.")
+
+    spec = get_model_spec(args.model)
+    configs = ["fp32"] + [name for name in args.configs if name != "fp32"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = spec.path
+        if args.model == "tiny-qwen2.5-vl":
+            model_path = make_tiny_model(Path(tmp) / "model")
+        data_path = Path(args.data_path) if args.data_path else make_synthetic_dataset(
+            Path(tmp) / "data", num_studies=args.num_samples, image_size=(256, 256)
+        )
+
+        # Fixed sample set: the first num_samples images
+        dataset = IndianaDataset(data_path)
+        images = [dataset[idx]["image"] for idx in range(min(args.num_samples, len(dataset)))]
+
+        torch.manual_seed(0)
+        runs = {
+            name: run_config(model_path, spec, images, args.batch_size, args.max_new_tokens, CONFIGS[name])
+            for name in configs
+        }
+
+    baseline = runs["fp32"]
+    baseline_speed = baseline["profile"]["tokens_per_s"]
+    report = {}
+    for name, run in runs.items():
+        agreement = [token_agreement(a, b) for a, b in zip(baseline["token_ids"], run["token_ids"])]
+        report[name] = {
+            "config": CONFIGS[name],
+            "exact_match": sum(a == b for a, b in zip(baseline["outputs"], run["outputs"])) / len(images),
+            "token_agreement": sum(agreement) / len(agreement),
+            "tokens_per_s": run["profile"]["tokens_per_s"],
+            "speedup": round(run["profile"]["tokens_per_s"] / baseline_speed, 2) if baseline_speed else None,
+            "peak_rss_mb": run["profile"]["peak_rss_mb"]
+        }
+
+    print(f"\n{'mode':<20}{'exact':>8}{'token agr.':>12}{'tokens/s':>11}{'speedup':>9}")
+    for name, row in report.items():
+        print(f"{name:<20}{row['exact_match']:>8.2f}{row['token_agreement']:>12.3f}"
+              f"{row['tokens_per_s']:>11.1f}{row['speedup']:>8.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"model": args.model, "num_samples": len(images), "results": report}, f, indent=2)
+        print(f"\nSaved to: {args.output}")
@@ -6,6 +6,9 @@ from pathlib import Path
 REPO_ROOT = Path(__file__).resolve().parent.parent.parent
 DATA_ROOT = REPO_ROOT.parent / "data" / "indiana_university"
 KAGGLE_DATASET = "raddar/chest-xrays-indiana-university"
+sys.path.insert(0, str(REPO_ROOT / "training" / "src"))
+
+from dataset_index import build_index
 
 def setup_directories():
     if not DATA_ROOT.exists():
@@ -14,7 +17,16 @@ def setup_directories():
     else:
         print(f"Data directory exists: {DATA_ROOT}")
 
-def download_dataset():
+def is_downloaded():
+    images_dir = DATA_ROOT / "images" / "images_normalized"
+    return (
+        (DATA_ROOT / "indiana_reports.csv").exists()
+        and (DATA_ROOT / "indiana_projections.csv").exists()
+        and images_dir.exists()
+        and any(images_dir.iterdir())
+    )
+
+def download_dataset(force=False):
     kaggle_config = Path.home() / ".kaggle" / "kaggle.json"
     if not kaggle_config.exists():
         print("Error: ~/.kaggle/kaggle.json not found.")
@@ -33,7 +45,8 @@ def download_dataset():
             KAGGLE_DATASET, 
             path=DATA_ROOT, 
             unzip=True,
-            quiet=False
+            quiet=False,
+            force=force  # otherwise reuse a complete archive from an earlier attempt
         )
         print("Download and extraction complete.")
         return True
@@ -45,20 +58,34 @@ def download_dataset():
         print(f"Download failed: {e}")
         return False
 
-def verify_files():
-    images_dir = DATA_ROOT / "images" / "images_normalized"
-    reports_csv = DATA_ROOT / "indiana_reports.csv"
-    
-    if images_dir.exists() and reports_csv.exists():
-        print("Data verification successful!")
-        count = len([f for f in os.listdir(images_dir) if f.endswith('.png')])
-        print(f"   - Found {count} X-ray images.")
-        return True
-    else:
+def verify_files(num_workers=8):
+    """Build (or refresh) the dataset index and report what it found."""
+    if not is_downloaded():
         print("Warning: Files missing. Check the folder structure.")
         return False
+    
+    index = build_index(DATA_ROOT, num_workers=num_workers)
+    stats = index.stats()
+    print("Data verification complete!")
+    print(f"   - Indexed {stats['images']} X-ray images ({stats['bytes'] / 2**30:.2f} GB).")
+    print(f"   - {stats['undecodable']} images failed to decode.")
+    print(f"   - {stats['missing_rows']} CSV rows have no usable image.")
+    for row in index.missing[:10]:
+        print(f"       uid {row['uid']}: {row['filename']} ({row['reason']})")
+    return stats["undecodable"] == 0 and stats["missing_rows"] == 0
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Download the Indiana University dataset and index it")
+    parser.add_argument("--force", action="store_true", help="Download again even if the data is present.")
+    parser.add_argument("--index_only", action="store_true", help="Skip the download and only refresh the index.")
+    parser.add_argument("--num_workers", type=int, default=os.cpu_count() or 1, help="Indexing processes.")
+    args = parser.parse_args()
+    
     setup_directories()
-    if download_dataset():
-        verify_files()
\ No newline at end of file
+    if args.index_only or (is_downloaded() and not args.force):
+        print("Dataset already downloaded; refreshing the index.")
+    elif not download_dataset(force=args.force):
+        sys.exit(1)
+    verify_files(args.num_workers)
\ No newline at end of file
@@ -0,0 +1,73 @@
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Canned reply in the NV-Reason output format, so parse_output splits it like a real one
+CANNED_OUTPUT = (
+    "<think>The lungs are clear. The cardiomediastinal silhouette is within normal limits.</think>\n"
+    "<answer>Findings: The heart size is normal. The lungs are clear without focal consolidation, "
+    "effusion or pneumothorax.\nImpression: No acute cardiopulmonary abnormality.</answer>"
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible endpoints for testing the http backend offline."""
+
+    # Keep-alive, so the client's connection pool is exercised
+    protocol_version = "HTTP/1.1"
+    delay_s = 0.0
+    models = ["nvidia-reason-3b"]
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": m, "object": "model"} for m in self.models]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != "/v1/chat/completions":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        time.sleep(self.delay_s)
+        self._send_json(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "model": request.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": CANNED_OUTPUT},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(CANNED_OUTPUT.split())}
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible server for the http backend")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before each reply.")
+    parser.add_argument("--models", type=str, nargs="+", default=["nvidia-reason-3b", "medgemma-1.5-4b"])
+    args = parser.parse_args()
+
+    StubHandler.delay_s = args.delay
+    StubHandler.models = args.models
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Stub server listening on http://{args.host}:{args.port}")
+    server.serve_forever()
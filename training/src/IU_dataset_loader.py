@@ -1,47 +1,157 @@
-import pandas as pd
+import io
+import os
+import hashlib
 from PIL import Image
 from torch.utils.data import Dataset
 from pathlib import Path
 
+from dataset_index import DatasetIndex
+from metadata_cache import load_metadata
+
+# None: one sample per projection. canonical: one view per study (frontal
+# if there is one). multiview: every view of a study in one sample.
+STUDY_MODES = (None, "canonical", "multiview")
+
+
 class IndianaDataset(Dataset):
-    def __init__(self, data_dir):
+    def __init__(self, data_dir, pixel_store=None, study_mode=None, hash_images=False):
+        """
+        Args:
+            data_dir: Root of the Indiana University dataset
+            pixel_store: Optional PixelStore; samples then carry preprocessed
+                         pixel tensors instead of decoded PIL images
+            study_mode: None, "canonical" or "multiview" (see STUDY_MODES)
+            hash_images: Add a sha256 of the image bytes ("content_hash")
+                         to every sample, for output deduplication
+        
+        Rows whose image is missing (or, with a dataset index from
+        scripts/download_data.py, undecodable) are dropped and reported in
+        ``self.dropped`` instead of being served as placeholder images.
+        """
+        if study_mode not in STUDY_MODES:
+            raise ValueError(f"Unknown study_mode: {study_mode}. Available: {STUDY_MODES}")
+        if study_mode == "multiview" and pixel_store is not None:
+            raise ValueError("The pixel store serves one image per sample; use study_mode='canonical'")
+        
         self.data_dir = Path(data_dir)
         self.images_dir = self.data_dir / "images" / "images_normalized"
+        self.pixel_store = pixel_store
+        self.study_mode = study_mode
+        self.hash_images = hash_images
         
-        # Load and merge metadata
-        reports = pd.read_csv(self.data_dir / "indiana_reports.csv")
-        projections = pd.read_csv(self.data_dir / "indiana_projections.csv")
+        # Typed metadata from the memory-mapped Arrow cache (CSVs are parsed once)
+        self._table = load_metadata(self.data_dir)
+        uids = self._table.column("uid").to_pylist()
+        filenames = self._table.column("filename").to_pylist()
+        projections = self._table.column("projection").to_pylist()
         
-        # Merge on 'uid' and clean missing data
-        self.data = pd.merge(projections, reports, on="uid", how="inner")
-        self.data = self.data.dropna(subset=["findings", "impression"])
+        # Drop rows without a usable image; the index makes this a dict lookup
+        self.index = DatasetIndex.load(self.data_dir)
+        available = self.index if self.index is not None else set(os.listdir(self.images_dir))
+        usable = [filename in available for filename in filenames]
+        rows = [row for row, ok in enumerate(usable) if ok]
+        self.dropped = [filename for filename, ok in zip(filenames, usable) if not ok]
+        if self.dropped:
+            print(f"Warning: dropped {len(self.dropped)} rows with missing or unreadable images")
+        self.num_projections = len(rows)
+        self.num_studies = len({uids[row] for row in rows})
         
+        if study_mode is not None:
+            # One sample per study, frontal view first
+            studies = {}
+            for row in sorted(rows, key=lambda r: (uids[r], projections[r] != "Frontal")):
+                studies.setdefault(uids[row], []).append(row)
+            groups = [g if study_mode == "multiview" else g[:1] for g in studies.values()]
+        else:
+            groups = [[row] for row in rows]
+        
+        # Per-sample lookups are plain lists; report strings stay in the mapping
+        self.uids = [uids[group[0]] for group in groups]
+        self.views = [[filenames[row] for row in group] for group in groups]
+        self.filenames = [views[0] for views in self.views]
+        self._report_rows = [group[0] for group in groups]
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = load_metadata(self.data_dir)
+        return self._table
+
+    def __getstate__(self):
+        # DataLoader workers re-map the cache file instead of unpickling reports
+        state = self.__dict__.copy()
+        state["_table"] = None
+        return state
+
+    def report(self, idx):
+        """Preformatted "Findings: ...\nImpression: ..." ground truth of a sample."""
+        return self.table.column("report")[self._report_rows[idx]].as_py()
 
     def __len__(self):
-        return len(self.data)
+        return len(self.filenames)
 
-    def __getitem__(self, idx):
-        row = self.data.iloc[idx]
-        
-        # 1. Load Image
-        img_name = row["filename"]
-        try:
-            image = Image.open(self.images_dir / img_name).convert("RGB")
-        except (FileNotFoundError, OSError):
-            image = Image.new("RGB", (224, 224)) # Black image fallback
+    def filename(self, idx):
+        """Image filename of a sample (its first view), without loading the image."""
+        return self.filenames[idx]
 
-        # 2. Prepare Report
-        findings = str(row.get("findings", ""))
-        impression = str(row.get("impression", ""))
-        full_report = f"Findings: {findings}\nImpression: {impression}"
+    def image_size(self, filename):
+        """(width, height) of an image, from the dataset index or else the PNG header (no decode)."""
+        if self.index is not None:
+            entry = self.index.images[filename]
+            return entry["width"], entry["height"]
+        with Image.open(self.images_dir / filename) as image:
+            return image.size
 
-        # 3. Return Raw Data
+    def study_stats(self) -> dict:
+        """How many projections were folded into how many samples."""
         return {
-            "image": image, 
-            "report": full_report,
-            "filename": img_name
+            "study_mode": self.study_mode,
+            "projections": self.num_projections,
+            "studies": self.num_studies,
+            "samples": len(self),
+            "images": sum(len(v) for v in self.views),
+            "dropped_rows": len(self.dropped),
+            "indexed": self.index is not None
         }
 
+    def _content_hash(self, views, blobs=None):
+        """sha256 of the image bytes; a multi-view sample hashes its views in order."""
+        if self.index is not None:
+            digests = [self.index.content_hash(name) for name in views]
+        else:
+            blobs = blobs or [(self.images_dir / name).read_bytes() for name in views]
+            digests = [hashlib.sha256(blob).hexdigest() for blob in blobs]
+        if len(digests) == 1:
+            return digests[0]
+        return hashlib.sha256("".join(digests).encode()).hexdigest()
+
+    def __getitem__(self, idx):
+        img_name = self.filenames[idx]
+        sample = {
+            "index": idx,
+            "report": self.report(idx),
+            "filename": img_name,
+            "uid": self.uids[idx]
+        }
+        if self.study_mode is not None:
+            sample["views"] = self.views[idx]
+        
+        # Serve zero-copy slices of the preprocessed store when available
+        if self.pixel_store is not None:
+            if self.hash_images:
+                sample["content_hash"] = self._content_hash(self.views[idx])
+            return {**sample, **self.pixel_store[img_name]}
+        
+        # 1. Load Image(s)
+        blobs = [(self.images_dir / name).read_bytes() for name in self.views[idx]]
+        images = [Image.open(io.BytesIO(blob)).convert("RGB") for blob in blobs]
+        
+        # 2. Return Raw Data (report is preformatted at construction)
+        sample["image"] = images if self.study_mode == "multiview" else images[0]
+        if self.hash_images:
+            sample["content_hash"] = self._content_hash(self.views[idx], blobs)
+        return sample
+
 if __name__ == "__main__":
     # Path setup
     REPO_ROOT = Path(__file__).resolve().parents[2]
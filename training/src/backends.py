@@ -0,0 +1,306 @@
+import io
+import time
+import base64
+import asyncio
+from pathlib import Path
+
+from models import ModelSpec
+from inference import generate_reports, load_model, optimization_info, resolve_dtype
+from prefix_cache import PrefixCache
+from postprocess import GenerationStats, THINK_END
+from profiling import InferenceProfiler
+from scheduler import ContinuousBatcher, PaddingStats
+from speculative import SpeculativeDecoder, load_draft_model
+from vision_cache import VisionFeatureCache, model_revision
+
+SCHEDULERS = ("static", "continuous")
+
+
+class HFBackend:
+    """
+    In-process transformers backend: loads the checkpoint and runs batched generate.
+
+    The "static" scheduler generates each loader batch with one generate
+    call. "continuous" hands the batch to a ContinuousBatcher, which packs
+    rows to max_batch_tokens and refills the slots of finished samples.
+
+    With vision_cache_path, image embeddings are served from (and added
+    to) a persistent VisionFeatureCache instead of running the vision tower.
+
+    With draft_model_path, samples are decoded one at a time by a
+    SpeculativeDecoder: the draft proposes num_draft_tokens tokens per step
+    and the main model verifies them, with the same greedy outputs.
+    """
+
+    name = "hf"
+
+    def __init__(
+        self,
+        spec: ModelSpec,
+        model_path: Path | None = None,
+        use_prefix_cache: bool = False,
+        max_new_tokens: int = 1024,
+        max_reasoning_tokens: int | None = None,
+        device: str = "auto",
+        dtype: str = "auto",
+        quantize: str | None = None,
+        compile: bool = False,
+        attn_implementation: str | None = None,
+        scheduler: str = "static",
+        max_batch_size: int = 8,
+        max_batch_tokens: int = 16384,
+        segment_tokens: int = 64,
+        vision_cache_path: Path | None = None,
+        vision_cache_mb: int = 10240,
+        draft_model_path: Path | None = None,
+        num_draft_tokens: int = 5
+    ):
+        if scheduler not in SCHEDULERS:
+            raise ValueError(f"Unknown scheduler: {scheduler}. Available: {list(SCHEDULERS)}")
+        if scheduler == "continuous" and (use_prefix_cache or max_reasoning_tokens is not None):
+            raise ValueError("The continuous scheduler does not support a prefix cache or a reasoning cap")
+        if draft_model_path is not None and (
+            scheduler != "static" or use_prefix_cache or max_reasoning_tokens is not None
+        ):
+            raise ValueError(
+                "Speculative decoding does not support the continuous scheduler, a prefix cache or a reasoning cap"
+            )
+        self.spec = spec
+        dtype = resolve_dtype(dtype, device, spec.dtype)
+        self.model, self.processor = load_model(
+            model_path or spec.path,
+            dtype,
+            device=device,
+            quantize=quantize,
+            compile=compile,
+            attn_implementation=attn_implementation
+        )
+        self.optimization = optimization_info(self.model, dtype, quantize, compile)
+        self.revision = model_revision(self.model, self.processor, model_path or spec.path)
+        self.vision_cache = None
+        if vision_cache_path is not None:
+            self.vision_cache = VisionFeatureCache(vision_cache_path, self.revision, budget_mb=vision_cache_mb)
+            self.vision_cache.attach(self.model)
+        self.prefix_cache = PrefixCache(self.model, self.processor) if use_prefix_cache else None
+        self.max_new_tokens = max_new_tokens
+        self.max_reasoning_tokens = max_reasoning_tokens
+        self.stats = GenerationStats(max_new_tokens, max_reasoning_tokens)
+        self.scheduler = scheduler
+        self.padding = PaddingStats()
+        self.batcher = None
+        if scheduler == "continuous":
+            self.batcher = ContinuousBatcher(
+                self.model,
+                self.processor,
+                spec,
+                max_new_tokens=max_new_tokens,
+                max_batch_size=max_batch_size,
+                max_batch_tokens=max_batch_tokens,
+                segment_tokens=segment_tokens,
+                stats=self.stats
+            )
+            self.padding = self.batcher.padding
+        self.speculative = None
+        if draft_model_path is not None:
+            draft = load_draft_model(draft_model_path, self.processor.tokenizer, dtype, device=device)
+            self.speculative = SpeculativeDecoder(
+                self.model,
+                draft,
+                self.processor,
+                spec,
+                num_draft_tokens=num_draft_tokens,
+                max_new_tokens=max_new_tokens,
+                generation_stats=self.stats
+            )
+
+    def generate(
+        self,
+        images: list,
+        pixel_items: list[dict] | None = None,
+        profiler: InferenceProfiler | None = None,
+        length_hints: list[int] | None = None
+    ) -> list[str]:
+        if self.batcher is not None:
+            return self.batcher.run(images, pixel_items=pixel_items, length_hints=length_hints, profiler=profiler)
+        if self.speculative is not None:
+            return self.speculative.run(images, pixel_items=pixel_items, profiler=profiler)
+        return generate_reports(
+            self.model,
+            self.processor,
+            images,
+            prefix_cache=self.prefix_cache,
+            pixel_items=pixel_items,
+            max_new_tokens=self.max_new_tokens,
+            max_reasoning_tokens=self.max_reasoning_tokens,
+            stats=self.stats,
+            spec=self.spec,
+            profiler=profiler,
+            padding=self.padding
+        )
+
+    def identity(self) -> dict:
+        """What produces the outputs: the loaded checkpoint's revision (see model_revision)."""
+        return {"revision": self.revision}
+
+    def metadata(self) -> dict:
+        metadata = {
+            "backend": self.name,
+            "optimization": self.optimization,
+            "generation": self.stats.stats(),
+            "scheduler": {"name": self.scheduler, **self.padding.stats()}
+        }
+        if self.batcher is not None:
+            metadata["scheduler"].update(
+                max_batch_size=self.batcher.max_batch_size,
+                max_batch_tokens=self.batcher.max_batch_tokens,
+                segment_tokens=self.batcher.segment_tokens
+            )
+        if self.prefix_cache is not None:
+            metadata["prefix_cache"] = self.prefix_cache.stats()
+        if self.vision_cache is not None:
+            metadata["vision_cache"] = self.vision_cache.stats()
+        if self.speculative is not None:
+            metadata["speculative"] = self.speculative.stats()
+        return metadata
+
+    def close(self):
+        if self.vision_cache is not None:
+            self.vision_cache.close()
+
+
+class HTTPBackend:
+    """
+    Client for an OpenAI-compatible chat completions server (vLLM, or scripts/stub_server.py).
+
+    Each batch is sent as one request per image, all in flight at once up to
+    ``concurrency``, over a pooled keep-alive session. Batching the requests
+    together is left to the server, which schedules them continuously.
+    Start vLLM with ``--served-model-name`` set to the registry name.
+    """
+
+    name = "http"
+
+    def __init__(
+        self,
+        spec: ModelSpec,
+        server_url: str = "http://localhost:8000",
+        concurrency: int = 8,
+        max_new_tokens: int = 1024,
+        timeout_s: float = 600.0
+    ):
+        import aiohttp
+
+        self.spec = spec
+        self.url = server_url.rstrip("/") + "/v1/chat/completions"
+        self.concurrency = concurrency
+        self.max_new_tokens = max_new_tokens
+        self._aiohttp = aiohttp
+        self._timeout = aiohttp.ClientTimeout(total=timeout_s)
+        self._loop = asyncio.new_event_loop()
+        self._session = None
+
+        self.latencies = []
+        self.completion_tokens = 0
+        self.wall_s = 0.0
+
+    def _messages(self, image) -> list[dict]:
+        content = []
+        for view in image if isinstance(image, list) else [image]:
+            buffer = io.BytesIO()
+            # Lossless; light compression keeps encoding off the critical path
+            view.save(buffer, format="PNG", compress_level=1)
+            data_url = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+            content.append({"type": "image_url", "image_url": {"url": data_url}})
+        content.append({"type": "text", "text": self.spec.prompt})
+        messages = [{"role": "user", "content": content}]
+        if self.spec.system_prompt is not None:
+            messages.insert(0, {"role": "system", "content": self.spec.system_prompt})
+        return messages
+
+    async def _request(self, semaphore: asyncio.Semaphore, image) -> tuple[str, dict]:
+        # PNG encoding runs in a thread so it overlaps with requests in flight
+        messages = await self._loop.run_in_executor(None, self._messages, image)
+        payload = {
+            "model": self.spec.name,
+            "messages": messages,
+            "max_tokens": self.max_new_tokens,
+            "temperature": 0.0
+        }
+        async with semaphore:
+            start = time.perf_counter()
+            async with self._session.post(self.url, json=payload) as response:
+                response.raise_for_status()
+                body = await response.json()
+            self.latencies.append(time.perf_counter() - start)
+
+        usage = body.get("usage", {})
+        self.completion_tokens += usage.get("completion_tokens", 0)
+        message = body["choices"][0]["message"]
+        content = message.get("content") or ""
+        # vLLM with a reasoning parser returns the <think> body separately
+        reasoning = message.get("reasoning_content")
+        if reasoning:
+            content = f"<think>{reasoning}{THINK_END}\n{content}"
+        return content, usage
+
+    async def _generate(self, images: list) -> list[tuple[str, dict]]:
+        if self._session is None:
+            connector = self._aiohttp.TCPConnector(limit=self.concurrency)
+            self._session = self._aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self._request(semaphore, image) for image in images))
+
+    def generate(
+        self,
+        images: list,
+        pixel_items: list[dict] | None = None,
+        profiler: InferenceProfiler | None = None,
+        length_hints: list[int] | None = None
+    ) -> list[str]:
+        # length_hints is unused: the server does its own continuous batching
+        if pixel_items is not None:
+            raise ValueError("The http backend sends images, not preprocessed pixels")
+        start = time.perf_counter()
+        responses = self._loop.run_until_complete(self._generate(images))
+        elapsed = time.perf_counter() - start
+        self.wall_s += elapsed
+
+        if profiler is not None:
+            profiler.add("request", elapsed)
+            profiler.record_tokens(
+                [usage.get("prompt_tokens") for _, usage in responses],
+                [usage.get("completion_tokens") for _, usage in responses]
+            )
+        return [content for content, _ in responses]
+
+    def identity(self) -> dict:
+        """What produces the outputs: the server and the model name it is asked for."""
+        return {"server_url": self.url, "served_model": self.spec.name}
+
+    def metadata(self) -> dict:
+        latencies = sorted(self.latencies)
+        n = len(latencies)
+        return {
+            "backend": self.name,
+            "server_url": self.url,
+            "concurrency": self.concurrency,
+            "max_new_tokens": self.max_new_tokens,
+            "requests": n,
+            "completion_tokens": self.completion_tokens,
+            "mean_latency_s": round(sum(latencies) / n, 3) if n else None,
+            "max_latency_s": round(latencies[-1], 3) if n else None,
+            "requests_per_s": round(n / self.wall_s, 2) if self.wall_s else None,
+            "tokens_per_s": round(self.completion_tokens / self.wall_s, 1) if self.wall_s else None
+        }
+
+    def close(self):
+        if self._session is not None:
+            self._loop.run_until_complete(self._session.close())
+            self._session = None
+        self._loop.close()
+
+
+BACKENDS = {
+    HFBackend.name: HFBackend,
+    HTTPBackend.name: HTTPBackend
+}
@@ -0,0 +1,145 @@
+import json
+import shutil
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from safetensors.torch import load_file, save_file
+
+WEIGHTS_INDEX = "model.safetensors.index.json"
+OPTIMIZER_STATE = "optimizer.pt"
+TRAINER_STATE = "trainer_state.json"
+
+
+def _to_cpu(obj):
+    """Deep copy of a (nested) state dict with every tensor cloned to CPU."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {k: _to_cpu(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_to_cpu(v) for v in obj)
+    return obj
+
+
+def trainable_state_dict(model) -> dict[str, torch.Tensor]:
+    """Parameters that receive gradients: the adapters under LoRA, everything otherwise."""
+    return {name: param for name, param in model.named_parameters() if param.requires_grad}
+
+
+def _shard(tensors: dict[str, torch.Tensor], max_shard_bytes: int) -> list[dict[str, torch.Tensor]]:
+    shards, current, size = [], {}, 0
+    for name, tensor in tensors.items():
+        nbytes = tensor.numel() * tensor.element_size()
+        if current and size + nbytes > max_shard_bytes:
+            shards.append(current)
+            current, size = {}, 0
+        current[name] = tensor
+        size += nbytes
+    if current:
+        shards.append(current)
+    return shards
+
+
+def write_checkpoint(path: Path, weights: dict, optimizer_state: dict, trainer_state: dict, max_shard_bytes: int):
+    """
+    Write a checkpoint directory.
+
+    Weights go to safetensors shards with a Hugging Face style index
+    (``model.safetensors.index.json``), next to the optimizer/scheduler
+    state and ``trainer_state.json``. Everything is written to
+    ``<path>.tmp`` and renamed at the end, so a crash never leaves a
+    checkpoint that looks complete but is not.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    shards = _shard(weights, max_shard_bytes)
+    weight_map = {}
+    for i, shard in enumerate(shards, start=1):
+        filename = f"model-{i:05d}-of-{len(shards):05d}.safetensors"
+        save_file({k: v.contiguous() for k, v in shard.items()}, tmp_path / filename)
+        weight_map.update(dict.fromkeys(shard, filename))
+
+    total_size = sum(t.numel() * t.element_size() for t in weights.values())
+    with open(tmp_path / WEIGHTS_INDEX, "w") as f:
+        json.dump({"metadata": {"total_size": total_size}, "weight_map": weight_map}, f, indent=2)
+    torch.save(optimizer_state, tmp_path / OPTIMIZER_STATE)
+    with open(tmp_path / TRAINER_STATE, "w") as f:
+        json.dump(trainer_state, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    tmp_path.rename(path)
+
+
+class AsyncCheckpointer:
+    """
+    Save checkpoints on a background thread so training steps keep running.
+
+    ``save`` copies the trainable weights and the optimizer/scheduler state
+    to CPU (the only part that blocks the training loop) and hands them to a
+    writer thread, which shards and writes them with write_checkpoint. At
+    most one write is in flight: a new ``save`` first waits for the previous
+    one, and a failed write is raised there (or by ``wait``). Only the
+    ``keep_last`` newest ``step_<N>`` directories are kept.
+    """
+
+    def __init__(self, output_dir: str | Path, max_shard_mb: int = 1024, keep_last: int = 2):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.max_shard_bytes = max_shard_mb * 1024 * 1024
+        self.keep_last = keep_last
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+        self._pending = None
+
+    def save(self, step: int, model, optimizer, scheduler, trainer_state: dict) -> Path:
+        """Snapshot the training state and write it in the background; returns the target directory."""
+        self.wait()
+        weights = _to_cpu(trainable_state_dict(model))
+        optimizer_state = _to_cpu({"optimizer": optimizer.state_dict(), "scheduler": scheduler.state_dict()})
+        path = self.output_dir / f"step_{step}"
+        self._pending = self._executor.submit(self._write, path, weights, optimizer_state, dict(trainer_state))
+        return path
+
+    def _write(self, path: Path, weights: dict, optimizer_state: dict, trainer_state: dict):
+        write_checkpoint(path, weights, optimizer_state, trainer_state, self.max_shard_bytes)
+        for old in list_checkpoints(self.output_dir)[:-self.keep_last]:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def wait(self):
+        """Block until the in-flight write (if any) is on disk."""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
+
+
+def list_checkpoints(output_dir: str | Path) -> list[Path]:
+    """Complete checkpoints under output_dir, oldest first."""
+    paths = [p for p in Path(output_dir).glob("step_*") if p.is_dir() and (p / TRAINER_STATE).exists()]
+    return sorted(paths, key=lambda p: int(p.name.split("_")[1]))
+
+
+def load_checkpoint(path: str | Path, model, optimizer, scheduler) -> dict:
+    """Restore weights, optimizer and scheduler from a checkpoint; returns its trainer state."""
+    path = Path(path)
+    with open(path / WEIGHTS_INDEX, "r") as f:
+        weight_map = json.load(f)["weight_map"]
+
+    weights = {}
+    for filename in sorted(set(weight_map.values())):
+        weights.update(load_file(path / filename))
+    missing = set(trainable_state_dict(model)) - set(weights)
+    if missing:
+        raise ValueError(f"Checkpoint {path} is missing {len(missing)} trainable tensors, e.g. {sorted(missing)[:3]}")
+    model.load_state_dict(weights, strict=False)
+
+    state = torch.load(path / OPTIMIZER_STATE, map_location="cpu")
+    optimizer.load_state_dict(state["optimizer"])
+    scheduler.load_state_dict(state["scheduler"])
+    with open(path / TRAINER_STATE, "r") as f:
+        return json.load(f)
@@ -0,0 +1,62 @@
+from torch.utils.data import DataLoader
+
+# Per-sample fields collated into lists under a plural key when present
+OPTIONAL_FIELDS = {"uid": "uids", "views": "views", "content_hash": "content_hashes"}
+
+
+def collate_samples(batch: list[dict]) -> dict:
+    """
+    Collate dataset samples into lists, keeping images as PIL objects.
+
+    Samples served from a PixelStore have no "image"; their preprocessed
+    tensors are passed through as "pixel_items" instead. A multi-view
+    sample's "image" is a list of PIL images.
+    """
+    collated = {
+        "indices": [sample["index"] for sample in batch],
+        "reports": [sample["report"] for sample in batch],
+        "filenames": [sample["filename"] for sample in batch]
+    }
+    for field, key in OPTIONAL_FIELDS.items():
+        if field in batch[0]:
+            collated[key] = [sample[field] for sample in batch]
+    if "image" in batch[0]:
+        collated["images"] = [sample["image"] for sample in batch]
+    else:
+        collated["images"] = [None] * len(batch)
+        collated["pixel_items"] = [
+            {k: v for k, v in sample.items() if k not in ("index", "report", "filename", *OPTIONAL_FIELDS)}
+            for sample in batch
+        ]
+    return collated
+
+
+def make_loader(
+    dataset,
+    indices: list[int],
+    batch_size: int = 1,
+    num_workers: int = 2,
+    prefetch_factor: int = 2
+) -> DataLoader:
+    """
+    Build a prefetching loader over the given dataset indices.
+
+    Worker processes open and decode images while the model is generating,
+    so the next batch is ready as soon as the current one finishes. Batches
+    come back in the order of ``indices``.
+
+    Args:
+        dataset: Dataset returning dicts with index/image/report/filename
+        indices: Dataset indices to load, in processing order
+        batch_size: Samples per batch
+        num_workers: Decode worker processes (0 decodes on the main thread)
+        prefetch_factor: Batches each worker loads ahead
+    """
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        sampler=indices,
+        num_workers=num_workers,
+        collate_fn=collate_samples,
+        prefetch_factor=prefetch_factor if num_workers > 0 else None
+    )
@@ -0,0 +1,142 @@
+import os
+import io
+import json
+import hashlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from PIL import Image
+from tqdm import tqdm
+
+INDEX_FILENAME = "dataset_index.json"
+INDEX_VERSION = 1
+
+
+def _inspect(path: str) -> dict:
+    """Size, sha256, dimensions and decodability of one image file."""
+    with open(path, "rb") as f:
+        blob = f.read()
+    entry = {"sha256": hashlib.sha256(blob).hexdigest(), "ok": True}
+    try:
+        with Image.open(io.BytesIO(blob)) as image:
+            image.load()  # full decode, not just the header
+            entry["width"], entry["height"] = image.size
+    except Exception as e:
+        entry["ok"] = False
+        entry["error"] = f"{type(e).__name__}: {e}"
+    return entry
+
+
+class DatasetIndex:
+    """
+    Integrity index of an Indiana University dataset directory.
+
+    ``images`` maps every PNG filename to its size, mtime, sha256, width,
+    height and whether it decodes. ``missing`` lists the rows of the merged
+    CSVs whose image is absent or undecodable. Membership (``filename in
+    index``) is a dict lookup, so datasets can filter rows without touching
+    the filesystem.
+    """
+
+    def __init__(self, data_dir: str | Path, images: dict, missing: list[dict]):
+        self.data_dir = Path(data_dir)
+        self.images = images
+        self.missing = missing
+
+    @staticmethod
+    def path_for(data_dir: str | Path) -> Path:
+        return Path(data_dir) / INDEX_FILENAME
+
+    @classmethod
+    def load(cls, data_dir: str | Path) -> "DatasetIndex | None":
+        """The saved index of data_dir, or None if it has not been built."""
+        path = cls.path_for(data_dir)
+        if not path.exists():
+            return None
+        with open(path, "r") as f:
+            index = json.load(f)
+        if index.get("version") != INDEX_VERSION:
+            return None
+        return cls(data_dir, index["images"], index["missing"])
+
+    def save(self):
+        path = self.path_for(self.data_dir)
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "images": self.images, "missing": self.missing}, f)
+        os.replace(tmp_path, path)
+
+    def __contains__(self, filename: str) -> bool:
+        """Whether the image exists and decodes."""
+        entry = self.images.get(filename)
+        return entry is not None and entry["ok"]
+
+    def content_hash(self, filename: str) -> str:
+        return self.images[filename]["sha256"]
+
+    def stats(self) -> dict:
+        return {
+            "images": len(self.images),
+            "undecodable": sum(not e["ok"] for e in self.images.values()),
+            "bytes": sum(e["size"] for e in self.images.values()),
+            "missing_rows": len(self.missing)
+        }
+
+
+def build_index(data_dir: str | Path, num_workers: int = 8) -> DatasetIndex:
+    """
+    Build or refresh the integrity index of data_dir.
+
+    Files whose size and mtime match the previous index keep their entry;
+    only new or changed files are hashed and decoded, spread over
+    num_workers processes. Then every row of the merged CSVs is checked
+    against the index.
+    """
+    data_dir = Path(data_dir)
+    images_dir = data_dir / "images" / "images_normalized"
+    previous = DatasetIndex.load(data_dir)
+    previous_images = previous.images if previous is not None else {}
+
+    images, todo = {}, []
+    with os.scandir(images_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".png"):
+                continue
+            stat = entry.stat()
+            old = previous_images.get(entry.name)
+            if old is not None and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+                images[entry.name] = old
+            else:
+                images[entry.name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                todo.append(entry.name)
+
+    print(f"Indexing {len(todo)} new or changed images ({len(images) - len(todo)} unchanged)")
+    if todo:
+        paths = [str(images_dir / name) for name in todo]
+        if num_workers > 0:
+            with ProcessPoolExecutor(max_workers=num_workers) as pool:
+                results = pool.map(_inspect, paths, chunksize=32)
+                for name, result in tqdm(zip(todo, results), total=len(todo), desc="Hashing"):
+                    images[name].update(result)
+        else:
+            for name, path in tqdm(zip(todo, paths), total=len(todo), desc="Hashing"):
+                images[name].update(_inspect(path))
+
+    # Rows whose image cannot be served
+    reports = pd.read_csv(data_dir / "indiana_reports.csv")
+    projections = pd.read_csv(data_dir / "indiana_projections.csv")
+    merged = pd.merge(projections, reports, on="uid", how="inner")
+    missing = []
+    for uid, filename in zip(merged["uid"], merged["filename"]):
+        entry = images.get(filename)
+        if entry is None or not entry["ok"]:
+            missing.append({
+                "uid": int(uid),
+                "filename": filename,
+                "reason": "missing" if entry is None else "undecodable"
+            })
+
+    index = DatasetIndex(data_dir, images, missing)
+    index.save()
+    return index
@@ -0,0 +1,117 @@
+import json
+import sqlite3
+import hashlib
+from pathlib import Path
+
+
+class OutputCache:
+    """
+    Persistent SQLite map from an input key to the raw model output.
+
+    Keys hash the generation config together with the image content, so a
+    cached output is only reused for the same model, prompt and budget.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Shard workers share the file; wait for each other's writes
+        self._conn = sqlite3.connect(self.path, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS outputs (key TEXT PRIMARY KEY, output TEXT NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        unique = list(dict.fromkeys(keys))
+        found = {}
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self._conn.execute(
+                f"SELECT key, output FROM outputs WHERE key IN ({placeholders})", chunk
+            ).fetchall())
+        return found
+
+    def put_many(self, items: dict[str, str]):
+        self._conn.executemany("INSERT OR REPLACE INTO outputs (key, output) VALUES (?, ?)", items.items())
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+class Deduplicator:
+    """
+    Generate each distinct input once and reuse its output for every copy.
+
+    Samples are identified by the content hash of their image bytes. Within
+    a run, a repeated image is generated once; across runs, outputs come
+    from the OutputCache. Counts of generated and reused samples are kept
+    for the run metadata.
+    """
+
+    def __init__(self, cache_path: str | Path, config: dict):
+        self.cache = OutputCache(cache_path)
+        self._config = json.dumps(config, sort_keys=True, default=str)
+        self._seen = set()  # keys generated or reused in this run
+
+        self.samples = 0
+        self.generated = 0
+        self.reused_in_run = 0
+        self.reused_from_cache = 0
+
+    def key(self, content_hash: str) -> str:
+        return hashlib.sha256(f"{self._config}:{content_hash}".encode()).hexdigest()
+
+    def generate(self, batch: dict, generate_fn) -> tuple[list[str], list[int]]:
+        """
+        Outputs for a collated batch, calling generate_fn(images, pixel_items)
+        only on the rows whose input has no output yet.
+
+        Returns the outputs in batch order and the rows that were generated.
+        """
+        keys = [self.key(h) for h in batch["content_hashes"]]
+        outputs = self.cache.get_many(keys)
+
+        # First occurrence of each missing key is generated
+        rows, pending = [], set()
+        for row, key in enumerate(keys):
+            if key not in outputs and key not in pending:
+                rows.append(row)
+                pending.add(key)
+
+        if rows:
+            pixel_items = batch.get("pixel_items")
+            generated = generate_fn(
+                [batch["images"][row] for row in rows],
+                [pixel_items[row] for row in rows] if pixel_items is not None else None
+            )
+            new = {keys[row]: output for row, output in zip(rows, generated)}
+            self.cache.put_many(new)
+            outputs.update(new)
+
+        for key in keys:
+            self.samples += 1
+            if key in pending:
+                pending.discard(key)
+                self.generated += 1
+            elif key in self._seen:
+                self.reused_in_run += 1
+            else:
+                self.reused_from_cache += 1
+            self._seen.add(key)
+
+        return [outputs[key] for key in keys], rows
+
+    def stats(self) -> dict:
+        return {
+            "cache_path": str(self.cache.path),
+            "samples": self.samples,
+            "generated": self.generated,
+            "reused_in_run": self.reused_in_run,
+            "reused_from_cache": self.reused_from_cache,
+            "generate_calls_saved": round(1 - self.generated / self.samples, 4) if self.samples else 0.0
+        }
+
+    def close(self):
+        self.cache.close()
@@ -0,0 +1,300 @@
+import time
+import torch
+from pathlib import Path
+
+from transformers import AutoModelForImageTextToText, AutoProcessor, StoppingCriteriaList
+
+from models import MODEL_REGISTRY, DEFAULT_MODEL, ModelSpec
+from pixel_store import processor_inputs
+from prefix_cache import PrefixCache
+from postprocess import FORCE_ANSWER, GenerationStats, ReportStoppingCriteria
+from profiling import InferenceProfiler
+
+
+def cpu_supports_bf16() -> bool:
+    """Whether this CPU has native bf16 matmuls (AVX512-BF16 / AMX)."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def resolve_dtype(dtype: str, device: str, default: str) -> str:
+    """
+    Pick the weight dtype for a run.
+
+    "auto" keeps the model's registry dtype on GPU. On CPU, where fp16 is
+    slow or unsupported, it uses bf16 if the CPU supports it natively and
+    fp32 otherwise.
+    """
+    if dtype != "auto":
+        return dtype
+    if device != "cpu" and torch.cuda.is_available():
+        return default
+    return "bfloat16" if cpu_supports_bf16() else "float32"
+
+
+def load_model(
+    model_path: Path,
+    dtype: str = "float16",
+    device: str = "auto",
+    quantize: str | None = None,
+    compile: bool = False,
+    attn_implementation: str | None = None
+):
+    """
+    Load model and processor.
+    
+    Args:
+        model_path: Checkpoint directory.
+        dtype: Weight dtype (float32, float16 or bfloat16).
+        device: device_map for from_pretrained ("auto", "cpu", "cuda", ...).
+        quantize: "int8" for dynamic int8 quantization of every nn.Linear
+                  (CPU only; weights are loaded in float32 first).
+        compile: torch.compile the text decoder, which runs every decode step.
+        attn_implementation: "sdpa", "eager" or "flash_attention_2"
+                             (None lets transformers choose).
+    """
+    print(f"Loading model from: {model_path}")
+    processor = AutoProcessor.from_pretrained(str(model_path), local_files_only=True)
+    # Batched generation needs prompts aligned on the right edge
+    processor.tokenizer.padding_side = "left"
+    
+    if quantize is not None:
+        if quantize != "int8":
+            raise ValueError(f"Unknown quantization: {quantize}. Available: ['int8']")
+        if device != "cpu":
+            raise ValueError("int8 dynamic quantization needs device='cpu'")
+        dtype = "float32"
+    
+    model = AutoModelForImageTextToText.from_pretrained(
+        model_path,
+        torch_dtype=getattr(torch, dtype),
+        device_map=device,
+        attn_implementation=attn_implementation,
+        local_files_only=True
+    )
+    model.eval()
+    
+    if quantize == "int8":
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    if compile:
+        # Shapes change every step (growing cache, varying batch), so compile dynamically
+        model.get_decoder().compile(dynamic=True)
+    
+    print("Model loaded successfully!")
+    return model, processor
+
+
+def optimization_info(model, dtype: str, quantize: str | None, compile: bool) -> dict:
+    """How the model was loaded, for the run metadata."""
+    return {
+        "device": str(model.device),
+        "dtype": "float32" if quantize else dtype,
+        "quantize": quantize,
+        "compile": compile,
+        "attn_implementation": model.config._attn_implementation,
+        "num_threads": torch.get_num_threads()
+    }
+
+
+def build_messages(image, spec: ModelSpec | None = None, text_first: bool = False) -> list[dict]:
+    """
+    Build the chat messages for a single image.
+    
+    The prompt (and optional system prompt) come from the model's registry
+    entry. A list of images (the views of one study) goes into one message.
+    With text_first the instruction block comes before the image, which
+    makes the whole instruction a shared prefix that PrefixCache can reuse.
+    """
+    spec = spec or MODEL_REGISTRY[DEFAULT_MODEL]
+    views = image if isinstance(image, list) else [image]
+    images = [{"type": "image", "image": view} for view in views]
+    text = {"type": "text", "text": spec.prompt}
+    content = [text, *images] if text_first else [*images, text]
+    messages = [
+        {
+            "role": "user",
+            "content": content
+        }
+    ]
+    if spec.system_prompt is not None:
+        messages.insert(0, {
+            "role": "system",
+            "content": [{"type": "text", "text": spec.system_prompt}]
+        })
+    return messages
+
+
+def prepare_inputs(model, processor, texts: list[str], images: list, pixel_items: list[dict] | None = None) -> dict:
+    """Tokenize chat texts with their images (or stored pixel tensors) onto the model device."""
+    if pixel_items is not None:
+        inputs = processor_inputs(processor, texts, pixel_items)
+    else:
+        # One image list per prompt, which every chat processor accepts
+        nested = [image if isinstance(image, list) else [image] for image in images]
+        inputs = processor(text=texts, images=nested, padding=True, return_tensors="pt")
+    return {k: v.to(model.device) for k, v in inputs.items()}
+
+
+def _generate(
+    model,
+    processor,
+    inputs: dict,
+    max_new_tokens: int,
+    criteria: ReportStoppingCriteria,
+    prefix_cache: PrefixCache | None = None,
+    profiler: InferenceProfiler | None = None,
+    padding=None
+) -> tuple[list[str], list[int]]:
+    """Run one greedy generate call; returns decoded outputs and generated token counts."""
+    start = time.perf_counter()
+    generate_inputs = inputs
+    if prefix_cache is not None:
+        # Image tokens are already in the prefilled cache, so generate only
+        # needs the ids to continue from.
+        generate_inputs = {
+            "input_ids": inputs["input_ids"],
+            "attention_mask": inputs["attention_mask"],
+            "past_key_values": prefix_cache.prefill(inputs)
+        }
+    
+    with torch.no_grad():
+        generated_ids = model.generate(
+            **generate_inputs,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            stopping_criteria=StoppingCriteriaList([criteria])
+        )
+    generated_at = time.perf_counter()
+    
+    # Prompts are left-padded to a common width, so every row's prompt ends
+    # at the same position and the remainder is that row's generated text.
+    generated_ids_trimmed = [
+        out_ids[len(in_ids):] for in_ids, out_ids in zip(inputs["input_ids"], generated_ids)
+    ]
+    num_tokens = [
+        int((ids != processor.tokenizer.pad_token_id).sum()) for ids in generated_ids_trimmed
+    ]
+    
+    output_texts = processor.batch_decode(
+        generated_ids_trimmed,
+        skip_special_tokens=True,
+        clean_up_tokenization_spaces=False
+    )
+    
+    if profiler is not None:
+        first_step_at = criteria.first_step_at or generated_at
+        profiler.add("prefill", first_step_at - start)
+        profiler.add("decode", generated_at - first_step_at)
+        profiler.add("postprocess", time.perf_counter() - generated_at)
+    if padding is not None:
+        width = inputs["input_ids"].shape[1]
+        padding.record(inputs["attention_mask"].sum(dim=1).tolist(), width, num_tokens, generated_ids.shape[1] - width)
+    
+    return output_texts, num_tokens
+
+
+def generate_reports(
+    model,
+    processor,
+    images: list,
+    max_new_tokens: int = 1024,
+    prefix_cache: PrefixCache | None = None,
+    pixel_items: list[dict] | None = None,
+    max_reasoning_tokens: int | None = None,
+    stats: GenerationStats | None = None,
+    spec: ModelSpec | None = None,
+    profiler: InferenceProfiler | None = None,
+    padding=None
+) -> list[str]:
+    """
+    Generate reports for a batch of images with one batched generate call.
+    
+    Generation stops per sample once the </answer> block is closed. With
+    max_reasoning_tokens, samples whose <think> block runs past the cap are
+    stopped, their reasoning is closed, and only the report is generated
+    in a second call.
+    
+    If pixel_items (preprocessed tensors from a PixelStore) are given, the
+    image processor is skipped and images may be None placeholders.
+    
+    With a profiler, processor/prefill/decode/postprocess times and token
+    counts of the batch are added to it; with padding (a
+    scheduler.PaddingStats), the padded slots of each generate call.
+    """
+    start = time.perf_counter()
+    texts = [
+        processor.apply_chat_template(
+            build_messages(image, spec, text_first=prefix_cache is not None),
+            add_generation_prompt=True
+        )
+        for image in images
+    ]
+    inputs = prepare_inputs(model, processor, texts, images, pixel_items)
+    if profiler is not None:
+        profiler.add("processor", time.perf_counter() - start)
+    
+    criteria = ReportStoppingCriteria(
+        processor.tokenizer, inputs["input_ids"].shape[1], max_reasoning_tokens
+    )
+    output_texts, num_tokens = _generate(
+        model, processor, inputs, max_new_tokens, criteria,
+        prefix_cache=prefix_cache, profiler=profiler, padding=padding
+    )
+    end_time = time.perf_counter()
+    timings = [criteria.row_timing(row, end_time) for row in range(len(texts))]
+    
+    # Close the reasoning of capped samples and generate just their report
+    capped = sorted(criteria.over_budget)
+    if capped:
+        start = time.perf_counter()
+        forced_texts = [texts[row] + output_texts[row] + FORCE_ANSWER for row in capped]
+        forced_inputs = prepare_inputs(
+            model,
+            processor,
+            forced_texts,
+            [images[row] for row in capped],
+            [pixel_items[row] for row in capped] if pixel_items is not None else None
+        )
+        if profiler is not None:
+            profiler.add("processor", time.perf_counter() - start)
+        report_criteria = ReportStoppingCriteria(processor.tokenizer, forced_inputs["input_ids"].shape[1])
+        reports, report_tokens = _generate(
+            model, processor, forced_inputs, max_new_tokens - max_reasoning_tokens, report_criteria,
+            profiler=profiler, padding=padding
+        )
+        report_s = time.perf_counter() - start
+        for row, report, tokens in zip(capped, reports, report_tokens):
+            output_texts[row] += FORCE_ANSWER + report
+            timings[row]["reasoning_tokens"] = num_tokens[row]
+            timings[row]["report_s"] = report_s
+            num_tokens[row] += tokens
+    
+    if stats is not None:
+        for row, timing in enumerate(timings):
+            stats.record(
+                tokens=num_tokens[row],
+                reasoning_tokens=timing["reasoning_tokens"] or num_tokens[row],
+                reasoning_s=timing["reasoning_s"],
+                report_s=timing["report_s"],
+                capped=row in criteria.over_budget,
+                stopped_at_answer=timing["stopped_at_answer"]
+            )
+    
+    if profiler is not None:
+        profiler.record_tokens(inputs["attention_mask"].sum(dim=1).tolist(), num_tokens)
+    
+    return output_texts
+
+
+def generate_report(
+    model,
+    processor,
+    image,
+    prefix_cache: PrefixCache | None = None,
+    profiler: InferenceProfiler | None = None
+) -> str:
+    """Generate a report for a single image."""
+    return generate_reports(model, processor, [image], prefix_cache=prefix_cache, profiler=profiler)[0]
+
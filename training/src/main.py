@@ -1,162 +1,673 @@
 import sys
-import json
-import torch
+import time
 from tqdm import tqdm
 from pathlib import Path
-from datetime import datetime
-
-from transformers import AutoModelForImageTextToText, AutoProcessor
 
 from IU_dataset_loader import IndianaDataset
+from data_pipeline import make_loader
+from pixel_store import PixelStore
+from models import MODEL_REGISTRY, DEFAULT_MODEL, get_model_spec
+from backends import BACKENDS
+from dedup import Deduplicator
+from online_eval import OnlineEvaluation
+from predictions_io import (
+    PredictionsWriter,
+    completed_keys,
+    get_latest_predictions,
+    new_predictions_path,
+    new_run_id
+)
+from sharding import launch, merge_shards, shard_indices, shard_path
+from postprocess import parse_output
+from profiling import InferenceProfiler
 
 # --- 1. SETUP PATHS ---
 REPO_ROOT = Path(__file__).resolve().parent.parent.parent
-MODEL_PATH = REPO_ROOT.parent / "checkpoints" / "nvidia-reason-3b"
+MODEL_PATH = MODEL_REGISTRY[DEFAULT_MODEL].path
 DATA_PATH = REPO_ROOT.parent / "data" / "indiana_university"
 PREDICTIONS_DIR = REPO_ROOT / "results" / "predictions"
+PIXEL_STORE_DIR = REPO_ROOT.parent / "data" / "pixel_store"
+OUTPUT_CACHE_PATH = REPO_ROOT / "training" / ".cache" / "outputs.sqlite"
+VISION_CACHE_PATH = REPO_ROOT / "training" / ".cache" / "vision.sqlite"
 
-def load_model(model_path: Path):
-    """Load model and processor."""
-    print(f"Loading model from: {model_path}")
-    processor = AutoProcessor.from_pretrained(str(model_path), local_files_only=True)
-    model = AutoModelForImageTextToText.from_pretrained(
-        model_path,
-        torch_dtype=torch.float16,
-        device_map="auto",
-        local_files_only=True
-    )
-    print("Model loaded successfully!")
-    return model, processor
+# With the continuous scheduler, each loader batch is a scheduling window of
+# this many times --batch_size samples, written back in index order
+SCHEDULER_WINDOW = 8
 
 
-def generate_report(model, processor, image) -> str:
-    """Generate a report for a single image."""
-    messages = [
-        {
-            "role": "user",
-            "content": [
-                {"type": "image", "image": image},
-                {"type": "text", "text": """
-                    You are a highly skilled radiology assistant with expertise in diagnostic reasoning and differential diagnosis. Your
-                    role is to assist in the interpretation of radiology reports by integrating imaging findings with the patient’s clinical
-                    presentation, symptoms, and medical history. Using your in-depth knowledge of radiographic patterns, imaging features
-                    of various diseases, and their underlying pathophysiology, your task is to explore potential diagnoses and causal
-                    relationships. When analyzing the radiology report, consider the clinical indications for why the imaging was ordered
-                    and provide a concise, evidence-based analysis that connects the radiologic findings to the primary clinical concern. Your
-                    response should focus strictly on the imaging findings and their relevance to the clinical indication. If abnormalities
-                    are present, prioritize the most likely diagnosis and briefly address key differentials. If findings are normal, confirm
-                    whether the clinical indication is ruled out based on the imaging. Keep your reasoning brief, clear, and directly relevant
-                    to the primary diagnosis. Do not include any suggestion. Output only in the format given in the examples below:
-                    Radiology Report: INDICATION: $ $-year-old man with a history of end-stage renal disease, status post kidney transplant,
-                    presents to the clinic with increasing fatigue and dyspnea on exertion and chest congestion. Rule out pulmonary edema.
-                    COMPARISON: Preop chest radiograph, . PA AND LATERAL CHEST RADIOGRAPH: The cardiac, mediastinal, and hilar contours are
-                    unchanged. Pleural thickening within both lung bases is unchanged from the prior examinations. Opacification in the right
-                    lower lung medial base is consistent with right lower lobe pneumonia. Findings were discussed with Dr. at 16:31 on
-                    via telephone.
-                    REASONING: The opacification in the right lower lung medial base suggests right lower lobe pneumonia, which is consistent
-                    with the increased density area seen in the radiograph. Additionally, pleural thickening may indicate pleurisy,
-                    contributing to chest congestion and dyspnea on exertion. The findings are located in the right lower lobe and pleural
-                    regions, correlating with the noted symptoms and radiographic observations.
-                 """
-                }
-            ]
-        }
-    ]
-    
-    text = processor.apply_chat_template(messages, add_generation_prompt=True)
-    inputs = processor(text=[text], images=[image], return_tensors="pt")
-    inputs = {k: v.to(model.device) for k, v in inputs.items()}
-    
-    with torch.no_grad():
-        generated_ids = model.generate(
-            **inputs,
-            max_new_tokens=1024,
-            do_sample=False
+def run_inference(
+    num_samples: int | None = None,
+    batch_size: int = 1,
+    use_prefix_cache: bool = False,
+    resume: str | None = None,
+    num_workers: int = 2,
+    use_pixel_store: bool = False,
+    pixel_store_dtype: str = "float32",
+    num_shards: int = 1,
+    shard_id: int | None = None,
+    run_id: str | None = None,
+    output_dir: Path = PREDICTIONS_DIR,
+    model: str = DEFAULT_MODEL,
+    model_path: Path | None = None,
+    data_path: Path = DATA_PATH,
+    max_new_tokens: int = 1024,
+    max_reasoning_tokens: int | None = None,
+    backend: str = "hf",
+    server_url: str = "http://localhost:8000",
+    concurrency: int = 8,
+    device: str = "auto",
+    dtype: str = "auto",
+    quantize: str | None = None,
+    compile: bool = False,
+    attn_implementation: str | None = None,
+    study_mode: str | None = None,
+    dedup: bool = False,
+    scheduler: str = "static",
+    max_batch_tokens: int = 16384,
+    vision_cache: bool = False,
+    vision_cache_mb: int = 10240,
+    draft_model: Path | None = None,
+    num_draft_tokens: int = 5,
+    online_eval: bool = False,
+    eval_metrics: list[str] | None = None,
+    eval_micro_batch_size: int = 32,
+    eval_max_pending: int = 1024,
+    eval_metrics_dir: Path | None = None,
+    eval_unique_studies: bool = False,
+    eval_bleu_backend: str = "radeval"
+):
+    """
+    Run inference and stream predictions to disk.
+    
+    Args:
+        num_samples: Number of samples to process. If None, processes all.
+        batch_size: Number of images per generate call.
+        use_prefix_cache: Reuse the KV cache of the shared instruction prefix.
+        resume: Predictions file to continue ("latest" for the newest one).
+                Samples already in it are skipped.
+        num_workers: Image decode workers prefetching the next batches.
+        use_pixel_store: Serve preprocessed pixels from the memory-mapped store
+                         built by scripts/build_pixel_store.py.
+        pixel_store_dtype: dtype of the pixel store to serve; float16 stores
+                           can change the outputs (see PixelStore).
+        num_shards: Split the samples into this many disjoint shards.
+        shard_id: Shard to process. If None with num_shards > 1, launches one
+                  worker process per shard and merges their outputs.
+        run_id: Identifier shared by the shards of a run (defaults to a timestamp).
+        output_dir: Directory for predictions files.
+        model: Registry name of the model (see models.MODEL_REGISTRY).
+        model_path: Checkpoint to load instead of the registry path.
+        data_path: Root of the Indiana University dataset.
+        max_new_tokens: Generation budget per sample (reasoning + report).
+        max_reasoning_tokens: Cap on the <think> block; longer reasoning is
+                              cut and the report is generated right after.
+        backend: "hf" to generate in-process, "http" to query an
+                 OpenAI-compatible server (e.g. vLLM) at server_url.
+        server_url: Base URL of the inference server.
+        concurrency: Requests in flight at once with the http backend; each
+                     loader batch holds this many images.
+        device: Where to load the model ("auto", "cpu", "cuda").
+        dtype: Weight dtype; "auto" is the registry dtype on GPU and bf16
+               (if supported) or fp32 on CPU.
+        quantize: "int8" for dynamic int8 quantization of linear layers (CPU).
+        compile: torch.compile the text decoder.
+        attn_implementation: Attention kernel ("sdpa", "eager", "flash_attention_2").
+        study_mode: None for one sample per projection, "canonical" for one
+                    view per study, "multiview" for all views of a study in
+                    one prompt.
+        dedup: Hash image bytes, generate each distinct input once and reuse
+               outputs from the on-disk output cache.
+        scheduler: "static" for one generate call per batch, "continuous" to
+                   pack up to batch_size rows within max_batch_tokens and
+                   refill the slots of finished samples (hf backend).
+        max_batch_tokens: Token budget of a continuous batch (rows x padded length).
+        vision_cache: Reuse image embeddings from the persistent vision cache
+                      (hf backend, Qwen2-VL style models).
+        vision_cache_mb: Disk budget of the vision cache; least recently used
+                         embeddings are evicted beyond it.
+        draft_model: Small causal LM with the same tokenizer; enables greedy
+                     speculative decoding (hf backend, one sample at a time).
+        num_draft_tokens: Tokens the draft model proposes per verification step.
+        online_eval: Score predictions in an evaluator process while they are
+                     generated (running estimates under results/metrics), and
+                     evaluate the finished file at the end. A resumed run only
+                     streams its new samples, but the final evaluation covers
+                     the whole file.
+        eval_metrics: Metrics of the online evaluation (None for all).
+        eval_micro_batch_size: Samples per running-estimate update.
+        eval_max_pending: Records waiting for the evaluator before inference
+                          blocks.
+        eval_metrics_dir: Directory of the online metrics files (None for the
+                          evaluator's default, results/metrics).
+        eval_unique_studies: Score each study (uid) once in the online
+                             evaluation, as evaluation --unique_studies.
+        eval_bleu_backend: Scorer of the online bleu metric: radeval or native.
+    """
+    spec = get_model_spec(model)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}. Available: {list(BACKENDS)}")
+    if backend == "http" and (use_prefix_cache or use_pixel_store or max_reasoning_tokens is not None):
+        raise ValueError("--prefix_cache, --pixel_store and --max_reasoning_tokens need --backend hf")
+    if backend == "http" and (
+        quantize or compile or device != "auto" or dtype != "auto" or attn_implementation or vision_cache
+        or draft_model is not None
+    ):
+        raise ValueError(
+            "Model loading options (--device, --dtype, --quantize, --compile, --attn, --vision_cache, "
+            "--draft_model) need --backend hf"
         )
+    if use_prefix_cache and batch_size != 1:
+        raise ValueError("--prefix_cache requires --batch_size 1")
+    if max_reasoning_tokens is not None and max_reasoning_tokens >= max_new_tokens:
+        raise ValueError("--max_reasoning_tokens must be smaller than --max_new_tokens")
+    if scheduler == "continuous" and (backend != "hf" or use_prefix_cache or max_reasoning_tokens is not None):
+        raise ValueError("--scheduler continuous needs --backend hf, without --prefix_cache or --max_reasoning_tokens")
+    if online_eval and num_shards > 1:
+        raise ValueError("--online_eval needs a single shard; evaluate merged shard outputs offline")
+    if draft_model is not None and (scheduler != "static" or use_prefix_cache or max_reasoning_tokens is not None):
+        raise ValueError("--draft_model does not combine with --scheduler continuous, --prefix_cache or --max_reasoning_tokens")
     
-    generated_ids_trimmed = [
-        out_ids[len(in_ids):] for in_ids, out_ids in zip(inputs["input_ids"], generated_ids)
-    ]
+    run_id = run_id or new_run_id()
     
-    output_text = processor.batch_decode(
-        generated_ids_trimmed,
-        skip_special_tokens=True,
-        clean_up_tokenization_spaces=False
-    )[0]
+    # Launcher mode: one worker process per shard, then merge
+    if num_shards > 1 and shard_id is None:
+        output_path = launch(
+            run_inference,
+            num_shards,
+            run_id=run_id,
+            output_dir=output_dir,
+            num_samples=num_samples,
+            batch_size=batch_size,
+            use_prefix_cache=use_prefix_cache,
+            resume=resume,
+            num_workers=num_workers,
+            use_pixel_store=use_pixel_store,
+            pixel_store_dtype=pixel_store_dtype,
+            model=model,
+            model_path=model_path,
+            data_path=data_path,
+            max_new_tokens=max_new_tokens,
+            max_reasoning_tokens=max_reasoning_tokens,
+            backend=backend,
+            server_url=server_url,
+            concurrency=concurrency,
+            device=device,
+            dtype=dtype,
+            quantize=quantize,
+            compile=compile,
+            attn_implementation=attn_implementation,
+            study_mode=study_mode,
+            dedup=dedup,
+            scheduler=scheduler,
+            max_batch_tokens=max_batch_tokens,
+            vision_cache=vision_cache,
+            vision_cache_mb=vision_cache_mb,
+            draft_model=draft_model,
+            num_draft_tokens=num_draft_tokens
+        )
+        print(f"Results saved to: {output_path}")
+        return output_path
     
-    return output_text
-
-def save_predictions(predictions: list[dict], output_dir: Path, model_name: str) -> Path:
-    """Save predictions to JSON file."""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_path = output_dir / f"predictions_{timestamp}.json"
-    
-    output = {
-        "metadata": {
-            "timestamp": timestamp,
-            "num_samples": len(predictions),
-            "model": model_name
-        },
-        "predictions": predictions
-    }
-    
-    with open(output_path, "w") as f:
-        json.dump(output, f, indent=2)
-    
-    print(f"Predictions saved to: {output_path}")
-    return output_path
-
-def run_inference(num_samples: int | None = None):
-    """Run inference and save predictions."""
-    # Load model
-    model, processor = load_model(MODEL_PATH)
+    # Load model (or connect to the server)
+    if backend == "http":
+        generator = BACKENDS[backend](spec, server_url, concurrency=concurrency, max_new_tokens=max_new_tokens)
+        batch_size = concurrency
+    else:
+        generator = BACKENDS[backend](
+            spec,
+            model_path=model_path,
+            use_prefix_cache=use_prefix_cache,
+            max_new_tokens=max_new_tokens,
+            max_reasoning_tokens=max_reasoning_tokens,
+            device=device,
+            dtype=dtype,
+            quantize=quantize,
+            compile=compile,
+            attn_implementation=attn_implementation,
+            scheduler=scheduler,
+            max_batch_size=batch_size,
+            max_batch_tokens=max_batch_tokens,
+            vision_cache_path=VISION_CACHE_PATH if vision_cache else None,
+            vision_cache_mb=vision_cache_mb,
+            draft_model_path=draft_model,
+            num_draft_tokens=num_draft_tokens
+        )
     
     # Load dataset
-    print(f"Loading dataset from: {DATA_PATH}")
-    if not DATA_PATH.exists():
-        print(f"Error: Data path not found at {DATA_PATH}")
+    print(f"Loading dataset from: {data_path}")
+    if not data_path.exists():
+        print(f"Error: Data path not found at {data_path}")
         print("Run 'python scripts/download_data.py' first.")
         exit()
     
-    dataset = IndianaDataset(DATA_PATH)
-    print(f"Dataset Size: {len(dataset)} samples")
+    pixel_store = None
+    if use_pixel_store:
+        pixel_store = PixelStore.for_processor(
+            PIXEL_STORE_DIR, generator.processor.image_processor, dtype=pixel_store_dtype
+        )
+        print(f"Using {pixel_store_dtype} pixel store: {pixel_store.root}")
+    
+    dataset = IndianaDataset(data_path, pixel_store=pixel_store, study_mode=study_mode, hash_images=dedup)
+    study_stats = dataset.study_stats()
+    print(f"Dataset Size: {len(dataset)} samples "
+          f"({study_stats['projections']} projections, {study_stats['studies']} studies)")
+    
+    deduplicator = None
+    if dedup:
+        optimization = generator.metadata().get("optimization", {})
+        # The weights (or server) and the pixel inputs are part of the key, so
+        # a fine-tuned checkpoint never reuses the base model's outputs
+        deduplicator = Deduplicator(OUTPUT_CACHE_PATH, {
+            "model": spec.name,
+            **generator.identity(),
+            "prompt": spec.prompt,
+            "system_prompt": spec.system_prompt,
+            "backend": backend,
+            "dtype": optimization.get("dtype"),
+            "quantize": optimization.get("quantize"),
+            "pixel_store": pixel_store_dtype if use_pixel_store else None,
+            "max_new_tokens": max_new_tokens,
+            "max_reasoning_tokens": max_reasoning_tokens
+        })
     
     # Determine number of samples
     total = len(dataset) if num_samples is None else min(num_samples, len(dataset))
+    pending = list(range(total))
+    
+    # Pick the output file; a sharded worker only sees its own slice
+    if num_shards > 1:
+        pending = shard_indices(pending, num_shards, shard_id)
+        output_path = shard_path(output_dir, run_id, shard_id, num_shards)
+    elif resume is not None:
+        output_path = get_latest_predictions(output_dir) if resume == "latest" else Path(resume)
+        if not output_path.exists():
+            raise FileNotFoundError(f"No predictions file to resume: {resume}")
+    else:
+        output_path = new_predictions_path(output_dir, run_id)
+    
+    # Skip samples that are already on disk
+    if resume is not None and output_path.exists():
+        done = completed_keys(output_path)
+        num_assigned = len(pending)
+        pending = [idx for idx in pending if (idx, dataset.filename(idx)) not in done]
+        print(f"Resuming {output_path}: {num_assigned - len(pending)} samples already done")
+    
+    writer = PredictionsWriter(output_path, {
+        "timestamp": run_id,
+        "model": spec.name
+    })
+    online = None
+    if online_eval:
+        online = OnlineEvaluation(
+            output_path,
+            metrics=eval_metrics,
+            micro_batch_size=eval_micro_batch_size,
+            max_pending=eval_max_pending,
+            metrics_dir=eval_metrics_dir,
+            unique_studies=eval_unique_studies,
+            bleu_backend=eval_bleu_backend
+        )
     
     # Generate predictions
-    print(f"\nGenerating predictions for {total} samples...")
-    predictions = []
-    
-    for idx in tqdm(range(total), desc="Inference"):
-        sample = dataset[idx]
-        pred = generate_report(model, processor, sample["image"])
-        
-        predictions.append({
-            "index": idx,
-            "filename": sample["filename"],
-            "ground_truth": sample["report"],
-            "prediction": pred
-        })
+    print(f"\nGenerating predictions for {len(pending)} samples (batch size {batch_size})...")
     
-    # Save predictions
-    output_path = save_predictions(predictions, PREDICTIONS_DIR, model_name="nvidia-reason-3b")
+    loader_batch_size = batch_size * SCHEDULER_WINDOW if scheduler == "continuous" else batch_size
+    loader = make_loader(dataset, pending, batch_size=loader_batch_size, num_workers=num_workers)
+    profiler = InferenceProfiler()
+    
+    with tqdm(total=len(pending), desc="Inference") as pbar:
+        load_start = time.perf_counter()
+        for batch in loader:
+            profiler.add("data_load", time.perf_counter() - load_start)
+            if deduplicator is not None:
+                preds, generated_rows = deduplicator.generate(
+                    batch,
+                    lambda images, pixel_items: generator.generate(images, pixel_items=pixel_items, profiler=profiler)
+                )
+            else:
+                preds = generator.generate(
+                    batch["images"],
+                    pixel_items=batch.get("pixel_items"),
+                    profiler=profiler
+                )
+                generated_rows = None
+            
+            # The final report is what gets scored; the trace is kept alongside
+            parse_start = time.perf_counter()
+            parsed = [parse_output(pred) for pred in preds]
+            profiler.add("postprocess", time.perf_counter() - parse_start)
+            timings = profiler.end_batch(len(preds), generated_rows)
+            
+            records = []
+            for row, (idx, filename, report, output, timing) in enumerate(zip(
+                batch["indices"], batch["filenames"], batch["reports"], parsed, timings
+            )):
+                record = {
+                    "index": idx,
+                    "filename": filename,
+                    "uid": batch["uids"][row],
+                    "ground_truth": report,
+                    "prediction": output["report"],
+                    "reasoning": output["reasoning"],
+                    "timing": timing
+                }
+                if "views" in batch:
+                    record["views"] = batch["views"][row]
+                if deduplicator is not None:
+                    record["reused_output"] = row not in generated_rows
+                records.append(record)
+            writer.write(records)
+            if online is not None:
+                online.submit(records)
+            pbar.update(len(preds))
+            load_start = time.perf_counter()
+    
+    # Finalize predictions file
+    profile = profiler.summary()
+    extra_metadata = {**generator.metadata(), "dataset": study_stats, "profile": profile}
+    if pixel_store is not None:
+        extra_metadata["pixel_store"] = {"path": str(pixel_store.root), "dtype": pixel_store.dtype.name}
+    if deduplicator is not None:
+        extra_metadata["dedup"] = deduplicator.stats()
+        deduplicator.close()
+        print(f"Dedup: {extra_metadata['dedup']['generated']} of {len(pending)} samples generated")
+    if online is not None:
+        extra_metadata["online_eval"] = online.stats()
+    writer.close(extra_metadata)
+    generator.close()
+    if online is not None:
+        # The evaluator now scores the complete file and writes the final metrics
+        print(f"Online evaluation: inference blocked {online.stats()['blocked_s']}s on the evaluator; "
+              "waiting for the final evaluation...")
+        online.close()
+    print(f"Throughput: {profile['samples_per_s']} samples/s, {profile['tokens_per_s']} tokens/s, "
+          f"p50 latency {profile['latency_s']['p50']}s")
+    if "vision_cache" in extra_metadata:
+        cache_stats = extra_metadata["vision_cache"]
+        print(f"Vision cache: hit rate {cache_stats['hit_rate']}, {cache_stats['vision_s_saved']}s of vision compute saved")
+    if "speculative" in extra_metadata:
+        speculative = extra_metadata["speculative"]
+        print(f"Speculative decoding: acceptance rate {speculative['acceptance_rate']}, "
+              f"{speculative['tokens_per_s']} tokens/s")
+    if extra_metadata.get("scheduler", {}).get("padding_efficiency") is not None:
+        print(f"Padding efficiency ({scheduler} scheduler): {extra_metadata['scheduler']['padding_efficiency']}")
     
     print("\n" + "=" * 50)
     print("INFERENCE COMPLETE")
     print(f"Results saved to: {output_path}")
     print("=" * 50)
+    return output_path
     
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="Run inference on radiology images")
+    parser.add_argument(
+        "--model",
+        type=str,
+        default=DEFAULT_MODEL,
+        choices=list(MODEL_REGISTRY),
+        help="Model to run, by registry name."
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default="hf",
+        choices=list(BACKENDS),
+        help="hf: generate in this process. http: query an OpenAI-compatible server."
+    )
+    parser.add_argument(
+        "--server_url",
+        type=str,
+        default="http://localhost:8000",
+        help="Base URL of the inference server for --backend http."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Requests in flight at once with --backend http."
+    )
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="auto",
+        help="Device map for the hf backend (auto, cpu, cuda)."
+    )
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="auto",
+        choices=["auto", "float32", "float16", "bfloat16"],
+        help="Weight dtype. auto: the model's dtype on GPU, bf16 (if supported) or fp32 on CPU."
+    )
+    parser.add_argument(
+        "--quantize",
+        type=str,
+        default=None,
+        choices=["int8"],
+        help="Dynamic int8 quantization of linear layers (requires --device cpu)."
+    )
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="torch.compile the text decoder."
+    )
+    parser.add_argument(
+        "--attn",
+        type=str,
+        default=None,
+        choices=["sdpa", "eager", "flash_attention_2"],
+        help="Attention implementation. Default: chosen by transformers."
+    )
+    parser.add_argument(
+        "--study_mode",
+        type=str,
+        default=None,
+        choices=["canonical", "multiview"],
+        help="Group projections by study: one canonical (frontal) view, or all views in one prompt."
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Generate each distinct image once and reuse cached outputs for duplicates."
+    )
     parser.add_argument(
         "--num_samples",
         type=int,
         default=None,
         help="Number of samples to process. If not specified, processes all."
     )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1,
+        help="Number of images per generate call."
+    )
+    parser.add_argument(
+        "--prefix_cache",
+        action="store_true",
+        help="Put the instruction before the image and reuse its KV cache across samples."
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const="latest",
+        default=None,
+        help="Continue a predictions file (latest if no path given), skipping finished samples."
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=2,
+        help="Image decode worker processes (0 decodes on the main thread)."
+    )
+    parser.add_argument(
+        "--pixel_store",
+        action="store_true",
+        help="Read preprocessed pixel tensors from the memory-mapped pixel store."
+    )
+    parser.add_argument(
+        "--pixel_store_dtype",
+        type=str,
+        default="float32",
+        choices=["float32", "float16"],
+        help="dtype of the pixel store to read (float16 can change the outputs)."
+    )
+    parser.add_argument(
+        "--num_shards",
+        type=int,
+        default=1,
+        help="Split the samples into N shards. Without --shard_id, launches N worker processes."
+    )
+    parser.add_argument(
+        "--shard_id",
+        type=int,
+        default=None,
+        help="Process only this shard (for launching shards by hand or on other nodes)."
+    )
+    parser.add_argument(
+        "--run_id",
+        type=str,
+        default=None,
+        help="Identifier shared by the shards of a run. Defaults to a timestamp."
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="Only merge the shard files of --run_id into one predictions file."
+    )
+    parser.add_argument(
+        "--max_new_tokens",
+        type=int,
+        default=1024,
+        help="Generation budget per sample (reasoning + report)."
+    )
+    parser.add_argument(
+        "--max_reasoning_tokens",
+        type=int,
+        default=None,
+        help="Cap on the <think> reasoning; the report is forced once it is reached."
+    )
+    parser.add_argument(
+        "--scheduler",
+        type=str,
+        default="static",
+        choices=["static", "continuous"],
+        help="static: one generate call per batch. continuous: token-budget batches with slot refill."
+    )
+    parser.add_argument(
+        "--max_batch_tokens",
+        type=int,
+        default=16384,
+        help="Token budget (rows x padded length) of a continuous batch."
+    )
+    parser.add_argument(
+        "--vision_cache",
+        action="store_true",
+        help="Reuse image embeddings across runs instead of re-running the vision tower."
+    )
+    parser.add_argument(
+        "--vision_cache_mb",
+        type=int,
+        default=10240,
+        help="Disk budget of the vision cache (LRU eviction)."
+    )
+    parser.add_argument(
+        "--draft_model",
+        type=Path,
+        default=None,
+        help="Draft LM checkpoint (same tokenizer) for speculative decoding; outputs stay greedy-exact."
+    )
+    parser.add_argument(
+        "--num_draft_tokens",
+        type=int,
+        default=5,
+        help="Tokens proposed by the draft model per verification step."
+    )
+    parser.add_argument(
+        "--online_eval",
+        action="store_true",
+        help="Evaluate predictions in a separate process while they are generated."
+    )
+    parser.add_argument(
+        "--eval_metrics",
+        nargs="+",
+        default=None,
+        help="Metrics for --online_eval (default: all)."
+    )
+    parser.add_argument(
+        "--eval_micro_batch_size",
+        type=int,
+        default=32,
+        help="Samples per running metric update with --online_eval."
+    )
+    parser.add_argument(
+        "--eval_max_pending",
+        type=int,
+        default=1024,
+        help="Predictions waiting for the evaluator before inference blocks."
+    )
+    parser.add_argument(
+        "--eval_metrics_dir",
+        type=Path,
+        default=None,
+        help="Directory for the --online_eval metrics (default: results/metrics)."
+    )
+    parser.add_argument(
+        "--eval_unique_studies",
+        action="store_true",
+        help="Score each study once with --online_eval (evaluation --unique_studies)."
+    )
+    parser.add_argument(
+        "--eval_bleu_backend",
+        choices=["radeval", "native"],
+        default="radeval",
+        help="Scorer of the bleu metric with --online_eval."
+    )
     args = parser.parse_args()
     
-    run_inference(num_samples=args.num_samples)
\ No newline at end of file
+    if args.merge:
+        if args.run_id is None:
+            parser.error("--merge requires --run_id")
+        merge_shards(PREDICTIONS_DIR, args.run_id, args.num_shards)
+        sys.exit()
+    
+    run_inference(
+        num_samples=args.num_samples,
+        batch_size=args.batch_size,
+        use_prefix_cache=args.prefix_cache,
+        resume=args.resume,
+        num_workers=args.num_workers,
+        use_pixel_store=args.pixel_store,
+        pixel_store_dtype=args.pixel_store_dtype,
+        num_shards=args.num_shards,
+        shard_id=args.shard_id,
+        run_id=args.run_id,
+        max_new_tokens=args.max_new_tokens,
+        max_reasoning_tokens=args.max_reasoning_tokens,
+        model=args.model,
+        backend=args.backend,
+        server_url=args.server_url,
+        concurrency=args.concurrency,
+        device=args.device,
+        dtype=args.dtype,
+        quantize=args.quantize,
+        compile=args.compile,
+        attn_implementation=args.attn,
+        study_mode=args.study_mode,
+        dedup=args.dedup,
+        scheduler=args.scheduler,
+        max_batch_tokens=args.max_batch_tokens,
+        vision_cache=args.vision_cache,
+        vision_cache_mb=args.vision_cache_mb,
+        draft_model=args.draft_model,
+        num_draft_tokens=args.num_draft_tokens,
+        online_eval=args.online_eval,
+        eval_metrics=args.eval_metrics,
+        eval_micro_batch_size=args.eval_micro_batch_size,
+        eval_max_pending=args.eval_max_pending,
+        eval_metrics_dir=args.eval_metrics_dir,
+        eval_unique_studies=args.eval_unique_studies,
+        eval_bleu_backend=args.eval_bleu_backend
+    )
\ No newline at end of file
@@ -0,0 +1,109 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+METADATA_CACHE = "metadata.arrow"
+CACHE_VERSION = "1"
+SOURCES = ("indiana_reports.csv", "indiana_projections.csv")
+
+
+def build_metadata_table(data_dir: str | Path) -> pa.Table:
+    """
+    Parse and merge the CSVs into the columns IndianaDataset needs.
+
+    One row per projection with a report: uid, filename, projection and the
+    preformatted "Findings: ...\\nImpression: ..." report string.
+    """
+    data_dir = Path(data_dir)
+    reports = pd.read_csv(data_dir / "indiana_reports.csv")
+    projections = pd.read_csv(data_dir / "indiana_projections.csv")
+
+    # Merge on 'uid' and clean missing data
+    data = pd.merge(projections, reports, on="uid", how="inner")
+    data = data.dropna(subset=["findings", "impression"])
+    if "projection" not in data:
+        data["projection"] = None
+
+    return pa.table({
+        "uid": pa.array(data["uid"], pa.int64()),
+        "filename": pa.array(data["filename"].astype(str), pa.string()),
+        "projection": pa.array(data["projection"], pa.string()),
+        "report": pa.array(
+            [
+                f"Findings: {findings}\nImpression: {impression}"
+                for findings, impression in zip(data["findings"].astype(str), data["impression"].astype(str))
+            ],
+            pa.string()
+        )
+    })
+
+
+def _stat(path: Path) -> dict:
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _read(cache_path: Path) -> tuple[pa.Table, dict]:
+    """Memory-map the cache file; column buffers point into the mapping."""
+    source = pa.memory_map(str(cache_path), "r")
+    table = pa.ipc.open_file(source).read_all()
+    metadata = table.schema.metadata or {}
+    if metadata.get(b"version") != CACHE_VERSION.encode():
+        return table, {}
+    return table, json.loads(metadata[b"sources"])
+
+
+def _write(cache_path: Path, table: pa.Table, sources: dict):
+    table = table.replace_schema_metadata({"version": CACHE_VERSION, "sources": json.dumps(sources)})
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, cache_path)
+
+
+def load_metadata(data_dir: str | Path) -> pa.Table:
+    """
+    Dataset metadata from the Arrow IPC cache, rebuilding it if the CSVs changed.
+
+    The cache is valid while each CSV has the size and mtime it had when the
+    cache was written. If only the mtime moved (e.g. the archive was
+    re-extracted), the content hashes decide, and a match just refreshes the
+    stored mtimes. A cache that cannot be written (read-only data directory)
+    is skipped and the table is built in memory.
+    """
+    data_dir = Path(data_dir)
+    cache_path = data_dir / METADATA_CACHE
+    stats = {name: _stat(data_dir / name) for name in SOURCES}
+
+    if cache_path.exists():
+        table, cached = _read(cache_path)
+        if cached and all(
+            {k: cached[name][k] for k in ("size", "mtime_ns")} == stats[name] for name in SOURCES
+        ):
+            return table
+        if cached and all(cached[name]["sha256"] == _sha256(data_dir / name) for name in SOURCES):
+            sources = {name: {**stats[name], "sha256": cached[name]["sha256"]} for name in SOURCES}
+            try:
+                _write(cache_path, table, sources)
+            except OSError as e:
+                print(f"Warning: could not refresh metadata cache {cache_path}: {e}")
+                return table
+            return _read(cache_path)[0]
+
+    table = build_metadata_table(data_dir)
+    sources = {name: {**stats[name], "sha256": _sha256(data_dir / name)} for name in SOURCES}
+    try:
+        _write(cache_path, table, sources)
+    except OSError as e:
+        print(f"Warning: could not write metadata cache {cache_path}: {e}")
+        return table
+    return _read(cache_path)[0]
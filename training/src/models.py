@@ -0,0 +1,78 @@
+from pathlib import Path
+from dataclasses import dataclass
+
+CHECKPOINTS_DIR = Path(__file__).resolve().parents[3] / "checkpoints"
+
+# Instruction block shared by every sample; only the image changes between calls.
+REPORT_PROMPT = """
+                    You are a highly skilled radiology assistant with expertise in diagnostic reasoning and differential diagnosis. Your
+                    role is to assist in the interpretation of radiology reports by integrating imaging findings with the patient’s clinical
+                    presentation, symptoms, and medical history. Using your in-depth knowledge of radiographic patterns, imaging features
+                    of various diseases, and their underlying pathophysiology, your task is to explore potential diagnoses and causal
+                    relationships. When analyzing the radiology report, consider the clinical indications for why the imaging was ordered
+                    and provide a concise, evidence-based analysis that connects the radiologic findings to the primary clinical concern. Your
+                    response should focus strictly on the imaging findings and their relevance to the clinical indication. If abnormalities
+                    are present, prioritize the most likely diagnosis and briefly address key differentials. If findings are normal, confirm
+                    whether the clinical indication is ruled out based on the imaging. Keep your reasoning brief, clear, and directly relevant
+                    to the primary diagnosis. Do not include any suggestion. Output only in the format given in the examples below:
+                    Radiology Report: INDICATION: $ $-year-old man with a history of end-stage renal disease, status post kidney transplant,
+                    presents to the clinic with increasing fatigue and dyspnea on exertion and chest congestion. Rule out pulmonary edema.
+                    COMPARISON: Preop chest radiograph, . PA AND LATERAL CHEST RADIOGRAPH: The cardiac, mediastinal, and hilar contours are
+                    unchanged. Pleural thickening within both lung bases is unchanged from the prior examinations. Opacification in the right
+                    lower lung medial base is consistent with right lower lobe pneumonia. Findings were discussed with Dr. at 16:31 on
+                    via telephone.
+                    REASONING: The opacification in the right lower lung medial base suggests right lower lobe pneumonia, which is consistent
+                    with the increased density area seen in the radiograph. Additionally, pleural thickening may indicate pleurisy,
+                    contributing to chest congestion and dyspnea on exertion. The findings are located in the right lower lobe and pleural
+                    regions, correlating with the noted symptoms and radiographic observations.
+                 """
+
+MEDGEMMA_PROMPT = (
+    "Write the radiology report for this chest X-ray. "
+    "Answer with a Findings section followed by an Impression section."
+)
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """Everything needed to run one model: where it lives, how to load it and how to prompt it."""
+    name: str
+    path: Path
+    dtype: str
+    prompt: str
+    system_prompt: str | None = None
+
+
+MODEL_REGISTRY = {
+    spec.name: spec
+    for spec in [
+        ModelSpec(
+            name="nvidia-reason-3b",
+            path=CHECKPOINTS_DIR / "nvidia-reason-3b",
+            dtype="float16",
+            prompt=REPORT_PROMPT
+        ),
+        ModelSpec(
+            name="medgemma-1.5-4b",
+            path=CHECKPOINTS_DIR / "medgemma-1.5-4b",
+            dtype="bfloat16",
+            prompt=MEDGEMMA_PROMPT,
+            system_prompt="You are an expert radiologist."
+        ),
+        # Random weights from tiny_model.make_tiny_model, for CPU benchmarks and smoke tests
+        ModelSpec(
+            name="tiny-qwen2.5-vl",
+            path=CHECKPOINTS_DIR / "tiny-qwen2.5-vl",
+            dtype="float32",
+            prompt="Findings: Impression:"
+        ),
+    ]
+}
+
+DEFAULT_MODEL = "nvidia-reason-3b"
+
+
+def get_model_spec(name: str) -> ModelSpec:
+    if name not in MODEL_REGISTRY:
+        raise ValueError(f"Unknown model: {name}. Available: {list(MODEL_REGISTRY)}")
+    return MODEL_REGISTRY[name]
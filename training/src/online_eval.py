@@ -0,0 +1,116 @@
+import sys
+import json
+import time
+import queue
+import threading
+import subprocess
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+EVALUATION_DIR = REPO_ROOT / "evaluation"
+
+# The evaluation project has its own environment (RadEval and its models)
+EVAL_PYTHON = EVALUATION_DIR / ".venv" / "bin" / "python"
+
+# Only what the metrics need is sent to the evaluator
+STREAMED_FIELDS = ("index", "uid", "ground_truth", "prediction")
+
+
+class OnlineEvaluation:
+    """
+    Scores predictions in a separate evaluator process while inference runs.
+
+    Starts ``evaluation/main.py --online`` (in the evaluation environment)
+    and streams every record written to the predictions file to it as a
+    JSON line. Records wait in a bounded queue that a feeder thread drains
+    into the evaluator's stdin; when the evaluator falls behind, the pipe
+    fills, the queue fills, and submit() blocks until there is room, so
+    memory stays bounded at max_pending records. The time inference spent
+    blocked that way is reported.
+
+    close() ends the stream once the predictions file is complete; the
+    evaluator then evaluates the finished file as an offline ``--cache``
+    run with the same metrics, metrics_dir, unique_studies and bleu_backend
+    would, from the per-sample scores it already cached, and writes the
+    metrics JSON.
+    """
+
+    def __init__(
+        self,
+        predictions_path: Path,
+        metrics: list[str] | None = None,
+        micro_batch_size: int = 32,
+        max_pending: int = 1024,
+        python: Path | None = None,
+        metrics_dir: Path | None = None,
+        unique_studies: bool = False,
+        bleu_backend: str = "radeval"
+    ):
+        python = python or (EVAL_PYTHON if EVAL_PYTHON.exists() else Path(sys.executable))
+        command = [
+            str(python), str(EVALUATION_DIR / "main.py"), "--online",
+            "--predictions_file", str(predictions_path),
+            "--micro_batch_size", str(micro_batch_size),
+            "--bleu_backend", bleu_backend
+        ]
+        if metrics:
+            command += ["--metrics", *metrics]
+        if metrics_dir is not None:
+            command += ["--metrics_dir", str(metrics_dir)]
+        if unique_studies:
+            command.append("--unique_studies")
+
+        print(f"Starting online evaluator: {' '.join(command)}")
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, text=True, cwd=EVALUATION_DIR)
+        self.max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._feeder = threading.Thread(target=self._feed, daemon=True)
+        self._feeder.start()
+
+        self.submitted = 0
+        self.blocked_s = 0.0
+        self.max_queued = 0
+
+    def _feed(self):
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                self.process.stdin.write(json.dumps(record) + "\n")
+                # Hand records over as soon as nothing else is waiting
+                if self._queue.empty():
+                    self.process.stdin.flush()
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError) as error:
+            self._error = error
+            # Keep draining so submit() never blocks on a dead evaluator
+            while self._queue.get() is not None:
+                pass
+
+    def submit(self, records: list[dict]):
+        """Queue records for scoring; blocks while max_pending records are waiting."""
+        start = time.perf_counter()
+        for record in records:
+            self._queue.put({k: record[k] for k in STREAMED_FIELDS if k in record})
+        self.blocked_s += time.perf_counter() - start
+        self.submitted += len(records)
+        self.max_queued = max(self.max_queued, self._queue.qsize())
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "max_pending": self.max_pending,
+            "max_queued": self.max_queued,
+            "blocked_s": round(self.blocked_s, 3)
+        }
+
+    def close(self) -> int:
+        """End the stream and wait for the evaluator's final evaluation; returns its exit code."""
+        self._queue.put(None)
+        self._feeder.join()
+        returncode = self.process.wait()
+        if self._error is not None or returncode != 0:
+            print(f"Online evaluator failed (exit code {returncode}); evaluate the predictions file offline.")
+        return returncode
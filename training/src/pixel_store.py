@@ -0,0 +1,178 @@
+import json
+import shutil
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import torch
+from tqdm import tqdm
+
+
+def processor_hash(image_processor) -> str:
+    """Short hash of the image processor config (size, mean/std, patching...)."""
+    config = json.dumps(image_processor.to_dict(), sort_keys=True, default=str)
+    return hashlib.sha256(config.encode()).hexdigest()[:16]
+
+
+class PixelStore:
+    """
+    Memory-mapped store of processor-ready pixel tensors.
+
+    Layout of a store directory (one per processor config hash and dtype):
+        pixel_values.bin  - every image's pixel_values rows, concatenated
+        index.json        - dtype/row width plus, per filename, the row offset,
+                            row count and any per-image arrays (image_grid_thw)
+
+    float32 stores hold exactly what the processor returns. float16 stores
+    are half the size but round the normalized pixels, so model outputs can
+    differ from the PNG path, even for float32 inference.
+
+    Lookups return read-only views into the memmap, so serving a sample never
+    copies or decodes anything. The memmap is opened lazily in each process,
+    which keeps the store cheap to pickle into DataLoader workers.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        with open(self.root / "index.json", "r") as f:
+            index = json.load(f)
+        self.dtype = np.dtype(index["dtype"])
+        self.row_width = index["row_width"]
+        self.num_rows = index["num_rows"]
+        self.entries = index["entries"]
+        self._pixels = None
+
+    @staticmethod
+    def path_for(cache_root: str | Path, image_processor, dtype: str = "float32") -> Path:
+        return Path(cache_root) / f"{processor_hash(image_processor)}_{np.dtype(dtype).name}"
+
+    @classmethod
+    def for_processor(cls, cache_root: str | Path, image_processor, dtype: str = "float32") -> "PixelStore":
+        """Open the store matching this processor config and dtype, if it has been built."""
+        path = cls.path_for(cache_root, image_processor, dtype)
+        if not (path / "index.json").exists():
+            raise FileNotFoundError(
+                f"No {dtype} pixel store for this processor config at {path}. "
+                f"Run 'python scripts/build_pixel_store.py --dtype {dtype}' first."
+            )
+        return cls(path)
+
+    @property
+    def pixels(self) -> np.memmap:
+        if self._pixels is None:
+            self._pixels = np.memmap(
+                self.root / "pixel_values.bin",
+                dtype=self.dtype,
+                mode="r",
+                shape=(self.num_rows, self.row_width)
+            )
+        return self._pixels
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pixels"] = None
+        return state
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self.entries
+
+    def __getitem__(self, filename: str) -> dict:
+        entry = self.entries[filename]
+        offset, length = entry["offset"], entry["length"]
+        item = {"pixel_values": self.pixels[offset:offset + length]}
+        for key, value in entry["arrays"].items():
+            item[key] = np.asarray(value)
+        return item
+
+
+def build_pixel_store(
+    dataset,
+    image_processor,
+    cache_root: str | Path,
+    dtype: str = "float32",
+    num_workers: int = 4
+) -> Path:
+    """
+    Preprocess every unique image of the dataset into a PixelStore.
+
+    The store is written to a temporary directory and renamed into place
+    once complete, so an interrupted build never leaves a half-valid store.
+    Each dtype gets its own store (see PixelStore for the float16 trade-off).
+    """
+    from data_pipeline import make_loader
+
+    store_path = PixelStore.path_for(cache_root, image_processor, dtype)
+    if (store_path / "index.json").exists():
+        print(f"Pixel store already built: {store_path}")
+        return store_path
+
+    tmp_path = store_path.with_name(store_path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    # One row block per unique image, in first-seen order
+    first_index = {}
+    for idx, filename in enumerate(dataset.filenames):
+        first_index.setdefault(filename, idx)
+
+    entries = {}
+    num_rows = 0
+    row_width = None
+    loader = make_loader(dataset, list(first_index.values()), batch_size=8, num_workers=num_workers)
+
+    with open(tmp_path / "pixel_values.bin", "wb") as f:
+        with tqdm(total=len(first_index), desc="Preprocessing") as pbar:
+            for batch in loader:
+                for filename, image in zip(batch["filenames"], batch["images"]):
+                    # Fast (torchvision) image processors only return torch tensors
+                    out = image_processor(images=[image], return_tensors="pt")
+                    pixel_values = out.pop("pixel_values").float().numpy().astype(dtype)
+                    pixel_values = pixel_values.reshape(-1, pixel_values.shape[-1])
+                    row_width = pixel_values.shape[-1]
+
+                    f.write(np.ascontiguousarray(pixel_values).tobytes())
+                    entries[filename] = {
+                        "offset": num_rows,
+                        "length": len(pixel_values),
+                        "arrays": {key: np.asarray(value)[0].tolist() for key, value in out.items()}
+                    }
+                    num_rows += len(pixel_values)
+                pbar.update(len(batch["filenames"]))
+
+    with open(tmp_path / "index.json", "w") as f:
+        json.dump({
+            "processor_hash": processor_hash(image_processor),
+            "image_processor": image_processor.to_dict(),
+            "dtype": dtype,
+            "row_width": row_width,
+            "num_rows": num_rows,
+            "entries": entries
+        }, f, default=str)
+
+    tmp_path.rename(store_path)
+    print(f"Pixel store written: {store_path} ({num_rows} rows, {len(entries)} images)")
+    return store_path
+
+
+def processor_inputs(processor, texts: list[str], items: list[dict]) -> dict:
+    """
+    Build model inputs from chat texts and stored pixel tensors.
+
+    Mirrors what ``processor(text=..., images=...)`` does for Qwen-VL style
+    processors: each image placeholder is expanded to one token per merged
+    patch, then the stored pixel rows and grid sizes are attached.
+    """
+    if "image_grid_thw" not in items[0]:
+        raise ValueError("Pixel store inputs are only supported for processors that emit image_grid_thw.")
+
+    merge_length = processor.image_processor.merge_size ** 2
+    image_token = processor.image_token
+    expanded = []
+    for text, item in zip(texts, items):
+        num_tokens = int(np.prod(item["image_grid_thw"])) // merge_length
+        expanded.append(text.replace(image_token, image_token * num_tokens, 1))
+
+    inputs = dict(processor.tokenizer(expanded, padding=True, return_tensors="pt"))
+    inputs["pixel_values"] = torch.from_numpy(np.concatenate([item["pixel_values"] for item in items]))
+    inputs["image_grid_thw"] = torch.from_numpy(np.stack([item["image_grid_thw"] for item in items]))
+    return inputs
@@ -0,0 +1,166 @@
+import re
+import time
+
+import torch
+from transformers import StoppingCriteria
+
+
+THINK_END = "</think>"
+ANSWER_END = "</answer>"
+
+# Appended to reasoning that hit its token cap, so the model goes straight to the report
+FORCE_ANSWER = f"\n{THINK_END}\n<answer>"
+
+_THINK_RE = re.compile(r"<think>(.*?)(?:</think>|$)", re.DOTALL)
+_ANSWER_RE = re.compile(r"<answer>(.*?)(?:</answer>|$)", re.DOTALL)
+
+
+def parse_output(text: str) -> dict:
+    """
+    Split a model output into its reasoning trace and final report.
+
+    NV-Reason answers as ``<think> ... </think>\\n<answer> ... </answer>``.
+    The report is the <answer> body, or whatever follows </think> if there
+    is no answer block. Outputs without a think block are all report.
+    """
+    think = _THINK_RE.search(text)
+    if think is None:
+        return {"reasoning": "", "report": text.strip()}
+
+    answer = _ANSWER_RE.search(text, think.end())
+    if answer is not None:
+        report = answer.group(1)
+    else:
+        report = text[think.end():]
+    return {"reasoning": think.group(1).strip(), "report": report.strip()}
+
+
+class ReportStoppingCriteria(StoppingCriteria):
+    """
+    Per-row stopping hook for think-then-answer generation.
+
+    A row stops as soon as its </answer> tag is generated, or, with
+    max_reasoning_tokens set, when it has spent that many tokens without
+    closing </think> (those rows are listed in ``over_budget`` so the caller
+    can force the report). The step at which each row closed its reasoning
+    and finished is recorded for timing, and the rows that stopped on
+    </answer> rather than EOS or the token limit are listed in
+    ``answer_stopped``.
+    """
+
+    def __init__(self, tokenizer, prompt_length: int, max_reasoning_tokens: int | None = None):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.max_reasoning_tokens = max_reasoning_tokens
+        self.eos_ids = {i for i in (tokenizer.eos_token_id, tokenizer.pad_token_id) if i is not None}
+
+        self.start_time = time.perf_counter()
+        self.first_step_at = None  # first call comes right after prefill
+        self.think_closed = {}   # row -> (tokens, time)
+        self.finished = {}       # row -> (tokens, time)
+        self.over_budget = set()
+        self.answer_stopped = set()
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        now = time.perf_counter()
+        if self.first_step_at is None:
+            self.first_step_at = now
+        num_generated = input_ids.shape[1] - self.prompt_length
+        stop = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+        for row in range(input_ids.shape[0]):
+            if row in self.finished:
+                stop[row] = True
+                continue
+
+            if input_ids[row, -1].item() in self.eos_ids:
+                self.finished[row] = (num_generated, now)
+                continue
+
+            # Tags can span several tokens, so look at a short decoded tail
+            tail = self.tokenizer.decode(input_ids[row, -8:], skip_special_tokens=False)
+            if row not in self.think_closed and THINK_END in tail:
+                self.think_closed[row] = (num_generated, now)
+
+            if ANSWER_END in tail:
+                stop[row] = True
+                self.answer_stopped.add(row)
+            elif (
+                self.max_reasoning_tokens is not None
+                and row not in self.think_closed
+                and num_generated >= self.max_reasoning_tokens
+            ):
+                stop[row] = True
+                self.over_budget.add(row)
+
+            if stop[row]:
+                self.finished[row] = (num_generated, now)
+
+        return stop
+
+    def row_timing(self, row: int, end_time: float) -> dict:
+        """
+        Tokens and seconds spent on reasoning vs. report for one row.
+
+        Reasoning time runs from the first decode step, so it excludes prefill.
+        """
+        tokens, finished_at = self.finished.get(row, (None, end_time))
+        closed_tokens, closed_at = self.think_closed.get(row, (tokens, finished_at))
+        return {
+            "reasoning_tokens": closed_tokens,
+            "reasoning_s": closed_at - (self.first_step_at or self.start_time),
+            "report_s": finished_at - closed_at,
+            "stopped_at_answer": row in self.answer_stopped
+        }
+
+
+class GenerationStats:
+    """
+    Accumulates per-sample generation lengths and timings for the run metadata.
+
+    Only measured quantities are reported: how many samples stopped early
+    on </answer> or had their reasoning capped, not the decode steps this
+    saved, which would need a run without early stopping to compare with.
+    """
+
+    def __init__(self, max_new_tokens: int, max_reasoning_tokens: int | None = None):
+        self.max_new_tokens = max_new_tokens
+        self.max_reasoning_tokens = max_reasoning_tokens
+        self.samples = 0
+        self.tokens = 0
+        self.reasoning_tokens = 0
+        self.reasoning_s = 0.0
+        self.report_s = 0.0
+        self.capped = 0
+        self.stopped_at_answer = 0
+
+    def record(
+        self,
+        tokens: int,
+        reasoning_tokens: int,
+        reasoning_s: float,
+        report_s: float,
+        capped: bool,
+        stopped_at_answer: bool = False
+    ):
+        self.samples += 1
+        self.tokens += tokens
+        self.reasoning_tokens += reasoning_tokens
+        self.reasoning_s += reasoning_s
+        self.report_s += report_s
+        self.capped += int(capped)
+        self.stopped_at_answer += int(stopped_at_answer)
+
+    def stats(self) -> dict:
+        n = max(self.samples, 1)
+        return {
+            "max_new_tokens": self.max_new_tokens,
+            "max_reasoning_tokens": self.max_reasoning_tokens,
+            "samples": self.samples,
+            "mean_tokens_per_sample": round(self.tokens / n, 1),
+            "mean_reasoning_tokens": round(self.reasoning_tokens / n, 1),
+            "mean_reasoning_s": round(self.reasoning_s / n, 3),
+            "mean_report_s": round(self.report_s / n, 3),
+            "reasoning_capped_samples": self.capped,
+            "stopped_at_answer_samples": self.stopped_at_answer
+        }
@@ -0,0 +1,160 @@
+import os
+import json
+from pathlib import Path
+from datetime import datetime
+
+
+# Predictions are stored as JSON Lines:
+#   {"metadata": {...}}            <- header, written when the file is created
+#   {"index": 0, "filename": ...}  <- one line per prediction, appended as produced
+#   {"metadata": {...}}            <- trailer with final counts/stats, written on close
+# Metadata lines are merged in order, so the trailer overrides the header.
+
+
+def new_run_id() -> str:
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def new_predictions_path(output_dir: Path, run_id: str | None = None) -> Path:
+    """Timestamped predictions file path inside output_dir."""
+    return Path(output_dir) / f"predictions_{run_id or new_run_id()}.jsonl"
+
+
+def iter_lines(path: Path):
+    """Yield (end_offset, parsed_line) for every complete, valid line."""
+    offset = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # truncated by a crash mid-write
+            try:
+                obj = json.loads(raw)
+            except json.JSONDecodeError:
+                break
+            offset += len(raw)
+            yield offset, obj
+
+
+def iter_predictions(path: str | Path):
+    """Stream prediction records from a predictions file, one at a time."""
+    path = Path(path)
+    if path.suffix == ".json":
+        with open(path, "r") as f:
+            yield from json.load(f)["predictions"]
+        return
+    for _, obj in iter_lines(path):
+        if "metadata" not in obj:
+            yield obj
+
+
+def read_metadata(path: str | Path) -> dict:
+    """Merged metadata of a predictions file (num_samples is recounted if missing)."""
+    path = Path(path)
+    if path.suffix == ".json":
+        with open(path, "r") as f:
+            return json.load(f)["metadata"]
+    metadata = {}
+    count = 0
+    for _, obj in iter_lines(path):
+        if "metadata" in obj:
+            metadata.update(obj["metadata"])
+        else:
+            count += 1
+    metadata["num_samples"] = count
+    return metadata
+
+
+def completed_keys(path: str | Path) -> set[tuple[int, str]]:
+    """(index, filename) pairs that already have a prediction on disk."""
+    return {(p["index"], p["filename"]) for p in iter_predictions(path)}
+
+
+def get_latest_predictions(predictions_dir: str | Path, suffixes: tuple[str, ...] = (".jsonl",)) -> Path:
+    """
+    Most recently modified predictions file with one of the given suffixes.
+
+    Raises FileNotFoundError if the directory or such a file does not exist.
+    """
+    predictions_dir = Path(predictions_dir)
+    if not predictions_dir.exists():
+        raise FileNotFoundError(f"Predictions directory not found: {predictions_dir}")
+    files = [path for suffix in suffixes for path in predictions_dir.glob(f"predictions_*{suffix}")]
+    if not files:
+        raise FileNotFoundError(f"No prediction files found in: {predictions_dir}")
+    return max(files, key=lambda p: p.stat().st_mtime)
+
+
+class PredictionsWriter:
+    """
+    Append-only JSONL predictions writer.
+
+    Every write() is flushed and fsynced, so a crash loses at most the batch
+    being generated. Opening an existing file resumes it: any partially
+    written trailing line is truncated and new records are appended.
+    """
+
+    def __init__(self, path: str | Path, metadata: dict | None = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.num_samples = 0
+
+        resuming = self.path.exists()
+        if resuming:
+            valid_end = 0
+            for valid_end, obj in iter_lines(self.path):
+                if "metadata" not in obj:
+                    self.num_samples += 1
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_end)
+
+        self._file = open(self.path, "a")
+        if not resuming:
+            self._append([{"metadata": metadata or {}}])
+
+    def _append(self, objs: list[dict]):
+        for obj in objs:
+            self._file.write(json.dumps(obj) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def write(self, predictions: list[dict]):
+        """Append prediction records and sync them to disk."""
+        self._append(predictions)
+        self.num_samples += len(predictions)
+
+    def close(self, metadata: dict | None = None):
+        """Write the trailer metadata and close the file."""
+        if self._file.closed:
+            return
+        self._append([{"metadata": {**(metadata or {}), "num_samples": self.num_samples}}])
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def save_predictions(
+    predictions,
+    output_dir: Path,
+    model_name: str,
+    extra_metadata: dict | None = None
+) -> Path:
+    """Save an iterable of predictions to a new JSONL file."""
+    output_path = new_predictions_path(output_dir)
+    timestamp = output_path.stem.removeprefix("predictions_")
+
+    with PredictionsWriter(output_path, {"timestamp": timestamp, "model": model_name}) as writer:
+        chunk = []
+        for pred in predictions:
+            chunk.append(pred)
+            if len(chunk) == 256:
+                writer.write(chunk)
+                chunk = []
+        writer.write(chunk)
+        writer.close(extra_metadata)
+
+    print(f"Predictions saved to: {output_path}")
+    return output_path
@@ -0,0 +1,123 @@
+import copy
+import time
+
+import torch
+
+
+class PrefixCache:
+    """
+    Reusable KV state for the instruction text shared by every prompt.
+
+    The prompt must be laid out as ``<shared text><image><generation prompt>``
+    so that everything before the first vision token is identical across
+    samples. The prefix is encoded once (on the first sample) and every later
+    call only prefills the image and the few tokens that follow it.
+    """
+
+    def __init__(self, model, processor):
+        self.model = model
+        self.processor = processor
+        self.prefix_ids = None
+        self._kv = None
+
+        # Stats reported in the run metadata
+        self.hits = 0
+        self.misses = 0
+        self.build_seconds = 0.0
+        self.prefill_seconds = 0.0
+
+    def _prefix_length(self, input_ids: torch.Tensor) -> int:
+        """Number of tokens before the first image token (and its start marker)."""
+        image_token_id = self.model.config.image_token_id
+        positions = (input_ids == image_token_id).nonzero()
+        if len(positions) == 0:
+            raise ValueError("Prompt has no image token; cannot split off a shared prefix.")
+        first = positions[0].item()
+
+        vision_start_id = getattr(self.model.config, "vision_start_token_id", None)
+        if vision_start_id is not None and first > 0 and input_ids[first - 1] == vision_start_id:
+            first -= 1
+        return first
+
+    def _matches(self, input_ids: torch.Tensor) -> bool:
+        n = self.prefix_ids.shape[-1]
+        return input_ids.shape[-1] > n and torch.equal(input_ids[:n], self.prefix_ids)
+
+    def _build(self, input_ids: torch.Tensor):
+        """Encode the shared prefix and keep its KV cache."""
+        start = time.perf_counter()
+        self.prefix_ids = input_ids[:self._prefix_length(input_ids)].clone()
+        with torch.no_grad():
+            outputs = self.model(
+                input_ids=self.prefix_ids.unsqueeze(0),
+                attention_mask=torch.ones_like(self.prefix_ids).unsqueeze(0),
+                use_cache=True
+            )
+        self._kv = outputs.past_key_values
+        self.build_seconds += time.perf_counter() - start
+
+    def prefill(self, inputs: dict):
+        """
+        Prefill a single prompt on top of the cached prefix.
+
+        Args:
+            inputs: Processor outputs for one prompt (batch size 1)
+
+        Returns:
+            KV cache covering every prompt token except the last, ready to be
+            passed to ``model.generate(past_key_values=...)``.
+        """
+        input_ids = inputs["input_ids"]
+        attention_mask = inputs["attention_mask"]
+        if input_ids.shape[0] != 1:
+            raise ValueError("PrefixCache only supports a batch size of 1.")
+
+        if self._kv is None or not self._matches(input_ids[0]):
+            self.misses += 1
+            self._build(input_ids[0])
+        else:
+            self.hits += 1
+
+        start = time.perf_counter()
+        cache = copy.deepcopy(self._kv)
+        prefix_len = self.prefix_ids.shape[-1]
+        seq_len = input_ids.shape[1]
+        suffix = slice(prefix_len, seq_len - 1)
+        vision_inputs = {k: v for k, v in inputs.items() if k not in ("input_ids", "attention_mask")}
+
+        # Multimodal RoPE (Qwen2.5-VL) needs positions computed over the whole
+        # prompt; the offset is then kept on the model for the decode steps.
+        extra = {}
+        get_rope_index = getattr(getattr(self.model, "model", None), "get_rope_index", None)
+        if get_rope_index is not None:
+            position_ids, rope_deltas = get_rope_index(
+                input_ids,
+                image_grid_thw=inputs.get("image_grid_thw"),
+                attention_mask=attention_mask
+            )
+            extra["position_ids"] = position_ids[..., suffix]
+
+        with torch.no_grad():
+            self.model(
+                input_ids=input_ids[:, suffix],
+                attention_mask=attention_mask[:, :seq_len - 1],
+                past_key_values=cache,
+                cache_position=torch.arange(prefix_len, seq_len - 1, device=input_ids.device),
+                use_cache=True,
+                **vision_inputs,
+                **extra
+            )
+
+        if get_rope_index is not None:
+            self.model.model.rope_deltas = rope_deltas
+        self.prefill_seconds += time.perf_counter() - start
+        return cache
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "prefix_tokens": 0 if self.prefix_ids is None else int(self.prefix_ids.shape[-1]),
+            "build_seconds": round(self.build_seconds, 4),
+            "prefill_seconds": round(self.prefill_seconds, 4)
+        }
@@ -0,0 +1,105 @@
+import sys
+import time
+import resource
+
+import numpy as np
+
+
+def percentiles(values: list[float], digits: int = 4) -> dict:
+    """p50/p95/p99 of a list of values (None when empty)."""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), digits), "p95": round(float(p95), digits), "p99": round(float(p99), digits)}
+
+
+def peak_memory() -> dict:
+    """Peak resident memory of this process, plus peak GPU memory if CUDA is in use."""
+    # ru_maxrss is in KB on Linux
+    memory = {"peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        memory["peak_gpu_mb"] = round(torch.cuda.max_memory_allocated() / 2**20, 1)
+    return memory
+
+
+class InferenceProfiler:
+    """
+    Per-sample stage timings and token counts for an inference run.
+
+    Stages (data_load, processor, prefill, decode, postprocess for the hf
+    backend; request for http) are timed per batch with add(). end_batch()
+    splits the batch time evenly over its samples and records each sample's
+    latency as the time the whole batch took. summary() gives the run totals
+    and p50/p95/p99 for the predictions metadata.
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.samples = []
+        self.stage_names = []
+        self._stages = {}
+        self._tokens_in = []
+        self._tokens_out = []
+
+    def add(self, stage: str, seconds: float):
+        if stage not in self.stage_names:
+            self.stage_names.append(stage)
+        self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+
+    def record_tokens(self, tokens_in: list[int], tokens_out: list[int]):
+        self._tokens_in.extend(tokens_in)
+        self._tokens_out.extend(tokens_out)
+
+    def end_batch(self, batch_size: int, generated_rows: list[int] | None = None) -> list[dict]:
+        """
+        Close the current batch and return one timing dict per sample.
+
+        generated_rows lists the rows the recorded token counts belong to,
+        when only part of the batch went through the model.
+        """
+        latency = sum(self._stages.values())
+        tokens_in = [None] * batch_size
+        tokens_out = [None] * batch_size
+        rows = range(batch_size) if generated_rows is None else generated_rows
+        for row, n_in, n_out in zip(rows, self._tokens_in, self._tokens_out):
+            tokens_in[row] = n_in
+            tokens_out[row] = n_out
+
+        timings = []
+        for row in range(batch_size):
+            timing = {f"{stage}_s": round(seconds / batch_size, 4) for stage, seconds in self._stages.items()}
+            timing["latency_s"] = round(latency, 4)
+            timing["tokens_in"] = tokens_in[row]
+            timing["tokens_out"] = tokens_out[row]
+            if tokens_out[row] is not None and latency > 0:
+                timing["tokens_per_s"] = round(tokens_out[row] / latency, 2)
+            timings.append(timing)
+
+        self.samples.extend(timings)
+        self._stages = {}
+        self._tokens_in = []
+        self._tokens_out = []
+        return timings
+
+    def summary(self) -> dict:
+        wall_s = time.perf_counter() - self.start_time
+        tokens_in = sum(s["tokens_in"] or 0 for s in self.samples)
+        tokens_out = sum(s["tokens_out"] or 0 for s in self.samples)
+        return {
+            "samples": len(self.samples),
+            "wall_s": round(wall_s, 3),
+            "samples_per_s": round(len(self.samples) / wall_s, 3) if wall_s else None,
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_per_s": round(tokens_out / wall_s, 2) if wall_s else None,
+            "latency_s": percentiles([s["latency_s"] for s in self.samples]),
+            "stages_s": {
+                stage: {
+                    "total": round(sum(s.get(f"{stage}_s", 0.0) for s in self.samples), 3),
+                    **percentiles([s[f"{stage}_s"] for s in self.samples if f"{stage}_s" in s])
+                }
+                for stage in self.stage_names
+            },
+            **peak_memory()
+        }
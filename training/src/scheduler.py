@@ -0,0 +1,247 @@
+import time
+from dataclasses import dataclass, field
+
+import torch
+from transformers import StoppingCriteriaList
+
+from models import ModelSpec
+from inference import build_messages, prepare_inputs
+from postprocess import GenerationStats, ReportStoppingCriteria
+from profiling import InferenceProfiler
+
+
+class PaddingStats:
+    """
+    Share of the token slots in generate calls that did useful work.
+
+    Prefill slots are batch rows x padded prompt width; decode slots are
+    batch rows x decode steps run, of which a row only uses the steps before
+    it finished.
+    """
+
+    def __init__(self):
+        self.prefill_tokens = 0
+        self.prefill_slots = 0
+        self.decode_tokens = 0
+        self.decode_slots = 0
+        self.recomputed_tokens = 0
+        self.generate_calls = 0
+
+    def record(self, prompt_lengths: list[int], width: int, num_tokens: list[int], steps: int):
+        self.generate_calls += 1
+        self.prefill_tokens += sum(prompt_lengths)
+        self.prefill_slots += len(prompt_lengths) * width
+        self.decode_tokens += sum(num_tokens)
+        self.decode_slots += len(num_tokens) * steps
+
+    def stats(self) -> dict:
+        def ratio(a, b):
+            return round(a / b, 4) if b else None
+
+        return {
+            "generate_calls": self.generate_calls,
+            "prefill_efficiency": ratio(self.prefill_tokens, self.prefill_slots),
+            "decode_efficiency": ratio(self.decode_tokens, self.decode_slots),
+            "padding_efficiency": ratio(
+                self.prefill_tokens + self.decode_tokens, self.prefill_slots + self.decode_slots
+            ),
+            # Prompt and output tokens prefilled again when a row continues in a new segment
+            "recomputed_tokens": self.recomputed_tokens
+        }
+
+
+class _SegmentCriteria(ReportStoppingCriteria):
+    """ReportStoppingCriteria that also stops each row at its remaining token budget."""
+
+    def __init__(self, tokenizer, prompt_length: int, remaining: list[int]):
+        super().__init__(tokenizer, prompt_length)
+        self.remaining = remaining
+        self.capped = set()
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        stop = super().__call__(input_ids, scores, **kwargs)
+        num_generated = input_ids.shape[1] - self.prompt_length
+        for row, budget in enumerate(self.remaining):
+            if not stop[row] and row not in self.finished and num_generated >= budget:
+                stop[row] = True
+                self.capped.add(row)
+                self.finished[row] = (num_generated, time.perf_counter())
+        return stop
+
+
+@dataclass
+class _Slot:
+    """One sample being generated: its processed prompt and the tokens so far."""
+    position: int
+    inputs: dict
+    generated: list[int] = field(default_factory=list)
+    decode_started_at: float | None = None  # first decode step, after the first prefill
+    reasoning: tuple[int, float] | None = None  # (tokens, time) when </think> closed
+    stopped_at_answer: bool = False
+    done: bool = False
+
+    @property
+    def length(self) -> int:
+        return self.inputs["input_ids"].shape[1] + len(self.generated)
+
+
+class ContinuousBatcher:
+    """
+    Continuous batching on top of HF generate.
+
+    Samples are ordered by expected length (length hints from an output
+    length predictor if the caller has one, otherwise the prompt length,
+    which grows with the image's vision tokens) and admitted into the
+    running batch while its padded footprint, rows x (longest sequence +
+    segment_tokens), stays within max_batch_tokens. Generation runs in
+    segments of segment_tokens steps; after each segment, finished rows
+    leave and their slots are refilled from the queue. Unfinished rows
+    continue by prefilling their prompt plus the tokens generated so far
+    (greedy decoding gives the same continuation), which trades a short
+    re-prefill for never decoding padding for long.
+
+    Outputs are returned in the order the samples were given.
+    """
+
+    def __init__(
+        self,
+        model,
+        processor,
+        spec: ModelSpec,
+        max_new_tokens: int = 1024,
+        max_batch_size: int = 8,
+        max_batch_tokens: int = 16384,
+        segment_tokens: int = 64,
+        stats: GenerationStats | None = None
+    ):
+        self.model = model
+        self.processor = processor
+        self.spec = spec
+        self.max_new_tokens = max_new_tokens
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.segment_tokens = segment_tokens
+        self.stats = stats
+        self.padding = PaddingStats()
+        self.pad_id = processor.tokenizer.pad_token_id
+
+    def _admit(self, position: int, image, pixel_item: dict | None) -> _Slot:
+        text = self.processor.apply_chat_template(build_messages(image, self.spec), add_generation_prompt=True)
+        inputs = prepare_inputs(
+            self.model, self.processor, [text], [image], [pixel_item] if pixel_item is not None else None
+        )
+        return _Slot(position, inputs)
+
+    def _collate(self, slots: list[_Slot]) -> tuple[dict, list[int]]:
+        """Left-padded batch of prompt + generated ids; other inputs (pixels, grids) are concatenated."""
+        width = max(slot.length for slot in slots)
+        batch = {}
+        for key, value in slots[0].inputs.items():
+            if value.shape == slots[0].inputs["input_ids"].shape:
+                rows = []
+                for slot in slots:
+                    tail = slot.inputs[key][0]
+                    if slot.generated:
+                        extra = torch.tensor(slot.generated, device=tail.device, dtype=tail.dtype)
+                        if key == "attention_mask":
+                            extra = torch.ones_like(extra)
+                        elif key != "input_ids":
+                            extra = torch.zeros_like(extra)
+                        tail = torch.cat([tail, extra])
+                    fill = self.pad_id if key == "input_ids" else 0
+                    rows.append(torch.cat([tail.new_full((width - len(tail),), fill), tail]))
+                batch[key] = torch.stack(rows)
+            else:
+                batch[key] = torch.cat([slot.inputs[key] for slot in slots])
+        return batch, [slot.length for slot in slots]
+
+    def _fits(self, slots: list[_Slot], candidate: _Slot) -> bool:
+        rows = len(slots) + 1
+        width = max([slot.length for slot in slots] + [candidate.length]) + self.segment_tokens
+        return rows <= self.max_batch_size and (not slots or rows * width <= self.max_batch_tokens)
+
+    def _segment(self, slots: list[_Slot], profiler: InferenceProfiler | None):
+        start = time.perf_counter()
+        inputs, lengths = self._collate(slots)
+        width = inputs["input_ids"].shape[1]
+        remaining = [self.max_new_tokens - len(slot.generated) for slot in slots]
+        criteria = _SegmentCriteria(self.processor.tokenizer, width, remaining)
+        self.padding.recomputed_tokens += sum(
+            slot.length for slot in slots if slot.generated
+        )
+
+        with torch.no_grad():
+            generated_ids = self.model.generate(
+                **inputs,
+                max_new_tokens=min(self.segment_tokens, max(remaining)),
+                do_sample=False,
+                stopping_criteria=StoppingCriteriaList([criteria])
+            )
+        generated_at = time.perf_counter()
+        new_ids = generated_ids[:, width:].tolist()
+
+        num_tokens = []
+        for row, slot in enumerate(slots):
+            if slot.decode_started_at is None:
+                slot.decode_started_at = criteria.first_step_at or generated_at
+            if row in criteria.think_closed and slot.reasoning is None:
+                tokens, closed_at = criteria.think_closed[row]
+                slot.reasoning = (len(slot.generated) + tokens, closed_at)
+            count = criteria.finished[row][0] if row in criteria.finished else len(new_ids[row])
+            slot.generated += new_ids[row][:count]
+            slot.done = row in criteria.finished
+            slot.stopped_at_answer = row in criteria.answer_stopped
+            num_tokens.append(count)
+        self.padding.record(lengths, width, num_tokens, len(new_ids[0]))
+
+        if profiler is not None:
+            first_step_at = criteria.first_step_at or generated_at
+            profiler.add("prefill", first_step_at - start)
+            profiler.add("decode", generated_at - first_step_at)
+
+    def run(
+        self,
+        images: list,
+        pixel_items: list[dict] | None = None,
+        length_hints: list[int] | None = None,
+        profiler: InferenceProfiler | None = None
+    ) -> list[str]:
+        start = time.perf_counter()
+        slots = [
+            self._admit(position, image, pixel_items[position] if pixel_items is not None else None)
+            for position, image in enumerate(images)
+        ]
+        if profiler is not None:
+            profiler.add("processor", time.perf_counter() - start)
+
+        # Longest first, so the long tail starts early and short samples fill in around it
+        hints = length_hints or [slot.length for slot in slots]
+        queue = sorted(slots, key=lambda slot: hints[slot.position], reverse=True)
+        active = []
+        while queue or active:
+            while queue and self._fits(active, queue[0]):
+                active.append(queue.pop(0))
+            self._segment(active, profiler)
+            active = [slot for slot in active if not slot.done]
+
+        parse_start = time.perf_counter()
+        outputs = self.processor.batch_decode(
+            [slot.generated for slot in slots], skip_special_tokens=True, clean_up_tokenization_spaces=False
+        )
+        end_time = time.perf_counter()
+        if profiler is not None:
+            profiler.add("postprocess", end_time - parse_start)
+            profiler.record_tokens([slot.inputs["input_ids"].shape[1] for slot in slots],
+                                   [len(slot.generated) for slot in slots])
+        if self.stats is not None:
+            for slot in slots:
+                tokens, closed_at = slot.reasoning or (len(slot.generated), end_time)
+                self.stats.record(
+                    tokens=len(slot.generated),
+                    reasoning_tokens=tokens,
+                    reasoning_s=closed_at - slot.decode_started_at,
+                    report_s=end_time - closed_at,
+                    capped=False,
+                    stopped_at_answer=slot.stopped_at_answer
+                )
+        return outputs
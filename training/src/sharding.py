@@ -0,0 +1,118 @@
+import os
+import heapq
+import multiprocessing as mp
+from pathlib import Path
+
+from predictions_io import PredictionsWriter, iter_predictions, read_metadata, new_predictions_path
+
+
+def shard_indices(indices: list[int], num_shards: int, shard_id: int) -> list[int]:
+    """
+    Deterministic, disjoint slice of indices for one shard.
+
+    Samples are dealt round-robin so shards stay balanced even when only a
+    prefix of the dataset is processed.
+    """
+    if not 0 <= shard_id < num_shards:
+        raise ValueError(f"shard_id must be in [0, {num_shards}), got {shard_id}")
+    return indices[shard_id::num_shards]
+
+
+def shard_dir(output_dir: Path, run_id: str) -> Path:
+    return Path(output_dir) / "shards" / run_id
+
+
+def shard_path(output_dir: Path, run_id: str, shard_id: int, num_shards: int) -> Path:
+    return shard_dir(output_dir, run_id) / f"shard_{shard_id:03d}_of_{num_shards:03d}.jsonl"
+
+
+def merge_shards(output_dir: Path, run_id: str, num_shards: int) -> Path:
+    """
+    Merge every shard of a run into one predictions file ordered by index.
+
+    Each shard is already sorted by index, so this is a streaming k-way
+    merge that never holds more than one record per shard in memory. The
+    merge is written to a temporary file that replaces the output at the
+    end, so merging again rewrites the file instead of appending to it.
+    """
+    paths = [shard_path(output_dir, run_id, k, num_shards) for k in range(num_shards)]
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing shard files: {missing}")
+
+    shard_metadata = [read_metadata(p) for p in paths]
+    output_path = new_predictions_path(output_dir, run_id)
+    metadata = {k: v for k, v in shard_metadata[0].items() if k in ("timestamp", "model")}
+
+    # PredictionsWriter resumes existing files, so never hand it a stale one
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+    with PredictionsWriter(tmp_path, metadata) as writer:
+        merged = heapq.merge(*(iter_predictions(p) for p in paths), key=lambda p: p["index"])
+        chunk = []
+        for pred in merged:
+            chunk.append(pred)
+            if len(chunk) == 256:
+                writer.write(chunk)
+                chunk = []
+        writer.write(chunk)
+        writer.close({"num_shards": num_shards, "shards": shard_metadata})
+    os.replace(tmp_path, output_path)
+
+    print(f"Merged {num_shards} shards into: {output_path}")
+    return output_path
+
+
+def _visible_gpus() -> list[str]:
+    """Ids of the GPUs this process may use, as CUDA_VISIBLE_DEVICES entries."""
+    import torch
+
+    num_gpus = torch.cuda.device_count()
+    visible = os.environ.get("CUDA_VISIBLE_DEVICES")
+    if visible:
+        return [gpu.strip() for gpu in visible.split(",")][:num_gpus]
+    return [str(gpu) for gpu in range(num_gpus)]
+
+
+def _run_shard(run_fn, shard_id: int, num_shards: int, gpus: list[str], kwargs: dict):
+    """Worker entry point: pin the shard to one device (or a share of CPU cores)."""
+    if gpus:
+        # Must be set before anything queries CUDA in this process, so the
+        # GPUs are counted by the parent rather than here
+        os.environ["CUDA_VISIBLE_DEVICES"] = gpus[shard_id % len(gpus)]
+    else:
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // num_shards))
+
+    run_fn(num_shards=num_shards, shard_id=shard_id, **kwargs)
+
+
+def launch(run_fn, num_shards: int, run_id: str, output_dir: Path, **kwargs) -> Path:
+    """
+    Run num_shards worker processes of run_fn and merge their outputs.
+
+    Args:
+        run_fn: Inference entry point accepting num_shards/shard_id/run_id
+        num_shards: Number of worker processes
+        run_id: Identifier shared by all shards of this run
+        output_dir: Predictions directory (shards go to output_dir/shards/run_id)
+        **kwargs: Passed through to run_fn
+    """
+    ctx = mp.get_context("spawn")
+    kwargs = {**kwargs, "run_id": run_id, "output_dir": output_dir}
+    gpus = _visible_gpus()
+    workers = [
+        ctx.Process(target=_run_shard, args=(run_fn, shard_id, num_shards, gpus, kwargs))
+        for shard_id in range(num_shards)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    failed = [k for k, worker in enumerate(workers) if worker.exitcode != 0]
+    if failed:
+        raise RuntimeError(
+            f"Shards {failed} failed; rerun them with --resume --run_id {run_id} and merge again."
+        )
+    return merge_shards(output_dir, run_id, num_shards)
@@ -0,0 +1,220 @@
+import time
+from pathlib import Path
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, DynamicCache
+
+from models import ModelSpec
+from inference import build_messages, prepare_inputs
+from postprocess import GenerationStats, ReportStoppingCriteria
+from profiling import InferenceProfiler
+
+
+def load_draft_model(model_path: str | Path, tokenizer, dtype: str = "float16", device: str = "auto"):
+    """
+    Load a small causal LM to draft tokens for the main model.
+
+    Drafts are compared to the main model's token ids, so the draft
+    tokenizer must give every token of the main tokenizer the same id.
+    """
+    print(f"Loading draft model from: {model_path}")
+    draft_vocab = AutoTokenizer.from_pretrained(str(model_path), local_files_only=True).get_vocab()
+    mismatched = [token for token, i in tokenizer.get_vocab().items() if draft_vocab.get(token) != i]
+    if mismatched:
+        raise ValueError(
+            f"The draft tokenizer is not compatible with the main one: {len(mismatched)} tokens "
+            f"differ (e.g. {mismatched[:5]})"
+        )
+    draft = AutoModelForCausalLM.from_pretrained(
+        model_path,
+        torch_dtype=getattr(torch, dtype),
+        device_map=device,
+        local_files_only=True
+    )
+    draft.eval()
+    return draft
+
+
+class SpeculativeDecoder:
+    """
+    Greedy speculative decoding with a text-only draft model.
+
+    Each step, the draft proposes num_draft_tokens tokens greedily and the
+    main model scores all of them in one forward pass. The longest prefix
+    the main model agrees with is kept, followed by the main model's own
+    next token, and both KV caches are cropped back to the kept tokens. A
+    step therefore emits between 1 and num_draft_tokens + 1 tokens, always
+    the ones greedy decoding with the main model alone would emit, and
+    stops on the same conditions (EOS, </answer>, max_new_tokens).
+
+    The draft sees the prompt ids with image placeholder tokens in place of
+    the image; only the main model looks at pixels. Samples are decoded one
+    at a time, as transformers' assisted generation does.
+    """
+
+    def __init__(
+        self,
+        model,
+        draft,
+        processor,
+        spec: ModelSpec,
+        num_draft_tokens: int = 5,
+        max_new_tokens: int = 1024,
+        generation_stats: GenerationStats | None = None
+    ):
+        self.model = model
+        self.draft = draft
+        self.processor = processor
+        self.spec = spec
+        self.num_draft_tokens = num_draft_tokens
+        self.max_new_tokens = max_new_tokens
+        self.generation_stats = generation_stats
+        eos = model.generation_config.eos_token_id
+        self.eos_ids = set(eos if isinstance(eos, list) else [eos]) - {None}
+        # Draft logits may cover padding rows beyond the main vocabulary
+        self.vocab_size = model.get_output_embeddings().out_features
+
+        self.samples = 0
+        self.proposed = 0
+        self.accepted = 0
+        self.verify_steps = 0
+        self.tokens = 0
+        self.prefill_s = 0.0
+        self.decode_s = 0.0
+
+    @staticmethod
+    def _extend(model, ids: torch.Tensor, cache: DynamicCache, cached: int, logits_to_keep: int = 0) -> torch.Tensor:
+        """Feed ids after the cached prefix; returns their next-token logits (the last logits_to_keep, 0 for all)."""
+        ids = ids.to(model.device)
+        positions = torch.arange(cached, cached + len(ids), device=model.device)
+        position_ids = None
+        rope_deltas = getattr(model.model, "rope_deltas", None)
+        if rope_deltas is not None:
+            # Multimodal rope: text after the prompt advances the (time, height, width)
+            # axes together, shifted by the prompt's delta. Passed explicitly because
+            # Qwen2.5-VL only derives it for one new token at a time.
+            position_ids = (positions + rope_deltas[0].to(model.device)).view(1, 1, -1).expand(3, 1, -1)
+        output = model(
+            input_ids=ids[None],
+            attention_mask=torch.ones(1, cached + len(ids), dtype=torch.long, device=model.device),
+            position_ids=position_ids,
+            past_key_values=cache,
+            cache_position=positions,
+            use_cache=True,
+            logits_to_keep=logits_to_keep
+        )
+        return output.logits[0]
+
+    def _decode(self, inputs: dict, criteria: ReportStoppingCriteria) -> list[int]:
+        prompt_length = inputs["input_ids"].shape[1]
+        ids = torch.empty(prompt_length + self.max_new_tokens, dtype=torch.long)
+        ids[:prompt_length] = inputs["input_ids"][0].cpu()
+        length = prompt_length
+
+        def append(tokens: list[int]) -> bool:
+            """Add accepted tokens one by one; True once generation should stop."""
+            nonlocal length
+            for token in tokens:
+                ids[length] = token
+                length += 1
+                stop = bool(criteria(ids[None, :length], None)[0])
+                if stop or token in self.eos_ids or length - prompt_length >= self.max_new_tokens:
+                    return True
+            return False
+
+        start = time.perf_counter()
+        main_cache, draft_cache = DynamicCache(), DynamicCache()
+        logits = self.model(**inputs, past_key_values=main_cache, use_cache=True, logits_to_keep=1).logits
+        draft_cached = 0
+        self.prefill_s += time.perf_counter() - start
+
+        decode_start = time.perf_counter()
+        done = append([int(logits[0, -1].argmax())])
+        while not done:
+            # The main cache holds every token but the last one, which is fed with the drafts
+            k = min(self.num_draft_tokens, prompt_length + self.max_new_tokens - length)
+            feed = ids[draft_cached:length]
+            proposal = []
+            for _ in range(k):
+                draft_logits = self._extend(self.draft, feed, draft_cache, draft_cached, logits_to_keep=1)
+                draft_cached += len(feed)
+                proposal.append(int(draft_logits[-1, :self.vocab_size].argmax()))
+                feed = torch.tensor(proposal[-1:])
+
+            verify = torch.cat([ids[length - 1:length], torch.tensor(proposal, dtype=torch.long)])
+            targets = self._extend(self.model, verify, main_cache, length - 1).argmax(dim=-1).tolist()
+            accepted = 0
+            while accepted < k and proposal[accepted] == targets[accepted]:
+                accepted += 1
+            self.proposed += k
+            self.accepted += accepted
+            self.verify_steps += 1
+
+            # Drop the cached keys/values of rejected drafts
+            main_cache.crop(length + accepted)
+            draft_cached = min(draft_cached, length + accepted)
+            draft_cache.crop(draft_cached)
+            done = append(proposal[:accepted] + [targets[accepted]])
+
+        self.decode_s += time.perf_counter() - decode_start
+        self.samples += 1
+        self.tokens += length - prompt_length
+        return ids[prompt_length:length].tolist()
+
+    def run(
+        self,
+        images: list,
+        pixel_items: list[dict] | None = None,
+        profiler: InferenceProfiler | None = None
+    ) -> list[str]:
+        outputs = []
+        for position, image in enumerate(images):
+            start = time.perf_counter()
+            text = self.processor.apply_chat_template(build_messages(image, self.spec), add_generation_prompt=True)
+            inputs = prepare_inputs(
+                self.model, self.processor, [text], [image],
+                [pixel_items[position]] if pixel_items is not None else None
+            )
+            if profiler is not None:
+                profiler.add("processor", time.perf_counter() - start)
+
+            criteria = ReportStoppingCriteria(self.processor.tokenizer, inputs["input_ids"].shape[1])
+            prefill_s, decode_s = self.prefill_s, self.decode_s
+            with torch.no_grad():
+                generated = self._decode(inputs, criteria)
+            generated_at = time.perf_counter()
+            outputs.append(self.processor.decode(
+                generated, skip_special_tokens=True, clean_up_tokenization_spaces=False
+            ))
+
+            if profiler is not None:
+                profiler.add("prefill", self.prefill_s - prefill_s)
+                profiler.add("decode", self.decode_s - decode_s)
+                profiler.add("postprocess", time.perf_counter() - generated_at)
+                profiler.record_tokens([inputs["input_ids"].shape[1]], [len(generated)])
+            if self.generation_stats is not None:
+                timing = criteria.row_timing(0, generated_at)
+                self.generation_stats.record(
+                    tokens=len(generated),
+                    reasoning_tokens=timing["reasoning_tokens"] or len(generated),
+                    reasoning_s=timing["reasoning_s"],
+                    report_s=timing["report_s"],
+                    capped=False,
+                    stopped_at_answer=timing["stopped_at_answer"]
+                )
+        return outputs
+
+    def stats(self) -> dict:
+        generation_s = self.prefill_s + self.decode_s
+        return {
+            "draft_model": str(getattr(self.draft, "name_or_path", "")),
+            "num_draft_tokens": self.num_draft_tokens,
+            "proposed_tokens": self.proposed,
+            "accepted_tokens": self.accepted,
+            "acceptance_rate": round(self.accepted / self.proposed, 4) if self.proposed else None,
+            # Tokens emitted per forward pass of the main model (1.0 without speculation)
+            "tokens_per_main_forward": round(self.tokens / (self.samples + self.verify_steps), 2)
+            if self.samples else None,
+            "tokens_per_s": round(self.tokens / generation_s, 1) if generation_s else None,
+            "decode_tokens_per_s": round(self.tokens / self.decode_s, 1) if self.decode_s else None
+        }
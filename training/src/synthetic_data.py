@@ -0,0 +1,55 @@
+import random
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+# Words the synthetic reports are drawn from
+VOCAB = [
+    "heart", "size", "normal", "lungs", "clear", "no", "pleural", "effusion",
+    "pneumothorax", "focal", "consolidation", "mild", "opacity", "right", "left",
+    "base", "stable", "cardiomegaly", "degenerative", "changes", "spine"
+]
+
+def make_synthetic_dataset(
+    root: str | Path,
+    num_studies: int = 32,
+    views_per_study: int = 2,
+    image_size: tuple[int, int] = (512, 512),
+    seed: int = 0
+) -> Path:
+    """
+    Write a small dataset with the Indiana University layout.
+
+    Creates ``indiana_reports.csv``, ``indiana_projections.csv`` and noise
+    PNGs under ``images/images_normalized`` so IndianaDataset (and the
+    benchmarks built on it) can run without the real data.
+    """
+    root = Path(root)
+    images_dir = root / "images" / "images_normalized"
+    images_dir.mkdir(parents=True, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    words = random.Random(seed)
+
+    reports, projections = [], []
+    for uid in range(1, num_studies + 1):
+        reports.append({
+            "uid": uid,
+            "findings": " ".join(words.choices(VOCAB, k=words.randint(8, 40))) + ".",
+            "impression": " ".join(words.choices(VOCAB, k=words.randint(3, 12))) + "."
+        })
+        for view in range(views_per_study):
+            filename = f"{uid}_IM-{uid:04d}-{view + 1:04d}.dcm.png"
+            projections.append({
+                "uid": uid,
+                "filename": filename,
+                "projection": "Frontal" if view == 0 else "Lateral"
+            })
+            pixels = rng.integers(0, 256, size=image_size, dtype=np.uint8)
+            Image.fromarray(pixels).save(images_dir / filename)
+
+    pd.DataFrame(reports).to_csv(root / "indiana_reports.csv", index=False)
+    pd.DataFrame(projections).to_csv(root / "indiana_projections.csv", index=False)
+    return root
@@ -0,0 +1,147 @@
+from pathlib import Path
+
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers
+from transformers import (
+    AutoTokenizer,
+    Qwen2Config,
+    Qwen2ForCausalLM,
+    Qwen2TokenizerFast,
+    Qwen2VLImageProcessor,
+    Qwen2VLVideoProcessor,
+    Qwen2_5_VLConfig,
+    Qwen2_5_VLForConditionalGeneration,
+    Qwen2_5_VLProcessor
+)
+
+from synthetic_data import VOCAB
+
+SPECIAL_TOKENS = [
+    "<|endoftext|>", "<|im_start|>", "<|im_end|>",
+    "<|vision_start|>", "<|vision_end|>", "<|image_pad|>", "<|video_pad|>"
+]
+WORDS = ["<unk>", "user", "assistant", "system", "<think>", "</think>", "<answer>", "</answer>",
+         "Findings:", "Impression:", "."] + VOCAB
+
+# Qwen-style template, reduced to what build_messages produces
+CHAT_TEMPLATE = (
+    "{% for message in messages %}<|im_start|>{{ message['role'] }}\n"
+    "{% if message['content'] is string %}{{ message['content'] }}"
+    "{% else %}{% for content in message['content'] %}"
+    "{% if content['type'] == 'image' %}<|vision_start|><|image_pad|><|vision_end|>"
+    "{% elif content['type'] == 'text' %}{{ content['text'] }}{% endif %}"
+    "{% endfor %}{% endif %}<|im_end|>\n{% endfor %}"
+    "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+)
+
+
+def make_tiny_model(root: str | Path, seed: int = 0) -> Path:
+    """
+    Save a randomly initialised Qwen2.5-VL of a few MB, with a word-level tokenizer.
+
+    It loads through load_model/AutoProcessor like the real checkpoint and
+    runs on CPU in milliseconds per token, so the inference path (batching,
+    caching, data loading) can be benchmarked and smoke-tested without the
+    3B weights. The same seed always gives the same weights.
+    """
+    root = Path(root)
+    vocab = {token: i for i, token in enumerate(SPECIAL_TOKENS + WORDS)}
+
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    # The Qwen2.5-VL processor only accepts Qwen2 tokenizer classes
+    tokenizer = Qwen2TokenizerFast(
+        tokenizer_object=backend,
+        unk_token="<unk>",
+        eos_token="<|im_end|>",
+        pad_token="<|endoftext|>",
+        additional_special_tokens=SPECIAL_TOKENS[1:]
+    )
+    # Small images: at most 16 visual tokens per sample
+    image_processor = Qwen2VLImageProcessor(min_pixels=4 * 28 * 28, max_pixels=16 * 28 * 28)
+    processor = Qwen2_5_VLProcessor(
+        image_processor=image_processor,
+        tokenizer=tokenizer,
+        video_processor=Qwen2VLVideoProcessor(),
+        chat_template=CHAT_TEMPLATE
+    )
+
+    config = Qwen2_5_VLConfig(
+        text_config={
+            "vocab_size": len(vocab),
+            "hidden_size": 64,
+            "intermediate_size": 128,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 4,
+            "num_key_value_heads": 2,
+            "max_position_embeddings": 4096,
+            "max_window_layers": 2,
+            # head_dim 16 -> 8 rotary frequencies split over (time, height, width)
+            "rope_scaling": {"type": "mrope", "mrope_section": [2, 3, 3]}
+        },
+        vision_config={
+            "depth": 2,
+            "hidden_size": 32,
+            "intermediate_size": 64,
+            "num_heads": 2,
+            "out_hidden_size": 64,
+            "fullatt_block_indexes": [1]
+        },
+        image_token_id=vocab["<|image_pad|>"],
+        video_token_id=vocab["<|video_pad|>"],
+        vision_start_token_id=vocab["<|vision_start|>"],
+        vision_end_token_id=vocab["<|vision_end|>"],
+        bos_token_id=vocab["<|im_start|>"],
+        eos_token_id=vocab["<|im_end|>"],
+        pad_token_id=vocab["<|endoftext|>"]
+    )
+
+    torch.manual_seed(seed)
+    model = Qwen2_5_VLForConditionalGeneration(config)
+    model.generation_config.eos_token_id = vocab["<|im_end|>"]
+    model.generation_config.pad_token_id = vocab["<|endoftext|>"]
+
+    model.save_pretrained(root)
+    processor.save_pretrained(root)
+    return root
+
+
+def make_tiny_draft_model(model_dir: str | Path, root: str | Path, num_layers: int = 1) -> Path:
+    """
+    Save a text-only draft model for the tiny model in model_dir.
+
+    It is a Qwen2 causal LM made of the tiny model's embeddings, its first
+    num_layers decoder layers, final norm and LM head, with the same
+    tokenizer. A random draft would almost never agree with the main model;
+    this truncated copy agrees often enough to exercise speculative
+    decoding, and more so with more layers.
+    """
+    root = Path(root)
+    main = Qwen2_5_VLForConditionalGeneration.from_pretrained(model_dir)
+    text = main.config.text_config
+    config = Qwen2Config(
+        vocab_size=text.vocab_size,
+        hidden_size=text.hidden_size,
+        intermediate_size=text.intermediate_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=text.num_attention_heads,
+        num_key_value_heads=text.num_key_value_heads,
+        max_position_embeddings=text.max_position_embeddings,
+        rope_theta=text.rope_theta,
+        rms_norm_eps=text.rms_norm_eps,
+        tie_word_embeddings=False,
+        bos_token_id=main.config.bos_token_id,
+        eos_token_id=main.config.eos_token_id,
+        pad_token_id=main.config.pad_token_id
+    )
+    draft = Qwen2ForCausalLM(config)
+    language_model = main.model.language_model
+    draft.model.embed_tokens.load_state_dict(language_model.embed_tokens.state_dict())
+    for layer, source in zip(draft.model.layers, language_model.layers):
+        layer.load_state_dict(source.state_dict())
+    draft.model.norm.load_state_dict(language_model.norm.state_dict())
+    draft.lm_head.load_state_dict(main.lm_head.state_dict())
+
+    draft.save_pretrained(root)
+    AutoTokenizer.from_pretrained(model_dir).save_pretrained(root)
+    return root
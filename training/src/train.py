@@ -0,0 +1,325 @@
+import json
+import math
+import time
+from pathlib import Path
+from itertools import islice
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+from transformers import get_scheduler
+
+from IU_dataset_loader import IndianaDataset
+from models import MODEL_REGISTRY, DEFAULT_MODEL, CHECKPOINTS_DIR, get_model_spec
+from inference import cpu_supports_bf16, load_model
+from checkpointing import AsyncCheckpointer, list_checkpoints, load_checkpoint
+from predictions_io import new_run_id
+from train_data import IGNORE_INDEX, LengthGroupedBatchSampler, TrainCollator, sample_lengths
+
+# --- 1. SETUP PATHS ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+DATA_PATH = REPO_ROOT.parent / "data" / "indiana_university"
+RUNS_DIR = CHECKPOINTS_DIR / "finetuned"
+
+# Attention projections of the language model (the vision tower uses qkv/proj)
+LORA_TARGETS = ["q_proj", "k_proj", "v_proj", "o_proj"]
+
+
+def resolve_precision(precision: str, device) -> str:
+    """"auto" trains under bf16 autocast where the hardware runs bf16 natively."""
+    if precision != "auto":
+        return precision
+    if device.type == "cuda":
+        return "bf16" if torch.cuda.is_bf16_supported() else "fp32"
+    return "bf16" if cpu_supports_bf16() else "fp32"
+
+
+def add_lora(model, r: int, alpha: int, dropout: float, targets: list[str]):
+    """Freeze the model and add trainable LoRA adapters to the target linear layers."""
+    from peft import LoraConfig, get_peft_model
+
+    config = LoraConfig(r=r, lora_alpha=alpha, lora_dropout=dropout, target_modules=targets, task_type="CAUSAL_LM")
+    model = get_peft_model(model, config)
+    model.print_trainable_parameters()
+    return model
+
+
+def token_loss(logits: torch.Tensor, labels: torch.Tensor) -> torch.Tensor:
+    """Summed next-token cross-entropy over the labelled positions, in float32."""
+    labels = labels[:, 1:]
+    mask = labels != IGNORE_INDEX
+    return F.cross_entropy(logits[:, :-1][mask].float(), labels[mask], reduction="sum")
+
+
+def windows(loader, size: int):
+    """Group micro-batches into gradient accumulation windows (the last one may be short)."""
+    iterator = iter(loader)
+    while window := list(islice(iterator, size)):
+        yield window
+
+
+def train(
+    model: str = DEFAULT_MODEL,
+    model_path: str | Path | None = None,
+    data_path: str | Path = DATA_PATH,
+    output_dir: str | Path = RUNS_DIR,
+    run_id: str | None = None,
+    study_mode: str | None = None,
+    holdout: int = 0,
+    num_samples: int | None = None,
+    epochs: int = 1,
+    max_steps: int | None = None,
+    batch_size: int = 1,
+    grad_accum: int = 8,
+    lr: float = 1e-4,
+    weight_decay: float = 0.0,
+    warmup_ratio: float = 0.03,
+    max_grad_norm: float = 1.0,
+    max_length: int | None = None,
+    device: str = "auto",
+    dtype: str = "float32",
+    precision: str = "auto",
+    lora: bool = False,
+    lora_r: int = 16,
+    lora_alpha: int = 32,
+    lora_dropout: float = 0.05,
+    lora_targets: list[str] | None = None,
+    gradient_checkpointing: bool = False,
+    num_workers: int = 2,
+    group_size: int = 50,
+    save_every: int = 500,
+    keep_last: int = 2,
+    max_shard_mb: int = 1024,
+    log_every: int = 10,
+    resume: str | None = None,
+    seed: int = 0
+) -> Path:
+    """
+    Fine-tune a registry model to write the ground-truth reports of IndianaDataset.
+
+    Args:
+        model: Model registry name (prompt, system prompt, default weights).
+        model_path: Checkpoint directory. Default: the registry path.
+        data_path: Dataset root.
+        output_dir: Parent directory of the run directory.
+        run_id: Run directory name. Default: a new timestamp. Pass an existing one to resume.
+        study_mode: None, "canonical" or "multiview" (see IndianaDataset).
+        holdout: Leave out the first N samples, the ones run_inference evaluates by default.
+        num_samples: Train on at most this many samples after the holdout.
+        epochs: Passes over the training samples.
+        max_steps: Stop after this many optimizer steps.
+        batch_size: Samples per forward pass.
+        grad_accum: Forward passes per optimizer step. The loss is averaged over
+                    every report token of the window, however it is split into batches.
+        lr, weight_decay, warmup_ratio, max_grad_norm: AdamW with warmup and cosine decay.
+        max_length: Truncate reports so prompt + report fit in this many tokens.
+        device: device_map for loading ("auto", "cpu", "cuda", ...).
+        dtype: Weight dtype. Keep float32 for full fine-tuning (bf16 compute comes from autocast).
+        precision: "bf16" autocast, "fp32", or "auto" (bf16 where the hardware supports it).
+        lora: Train LoRA adapters on lora_targets instead of all weights.
+        gradient_checkpointing: Recompute activations in the backward pass to save memory.
+        num_workers: DataLoader processes decoding and tokenizing ahead of the step.
+        group_size: Batches per length-sorted mega-batch of the sampler.
+        save_every: Optimizer steps between asynchronous checkpoints.
+        keep_last: Checkpoints kept on disk.
+        max_shard_mb: Maximum size of one safetensors shard.
+        log_every: Optimizer steps between log lines.
+        resume: "latest" or a checkpoint directory to continue from.
+        seed: Seed for weights init (LoRA), data order and dropout.
+
+    Returns:
+        The run directory, holding step_<N> checkpoints, train_log.jsonl and final/.
+    """
+    torch.manual_seed(seed)
+    spec = get_model_spec(model)
+    model_path = Path(model_path) if model_path is not None else spec.path
+    run_id = run_id or new_run_id()
+    run_dir = Path(output_dir) / run_id
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    # Model
+    net, processor = load_model(model_path, dtype=dtype, device=device)
+    if gradient_checkpointing:
+        net.gradient_checkpointing_enable()
+        net.enable_input_require_grads()
+    if lora:
+        net = add_lora(net, lora_r, lora_alpha, lora_dropout, lora_targets or LORA_TARGETS)
+    net.train()
+    model_device = next(net.parameters()).device
+    precision = resolve_precision(precision, model_device)
+
+    # Data: length-grouped batches, tokenized in the loader workers
+    dataset = IndianaDataset(data_path, study_mode=study_mode)
+    indices = list(range(holdout, len(dataset)))[:num_samples]
+    sampler = LengthGroupedBatchSampler(
+        indices, sample_lengths(dataset, indices, processor), batch_size, group_size=group_size, seed=seed
+    )
+    collator = TrainCollator(processor, spec, max_length=max_length)
+    loader = DataLoader(
+        dataset,
+        batch_sampler=sampler,
+        num_workers=num_workers,
+        collate_fn=collator,
+        prefetch_factor=2 if num_workers > 0 else None,
+        persistent_workers=False
+    )
+    steps_per_epoch = math.ceil(len(sampler) / grad_accum)
+    total_steps = min(steps_per_epoch * epochs, max_steps or math.inf)
+    print(f"Training on {len(indices)} samples: {steps_per_epoch} steps/epoch, {total_steps} steps, "
+          f"estimated padding efficiency {sampler.padding_efficiency():.1%}")
+
+    # Optimizer
+    params = [p for p in net.parameters() if p.requires_grad]
+    optimizer = torch.optim.AdamW(params, lr=lr, weight_decay=weight_decay)
+    scheduler = get_scheduler(
+        "cosine", optimizer, num_warmup_steps=int(warmup_ratio * total_steps), num_training_steps=total_steps
+    )
+
+    step, epoch, batches_done = 0, 0, 0
+    if resume is not None:
+        checkpoints = list_checkpoints(run_dir)
+        checkpoint = (checkpoints[-1] if checkpoints else None) if resume == "latest" else Path(resume)
+        if checkpoint is None:
+            raise FileNotFoundError(f"No checkpoint to resume in {run_dir}")
+        state = load_checkpoint(checkpoint, net, optimizer, scheduler)
+        step, epoch, batches_done = state["step"], state["epoch"], state["batches_done"]
+        print(f"Resumed from {checkpoint} at step {step}")
+
+    config = {
+        "model": spec.name, "model_path": str(model_path), "study_mode": study_mode, "samples": len(indices),
+        "batch_size": batch_size, "grad_accum": grad_accum, "lr": lr, "precision": precision, "dtype": dtype,
+        "lora": {"r": lora_r, "alpha": lora_alpha, "targets": lora_targets or LORA_TARGETS} if lora else None
+    }
+    log_path = run_dir / "train_log.jsonl"
+    checkpointer = AsyncCheckpointer(run_dir, max_shard_mb=max_shard_mb, keep_last=keep_last)
+    log_file = open(log_path, "a")
+    autocast = torch.autocast(model_device.type, dtype=torch.bfloat16, enabled=precision == "bf16")
+
+    # Running totals between log lines
+    loss_sum = label_tokens = real_tokens = padded_tokens = 0
+    checkpoint_block_s = 0.0
+    log_start = time.perf_counter()
+
+    # An exception mid-epoch still waits for the checkpoint being written and closes the log
+    try:
+        while step < total_steps and epoch < epochs:
+            sampler.set_epoch(epoch, skip=batches_done)
+            for window in windows(loader, grad_accum):
+                window_tokens = sum(int((batch["labels"] != IGNORE_INDEX).sum()) for batch in window)
+                for batch in window:
+                    batch.pop("indices")
+                    labels = batch.pop("labels").to(model_device)
+                    inputs = {k: v.to(model_device) for k, v in batch.items()}
+                    with autocast:
+                        logits = net(**inputs, use_cache=False).logits
+                    loss = token_loss(logits, labels)
+                    (loss / max(window_tokens, 1)).backward()
+
+                    loss_sum += loss.item()
+                    real_tokens += int(inputs["attention_mask"].sum())
+                    padded_tokens += inputs["attention_mask"].numel()
+                label_tokens += window_tokens
+
+                torch.nn.utils.clip_grad_norm_(params, max_grad_norm)
+                optimizer.step()
+                scheduler.step()
+                optimizer.zero_grad(set_to_none=True)
+                step += 1
+                batches_done += len(window)
+
+                if step % log_every == 0 or step == total_steps:
+                    elapsed = time.perf_counter() - log_start
+                    entry = {
+                        "step": step,
+                        "epoch": epoch,
+                        "loss": round(loss_sum / max(label_tokens, 1), 4),
+                        "lr": scheduler.get_last_lr()[0],
+                        "tokens_per_s": round(real_tokens / elapsed, 1),
+                        "padding_efficiency": round(real_tokens / max(padded_tokens, 1), 4),
+                        "checkpoint_block_s": round(checkpoint_block_s, 3)
+                    }
+                    log_file.write(json.dumps(entry) + "\n")
+                    log_file.flush()
+                    print(f"step {step}/{total_steps}  loss {entry['loss']:.4f}  lr {entry['lr']:.2e}  "
+                          f"{entry['tokens_per_s']} tok/s  padding eff. {entry['padding_efficiency']:.1%}")
+                    loss_sum = label_tokens = real_tokens = padded_tokens = 0
+                    checkpoint_block_s = 0.0
+                    log_start = time.perf_counter()
+
+                if step % save_every == 0 and step < total_steps:
+                    save_start = time.perf_counter()
+                    checkpointer.save(step, net, optimizer, scheduler, {
+                        "step": step, "epoch": epoch, "batches_done": batches_done, "config": config
+                    })
+                    checkpoint_block_s += time.perf_counter() - save_start
+
+                if step >= total_steps:
+                    break
+            else:
+                epoch += 1
+                batches_done = 0
+    finally:
+        checkpointer.close()
+        log_file.close()
+
+    # Final weights (adapters only under LoRA) in from_pretrained layout
+    final_dir = run_dir / "final"
+    if lora:
+        net.save_pretrained(final_dir)
+    else:
+        net.save_pretrained(final_dir, max_shard_size=f"{max_shard_mb}MB")
+    processor.save_pretrained(final_dir)
+    with open(final_dir / "train_config.json", "w") as f:
+        json.dump({**config, "steps": step}, f, indent=2)
+
+    print("\n" + "=" * 50)
+    print("TRAINING COMPLETE")
+    print(f"Run saved to: {run_dir}")
+    print("=" * 50)
+    return run_dir
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fine-tune a report generation model on the Indiana University dataset")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, choices=list(MODEL_REGISTRY))
+    parser.add_argument("--model_path", type=str, default=None, help="Checkpoint directory. Default: the registry path.")
+    parser.add_argument("--data_path", type=str, default=str(DATA_PATH), help="Dataset root.")
+    parser.add_argument("--output_dir", type=str, default=str(RUNS_DIR), help="Parent directory of run directories.")
+    parser.add_argument("--run_id", type=str, default=None, help="Run directory name (reuse one with --resume).")
+    parser.add_argument("--study_mode", type=str, default=None, choices=["canonical", "multiview"])
+    parser.add_argument("--holdout", type=int, default=0, help="Leave out the first N samples (the evaluation set).")
+    parser.add_argument("--num_samples", type=int, default=None, help="Train on at most N samples.")
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--max_steps", type=int, default=None, help="Stop after N optimizer steps.")
+    parser.add_argument("--batch_size", type=int, default=1, help="Samples per forward pass.")
+    parser.add_argument("--grad_accum", type=int, default=8, help="Forward passes per optimizer step.")
+    parser.add_argument("--lr", type=float, default=1e-4)
+    parser.add_argument("--weight_decay", type=float, default=0.0)
+    parser.add_argument("--warmup_ratio", type=float, default=0.03)
+    parser.add_argument("--max_grad_norm", type=float, default=1.0)
+    parser.add_argument("--max_length", type=int, default=None, help="Truncate reports to fit N tokens per sequence.")
+    parser.add_argument("--device", type=str, default="auto")
+    parser.add_argument("--dtype", type=str, default="float32", choices=["float32", "float16", "bfloat16"])
+    parser.add_argument("--precision", type=str, default="auto", choices=["auto", "bf16", "fp32"],
+                        help="bf16 autocast or plain fp32 compute.")
+    parser.add_argument("--lora", action="store_true", help="Train LoRA adapters instead of all weights.")
+    parser.add_argument("--lora_r", type=int, default=16)
+    parser.add_argument("--lora_alpha", type=int, default=32)
+    parser.add_argument("--lora_dropout", type=float, default=0.05)
+    parser.add_argument("--lora_targets", type=str, nargs="+", default=None,
+                        help=f"Module names to adapt. Default: {' '.join(LORA_TARGETS)}.")
+    parser.add_argument("--gradient_checkpointing", action="store_true")
+    parser.add_argument("--num_workers", type=int, default=2, help="Data loading processes.")
+    parser.add_argument("--group_size", type=int, default=50, help="Batches per length-sorted group.")
+    parser.add_argument("--save_every", type=int, default=500, help="Optimizer steps between checkpoints.")
+    parser.add_argument("--keep_last", type=int, default=2, help="Checkpoints kept on disk.")
+    parser.add_argument("--max_shard_mb", type=int, default=1024, help="Maximum safetensors shard size.")
+    parser.add_argument("--log_every", type=int, default=10)
+    parser.add_argument("--resume", nargs="?", const="latest", default=None,
+                        help="Resume the run from its latest checkpoint, or from the given checkpoint directory.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    train(**vars(args))
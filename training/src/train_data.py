@@ -0,0 +1,186 @@
+import random
+
+import torch
+from transformers.models.qwen2_vl.image_processing_qwen2_vl import smart_resize
+
+from inference import build_messages
+from models import ModelSpec
+from pixel_store import processor_inputs
+
+# Label value skipped by the loss (prompt and padding positions)
+IGNORE_INDEX = -100
+
+
+def image_tokens(image_processor, width: int, height: int) -> int:
+    """
+    Visual tokens the processor gives an image of this size, 0 if it does not say.
+
+    Qwen-VL style processors resize to a multiple of patch_size * merge_size
+    within [min_pixels, max_pixels] (smart_resize), then emit one token per
+    merged patch.
+    """
+    patch_size = getattr(image_processor, "patch_size", None)
+    merge_size = getattr(image_processor, "merge_size", 1)
+    size = getattr(image_processor, "size", None) or {}
+    min_pixels = size.get("shortest_edge", getattr(image_processor, "min_pixels", None))
+    max_pixels = size.get("longest_edge", getattr(image_processor, "max_pixels", None))
+    if not patch_size or not min_pixels or not max_pixels:
+        return 0
+    resized_height, resized_width = smart_resize(
+        height, width, factor=patch_size * merge_size, min_pixels=min_pixels, max_pixels=max_pixels
+    )
+    return (resized_height // patch_size) * (resized_width // patch_size) // merge_size ** 2
+
+
+def sample_lengths(dataset, indices: list[int], processor) -> list[int]:
+    """
+    Approximate sequence length of each sample, without decoding images.
+
+    Report tokens plus the visual tokens of each view, from the image sizes
+    in the dataset index (or the PNG headers). Used only to group samples
+    of similar length.
+    """
+    reports = [dataset.report(idx) for idx in indices]
+    report_ids = processor.tokenizer(reports, add_special_tokens=False)["input_ids"]
+    visual = {}
+    lengths = []
+    for ids, idx in zip(report_ids, indices):
+        for filename in dataset.views[idx]:
+            if filename not in visual:
+                visual[filename] = image_tokens(processor.image_processor, *dataset.image_size(filename))
+        lengths.append(len(ids) + sum(visual[filename] for filename in dataset.views[idx]))
+    return lengths
+
+
+class LengthGroupedBatchSampler:
+    """
+    Batches of similar-length samples, in random order.
+
+    Every epoch the indices are shuffled and cut into mega-batches of
+    ``batch_size * group_size`` samples. Each mega-batch is sorted by length
+    and split into batches, then the batches are shuffled again, so padding
+    stays low while every epoch still sees a different mix. The order only
+    depends on (seed, epoch), which lets a resumed run skip the batches it
+    has already trained on.
+    """
+
+    def __init__(
+        self,
+        indices: list[int],
+        lengths: list[int],
+        batch_size: int,
+        group_size: int = 50,
+        shuffle: bool = True,
+        seed: int = 0
+    ):
+        self.indices = list(indices)
+        self.lengths = dict(zip(self.indices, lengths))
+        self.batch_size = batch_size
+        self.group_size = group_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.skip = 0
+
+    def set_epoch(self, epoch: int, skip: int = 0):
+        """Select the epoch's order and skip its first `skip` batches."""
+        self.epoch = epoch
+        self.skip = skip
+
+    def batches(self) -> list[list[int]]:
+        rng = random.Random(self.seed + self.epoch)
+        order = list(self.indices)
+        if self.shuffle:
+            rng.shuffle(order)
+
+        mega_size = self.batch_size * self.group_size
+        batches = []
+        for start in range(0, len(order), mega_size):
+            group = sorted(order[start:start + mega_size], key=self.lengths.__getitem__, reverse=True)
+            batches += [group[i:i + self.batch_size] for i in range(0, len(group), self.batch_size)]
+        if self.shuffle:
+            rng.shuffle(batches)
+        return batches
+
+    def padding_efficiency(self) -> float:
+        """Estimated share of real (non-pad) tokens in this epoch's batches."""
+        real = padded = 0
+        for batch in self.batches():
+            lengths = [self.lengths[idx] for idx in batch]
+            real += sum(lengths)
+            padded += max(lengths) * len(lengths)
+        return real / padded if padded else 1.0
+
+    def __iter__(self):
+        return iter(self.batches()[self.skip:])
+
+    def __len__(self) -> int:
+        return -(-len(self.indices) // self.batch_size) - self.skip
+
+
+class TrainCollator:
+    """
+    Tokenize dataset samples into model inputs with next-token labels.
+
+    The prompt is built exactly as at inference (build_messages and the chat
+    template with the generation prompt); the assistant turn is the ground
+    truth report. Prompts are left-padded and the report tokens appended,
+    so every row reads [pad, prompt, report, pad]. Prompt and padding
+    positions are labelled IGNORE_INDEX and the loss only covers the report
+    and the end-of-turn tokens.
+
+    Samples served from a PixelStore are tokenized with their stored pixel
+    tensors instead of images.
+    """
+
+    def __init__(self, processor, spec: ModelSpec, max_length: int | None = None):
+        self.processor = processor
+        self.processor.tokenizer.padding_side = "left"
+        self.spec = spec
+        self.max_length = max_length
+
+    def _texts(self, sample: dict) -> tuple[str, str]:
+        """(prompt, target) strings; the target is what the template appends for the report."""
+        messages = build_messages(sample.get("image"), self.spec)
+        prompt = self.processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        full = self.processor.apply_chat_template(
+            messages + [{"role": "assistant", "content": [{"type": "text", "text": sample["report"]}]}],
+            tokenize=False
+        )
+        if not full.startswith(prompt):
+            raise ValueError("Chat template does not extend the generation prompt with the assistant turn")
+        return prompt, full[len(prompt):]
+
+    def __call__(self, batch: list[dict]) -> dict:
+        prompts, targets = zip(*(self._texts(sample) for sample in batch))
+        if "image" in batch[0]:
+            images = [sample["image"] if isinstance(sample["image"], list) else [sample["image"]] for sample in batch]
+            inputs = self.processor(text=list(prompts), images=images, padding=True, return_tensors="pt")
+        else:
+            pixel_items = [
+                {k: v for k, v in sample.items() if k not in ("index", "report", "filename", "uid", "views")}
+                for sample in batch
+            ]
+            inputs = processor_inputs(self.processor, list(prompts), pixel_items)
+
+        tokenizer = self.processor.tokenizer
+        target_ids = tokenizer(list(targets), add_special_tokens=False)["input_ids"]
+        if self.max_length is not None:
+            prompt_lengths = inputs["attention_mask"].sum(1).tolist()
+            target_ids = [ids[:max(self.max_length - n, 0)] for ids, n in zip(target_ids, prompt_lengths)]
+
+        width = max(len(ids) for ids in target_ids)
+        response = torch.full((len(batch), width), tokenizer.pad_token_id, dtype=torch.long)
+        response_mask = torch.zeros((len(batch), width), dtype=torch.long)
+        response_labels = torch.full((len(batch), width), IGNORE_INDEX, dtype=torch.long)
+        for row, ids in enumerate(target_ids):
+            response[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            response_mask[row, :len(ids)] = 1
+            response_labels[row, :len(ids)] = response[row, :len(ids)]
+
+        prompt_ids = inputs["input_ids"]
+        inputs["input_ids"] = torch.cat([prompt_ids, response], dim=1)
+        inputs["attention_mask"] = torch.cat([inputs["attention_mask"], response_mask], dim=1)
+        inputs["labels"] = torch.cat([torch.full_like(prompt_ids, IGNORE_INDEX), response_labels], dim=1)
+        inputs["indices"] = [sample["index"] for sample in batch]
+        return dict(inputs)
@@ -0,0 +1,205 @@
+import json
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from pixel_store import processor_hash
+
+
+def model_revision(model, processor, model_path: str | Path) -> str:
+    """
+    Identity of what produces the image embeddings.
+
+    Hashes the model config, the image processor config, the weight dtype
+    and the name, size and mtime of every weight file, so a fine-tuned or
+    re-downloaded checkpoint never reuses embeddings of another one.
+    """
+    weights = sorted(
+        (p.name, p.stat().st_size, p.stat().st_mtime_ns)
+        for p in Path(model_path).glob("*")
+        if p.suffix in (".safetensors", ".bin")
+    )
+    identity = json.dumps({
+        "config": model.config.to_dict(),
+        "processor": processor_hash(processor.image_processor),
+        "dtype": str(model.model.visual.dtype),
+        "weights": weights
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+
+class VisionFeatureCache:
+    """
+    Persistent cache of projected image embeddings (vision tower + merger output).
+
+    Attached to a Qwen2-VL style model, it replaces the model's
+    get_image_features: each image's patch rows are hashed together with
+    the model revision, cached embeddings are loaded instead of running the
+    vision tower, and only the missing images are encoded (in one call) and
+    stored. Because the key is the processed image content, a run that only
+    changes the prompt text hits on every image, and so do pixel-store,
+    multi-view and deduplicated runs.
+
+    Entries live in SQLite with the vision time they cost. Once the stored
+    embeddings exceed budget_mb, the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str | Path, revision: str, budget_mb: int = 10240):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.revision = revision
+        self.budget_bytes = budget_mb * 1024 * 1024
+        # Shard workers share the file; wait for each other's writes
+        self._conn = sqlite3.connect(self.path, timeout=60)
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, data BLOB NOT NULL, dtype TEXT NOT NULL, shape TEXT NOT NULL, "
+            "nbytes INTEGER NOT NULL, compute_s REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+        self.compute_s = 0.0
+        self.overhead_s = 0.0
+        self.evicted = 0
+
+        # The budget may have shrunk since the cache was filled
+        self._evict()
+        self._conn.commit()
+
+    def key(self, pixel_rows: np.ndarray, grid: list[int]) -> str:
+        digest = hashlib.sha256(self.revision.encode())
+        digest.update(json.dumps(grid).encode())
+        digest.update(np.ascontiguousarray(pixel_rows).tobytes())
+        return digest.hexdigest()
+
+    def _get_many(self, keys: list[str]) -> dict[str, tuple[torch.Tensor, float]]:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for key, data, dtype, shape, compute_s in self._conn.execute(
+                f"SELECT key, data, dtype, shape, compute_s FROM embeddings WHERE key IN ({placeholders})", chunk
+            ):
+                array = np.frombuffer(data, dtype=dtype).reshape(json.loads(shape))
+                found[key] = (torch.from_numpy(array.copy()), compute_s)
+        if found:
+            now = time.time()
+            self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+            self._conn.commit()
+        return found
+
+    def _put_many(self, items: dict[str, tuple[torch.Tensor, float]]):
+        now = time.time()
+        rows = []
+        for key, (embeds, compute_s) in items.items():
+            embeds = embeds.detach().cpu()
+            # numpy has no bfloat16; keep those as float32 on disk
+            array = (embeds.float() if embeds.dtype == torch.bfloat16 else embeds).numpy()
+            rows.append((key, array.tobytes(), array.dtype.str, json.dumps(array.shape), array.nbytes, compute_s, now))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, data, dtype, shape, nbytes, compute_s, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        self._evict()
+        self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+        if total <= self.budget_bytes:
+            return
+        excess = total - self.budget_bytes
+        freed, victims = 0, []
+        for key, nbytes in self._conn.execute("SELECT key, nbytes FROM embeddings ORDER BY last_used"):
+            victims.append((key,))
+            freed += nbytes
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self._conn.execute("PRAGMA incremental_vacuum")
+        self.evicted += len(victims)
+
+    def attach(self, model):
+        """Route the model's image encoding through the cache."""
+        inner = model.model
+        if not hasattr(inner, "visual") or not hasattr(inner, "get_image_features"):
+            raise ValueError("The vision cache supports Qwen2-VL style models (model.visual + image_grid_thw)")
+        encode = inner.get_image_features
+
+        def get_image_features(pixel_values: torch.Tensor, image_grid_thw: torch.Tensor):
+            start = time.perf_counter()
+            grids = image_grid_thw.tolist()
+            rows = [int(np.prod(grid)) for grid in grids]
+            host_pixels = pixel_values.detach().cpu().numpy()
+            offsets = np.cumsum([0] + rows)
+            keys = [self.key(host_pixels[offsets[i]:offsets[i + 1]], grid) for i, grid in enumerate(grids)]
+            cached = self._get_many(keys)
+
+            # Encode the images that are not cached, once each, in a single call
+            missing = {}
+            for i, key in enumerate(keys):
+                if key not in cached:
+                    missing.setdefault(key, i)
+            missing = list(missing.values())
+            self.overhead_s += time.perf_counter() - start
+            if missing:
+                encode_start = time.perf_counter()
+                pixels = torch.cat([pixel_values[offsets[i]:offsets[i + 1]] for i in missing])
+                embeds = encode(pixels, image_grid_thw[missing])
+                if pixels.is_cuda:
+                    torch.cuda.synchronize()
+                encode_s = time.perf_counter() - encode_start
+                self.compute_s += encode_s
+                total_rows = sum(rows[i] for i in missing)
+                new = {keys[i]: (e, encode_s * rows[i] / total_rows) for i, e in zip(missing, embeds)}
+                store_start = time.perf_counter()
+                self._put_many(new)
+                self.overhead_s += time.perf_counter() - store_start
+                cached.update(new)
+
+            # Repeats of an image encoded in this call count as hits too
+            encoded = set(missing)
+            output = []
+            for i, key in enumerate(keys):
+                embeds, compute_s = cached[key]
+                if i in encoded:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self.saved_s += compute_s
+                output.append(embeds.to(pixel_values.device, inner.visual.dtype))
+            return tuple(output)
+
+        inner.get_image_features = get_image_features
+        return model
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        entries, nbytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()
+        return {
+            "cache_path": str(self.path),
+            "revision": self.revision,
+            "images": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "vision_s_saved": round(self.saved_s, 3),
+            "vision_s_spent": round(self.compute_s, 3),
+            "cache_overhead_s": round(self.overhead_s, 3),
+            "entries": entries,
+            "stored_mb": round(nbytes / 2**20, 1),
+            "budget_mb": round(self.budget_bytes / 2**20, 1),
+            "evicted": self.evicted
+        }
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR / "src"))
+
+from inference import load_model
+from models import get_model_spec
+from synthetic_data import make_synthetic_dataset
+from tiny_model import make_tiny_model
+
+
+@pytest.fixture(scope="session")
+def tiny_spec():
+    return get_model_spec("tiny-qwen2.5-vl")
+
+
+@pytest.fixture(scope="session")
+def tiny_model_path(tmp_path_factory) -> Path:
+    """Randomly initialised Qwen2.5-VL of a few MB (always the same weights)."""
+    return make_tiny_model(tmp_path_factory.mktemp("tiny_model"))
+
+
+@pytest.fixture(scope="session")
+def tiny_model(tiny_model_path):
+    """(model, processor) of the tiny checkpoint, float32 on CPU."""
+    torch.manual_seed(0)
+    return load_model(tiny_model_path, "float32", device="cpu")
+
+
+@pytest.fixture(scope="session")
+def synthetic_data(tmp_path_factory) -> Path:
+    """Small dataset with the Indiana University layout (8 studies, 2 views each)."""
+    return make_synthetic_dataset(tmp_path_factory.mktemp("data"), num_studies=8, image_size=(64, 64))
@@ -0,0 +1,54 @@
+import pytest
+
+from IU_dataset_loader import IndianaDataset
+from inference import build_messages, generate_reports
+
+# Image sizes cycled over the samples: different sizes give different numbers
+# of vision tokens, so the prompts in a batch have different lengths and the
+# shorter ones are left-padded
+IMAGE_SIZES = [(56, 56), (112, 84), (84, 140), (168, 112)]
+MAX_NEW_TOKENS = 64
+
+
+def greedy_token_ids(model, processor, spec, images: list, batch_size: int) -> list[list[int]]:
+    outputs = []
+    for start in range(0, len(images), batch_size):
+        outputs += generate_reports(
+            model, processor, images[start:start + batch_size], max_new_tokens=MAX_NEW_TOKENS, spec=spec
+        )
+    return [processor.tokenizer(text, add_special_tokens=False)["input_ids"] for text in outputs]
+
+
+@pytest.fixture(scope="module")
+def images(synthetic_data) -> list:
+    dataset = IndianaDataset(synthetic_data)
+    return [dataset[idx]["image"].resize(IMAGE_SIZES[idx % len(IMAGE_SIZES)]) for idx in range(8)]
+
+
+@pytest.fixture(scope="module")
+def per_sample(tiny_model, tiny_spec, images) -> list[list[int]]:
+    model, processor = tiny_model
+    return greedy_token_ids(model, processor, tiny_spec, images, batch_size=1)
+
+
+def test_prompts_have_different_lengths(tiny_model, tiny_spec, images):
+    _, processor = tiny_model
+    lengths = {
+        processor(
+            text=[processor.apply_chat_template(build_messages(image, tiny_spec), add_generation_prompt=True)],
+            images=[image],
+            return_tensors="pt"
+        )["input_ids"].shape[1]
+        for image in images
+    }
+    # Otherwise no row would be left-padded
+    assert len(lengths) > 1
+
+
+@pytest.mark.parametrize("batch_size", [2, 3, 4, 8])
+def test_batched_greedy_outputs_match_per_sample(tiny_model, tiny_spec, images, per_sample, batch_size):
+    model, processor = tiny_model
+    batched = greedy_token_ids(model, processor, tiny_spec, images, batch_size)
+
+    assert any(per_sample)
+    assert batched == per_sample
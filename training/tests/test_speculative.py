@@ -0,0 +1,51 @@
+import pytest
+
+from IU_dataset_loader import IndianaDataset
+from inference import generate_reports
+from postprocess import GenerationStats
+from speculative import SpeculativeDecoder, load_draft_model
+from tiny_model import make_tiny_draft_model
+
+MAX_NEW_TOKENS = 96
+
+
+@pytest.fixture(scope="module")
+def images(synthetic_data) -> list:
+    dataset = IndianaDataset(synthetic_data)
+    return [dataset[idx]["image"] for idx in range(8)]
+
+
+@pytest.fixture(scope="module")
+def greedy(tiny_model, tiny_spec, images) -> list[str]:
+    model, processor = tiny_model
+    outputs = []
+    for image in images:
+        outputs += generate_reports(model, processor, [image], max_new_tokens=MAX_NEW_TOKENS, spec=tiny_spec)
+    return outputs
+
+
+@pytest.fixture(scope="module", params=[1, 2], ids=lambda layers: f"draft_layers={layers}")
+def draft(request, tiny_model, tiny_model_path, tmp_path_factory):
+    _, processor = tiny_model
+    path = make_tiny_draft_model(tiny_model_path, tmp_path_factory.mktemp("draft"), num_layers=request.param)
+    return load_draft_model(path, processor.tokenizer, "float32", device="cpu")
+
+
+@pytest.mark.parametrize("num_draft_tokens", [1, 3, 5, 8])
+def test_speculative_outputs_match_greedy(tiny_model, tiny_spec, images, greedy, draft, num_draft_tokens):
+    model, processor = tiny_model
+    decoder = SpeculativeDecoder(
+        model, draft, processor, tiny_spec,
+        num_draft_tokens=num_draft_tokens,
+        max_new_tokens=MAX_NEW_TOKENS,
+        generation_stats=GenerationStats(MAX_NEW_TOKENS)
+    )
+    outputs = []
+    for image in images:
+        outputs += decoder.run([image])
+
+    assert outputs == greedy
+    stats = decoder.stats()
+    # Drafts were proposed and some accepted, so verification was exercised
+    assert stats["proposed_tokens"] > 0
+    assert 0 < stats["acceptance_rate"] <= 1
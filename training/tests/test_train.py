@@ -0,0 +1,92 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from transformers import AutoImageProcessor
+
+import train as train_module
+from checkpointing import AsyncCheckpointer, list_checkpoints
+from train import train
+from train_data import image_tokens
+
+
+def read_log(run_dir: Path) -> list[dict]:
+    with open(run_dir / "train_log.jsonl") as f:
+        return [json.loads(line) for line in f]
+
+
+def train_kwargs(tiny_model_path, synthetic_data, tmp_path, lora: bool) -> dict:
+    # 16 samples, 4 per batch, 2 batches per step: 2 steps per epoch
+    return dict(
+        model="tiny-qwen2.5-vl",
+        model_path=tiny_model_path,
+        data_path=synthetic_data,
+        output_dir=tmp_path / "runs",
+        run_id="smoke",
+        epochs=4,
+        batch_size=4,
+        grad_accum=2,
+        lr=5e-3 if lora else 1e-3,
+        device="cpu",
+        lora=lora,
+        num_workers=0,
+        group_size=4,
+        log_every=1,
+        max_shard_mb=1
+    )
+
+
+@pytest.mark.parametrize("lora", [False, True], ids=["full", "lora"])
+def test_training_resumes_from_async_checkpoint_and_lowers_the_loss(tiny_model_path, synthetic_data, tmp_path, lora):
+    kwargs = train_kwargs(tiny_model_path, synthetic_data, tmp_path, lora)
+
+    # Stop halfway, then resume from the last asynchronous checkpoint
+    train(**kwargs, max_steps=4, save_every=2)
+    checkpoints = list_checkpoints(tmp_path / "runs" / "smoke")
+    run_dir = train(**kwargs, resume="latest")
+
+    log = read_log(run_dir)
+    assert [p.name for p in checkpoints] == ["step_2"]
+    # The second run appends to the log from the step after its checkpoint
+    assert [entry["step"] for entry in log] == [1, 2, 3, 4, 3, 4, 5, 6, 7, 8]
+    assert log[-1]["loss"] < log[0]["loss"]
+    assert any((run_dir / "final").glob("*.safetensors"))
+
+
+def test_failed_training_waits_for_the_checkpoint_in_flight(
+    tiny_model_path, synthetic_data, tmp_path, monkeypatch
+):
+    write = AsyncCheckpointer._write
+
+    def slow_write(self, *args):
+        time.sleep(0.5)
+        write(self, *args)
+
+    calls = 0
+    token_loss = train_module.token_loss
+
+    def failing_loss(logits, labels):
+        nonlocal calls
+        calls += 1
+        if calls > 4:  # the third step, right after the step_2 checkpoint started
+            raise RuntimeError("boom")
+        return token_loss(logits, labels)
+
+    monkeypatch.setattr(AsyncCheckpointer, "_write", slow_write)
+    monkeypatch.setattr(train_module, "token_loss", failing_loss)
+    with pytest.raises(RuntimeError, match="boom"):
+        train(**train_kwargs(tiny_model_path, synthetic_data, tmp_path, lora=False), save_every=2)
+
+    run_dir = tmp_path / "runs" / "smoke"
+    assert [p.name for p in list_checkpoints(run_dir)] == ["step_2"]
+    assert not list(run_dir.glob("*.tmp"))
+
+
+@pytest.mark.parametrize("size", [(64, 64), (256, 200), (37, 300), (2048, 2500)])
+def test_image_tokens_match_the_processor(tiny_model_path, size):
+    image_processor = AutoImageProcessor.from_pretrained(tiny_model_path)
+    grid = image_processor(images=[Image.new("RGB", size)], return_tensors="pt")["image_grid_thw"]
+
+    assert image_tokens(image_processor, *size) == int(grid.prod()) // image_processor.merge_size ** 2